@@ -1,442 +1,4813 @@
-﻿import os
+﻿import time
+PROCESS_STARTED = time.perf_counter()  # start of the startup measurement
+import os
+import sys
 import discord
 import asyncio
-from PyQt6.QtWidgets import (
-    QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QPushButton, QListWidget, QFileDialog, QListWidgetItem, QMessageBox,
-    QSlider, QLabel
-)
-from PyQt6.QtCore import QThread, pyqtSignal
-from PyQt6.QtGui import QColor
 from discord.ext import commands
 import threading
-from queue import Queue
-import time
+from queue import Empty
+import urllib.parse
+import urllib.request
+import subprocess
+import hashlib
+import json
+import tempfile
+import shutil
+import struct
+import re
+import sqlite3
+import mmap
+import itertools
+import weakref
+import bisect
+import multiprocessing
+from multiprocessing import shared_memory, resource_tracker
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from collections import OrderedDict, deque
+import numpy as np
+from discord.opus import OPUS_SILENCE
 
 # Set up bot
 TOKEN = " Put Your Token HERE "  # Replace with your actual bot token
 
-intents = discord.Intents.default()
-intents.message_content = True
-intents.guilds = True
-intents.voice_states = True
-intents.members = True
-intents.presences = True
-bot = commands.Bot(command_prefix="!", intents=intents)
+# Gateway profile: "lean" asks Discord only for what the bot uses (servers, voice states and command
+# messages) and keeps its caches small; "full" also streams and caches every member and presence
+# update, as the bot used to. Can also be picked with --gateway-profile lean|full
+GATEWAY_PROFILE = "lean"
+if "--gateway-profile" in sys.argv:
+    arguments = sys.argv[sys.argv.index("--gateway-profile") + 1:]
+    GATEWAY_PROFILE = arguments[0] if arguments else None
+if GATEWAY_PROFILE not in ("lean", "full"):
+    sys.exit(f"Unknown gateway profile {GATEWAY_PROFILE!r}. Usage: --gateway-profile lean|full")
+MESSAGE_CACHE_SIZE = 100  # messages kept in memory by the lean profile (discord.py keeps 1000)
+# Measurement mode (--measure-gateway SECONDS) appends its results here as lines of JSON
+GATEWAY_RESULTS_FILE = "gateway_profile.jsonl"
 
-# Define the file path to store selected quick play files
+if GATEWAY_PROFILE == "full":
+    intents = discord.Intents.default()
+    intents.message_content = True
+    intents.guilds = True
+    intents.voice_states = True
+    intents.members = True
+    intents.presences = True
+    bot = commands.Bot(command_prefix="!", intents=intents)
+else:
+    intents = discord.Intents.none()
+    intents.guilds = True
+    intents.voice_states = True
+    intents.guild_messages = True  # for the chat commands
+    intents.message_content = True
+    bot = commands.Bot(
+        command_prefix="!",
+        intents=intents,
+        chunk_guilds_at_startup=False,
+        member_cache_flags=discord.MemberCacheFlags.from_intents(intents),  # only members in voice
+        max_messages=MESSAGE_CACHE_SIZE,
+    )
+
+# Run without the window (also turned on by passing --headless); the bot is then driven
+# through the local control API below instead of the GUI buttons
+HEADLESS = False
+HEADLESS = HEADLESS or "--headless" in sys.argv or "--measure-gateway" in sys.argv
+# Where the headless control API listens; set CONTROL_SOCKET to a path to use a Unix socket instead
+CONTROL_HOST = "127.0.0.1"
+CONTROL_PORT = 8765
+CONTROL_SOCKET = None
+# Where the audio pipeline's metrics are served in Prometheus text format (None turns it off)
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9108
+
+# Old text file of quick play assignments, imported into the library on first run
 QUICK_PLAY_FILE = "quick_play_files.txt"
+# SQLite catalog of known tracks, sounds and quick sound assignments
+LIBRARY_DB = "library.db"
+
+# Audio format Discord expects: 48kHz, 16-bit, stereo, sent in 20ms frames
+SAMPLE_RATE = 48000
+CHANNELS = 2
+FRAME_SIZE = 3840  # bytes in one 20ms frame
+# Max amount of decoded quick sound audio kept in memory (bytes)
+QUICK_SOUND_BANK_LIMIT = 64 * 1024 * 1024
+# Music volume multiplier while a quick sound is playing over it
+MUSIC_DUCK_VOLUME = 0.35
+# Frames decoded ahead of playback and recently played frames kept for resuming from memory.
+# The read-ahead also sets how early before a track ends the next one starts decoding
+READ_AHEAD_FRAMES = 150  # 3 seconds
+HISTORY_FRAMES = 750  # 15 seconds
+# Seconds the end of one queued track overlaps the start of the next, faded with equal-power
+# curves (0 for a straight cut). Each player can change it up to MAX_CROSSFADE_SECONDS
+CROSSFADE_SECONDS = 0.0
+MAX_CROSSFADE_SECONDS = 10.0
+# How far to back up when resuming a track after the voice connection was interrupted
+INTERRUPT_REWIND_SECONDS = 0.5
+# Voice channel a player joins when none is picked: !play joins the caller's channel, and the
+# window and POST /connect can name one. After that the player goes back to the channel it last joined
+VOICE_CHANNEL_NAME = "tutturu~"
+# Audio worker processes that decode, mix and Opus-encode for the players.
+# 0 keeps all audio in the bot process, -1 starts one worker per CPU core
+AUDIO_WORKERS = 0
+# Shared-memory ring between a worker and the voice player: 8 packets is 160ms of audio
+RING_SLOTS = 8
+RING_SLOT_SIZE = 4000  # big enough for the largest Opus packet discord.py produces
+
+# Send Opus tracks to Discord as-is when no volume change or mixing is needed. With loudness
+# normalization on, pre-encoded copies have their gain applied at encode time and still pass
+# through; Opus files without a copy are decoded so they can be normalized
+OPUS_PASSTHROUGH = True
+# Containers an Opus stream can be passed straight through from (other files go through the cache)
+OPUS_CONTAINER_EXTENSIONS = (".opus", ".ogg", ".oga", ".webm", ".mka")
+# Folder holding Opus copies of library tracks, named by a hash of the original file
+OPUS_CACHE_DIR = "opus_cache"
+# Folder and size limit (bytes) of the on-disk cache of decoded tracks
+PCM_CACHE_DIR = "pcm_cache"
+PCM_CACHE_LIMIT = 4 * 1024 * 1024 * 1024
+# Folder of MP3 frame indexes used to start decoding an MP3 at any time without reading up to it
+SEEK_INDEX_DIR = "seek_index"
+# MP3 frames decoded ahead of a seek target, so the bit reservoir is full again by the time audio is kept
+MP3_PRIMING_FRAMES = 8
+# Items per block of the play queue
+PLAYLIST_BLOCK_SIZE = 512
+# Loudness normalization: tracks and quick sounds are brought to this EBU R128 integrated loudness
+# once the background analysis has measured them
+LOUDNESS_NORMALIZATION = True
+LOUDNESS_TARGET_LUFS = -16.0
+MAX_NORMALIZATION_GAIN_DB = 12.0  # quiet files are not boosted more than this
+LOUDNESS_PEAK_CEILING_DB = -1.0  # nor so far that their true peak goes above this (dBFS)
+LOUDNESS_WORKERS = None  # processes for the analysis pass, None for one per CPU core
+# Volume changes fade in over this long instead of jumping at a frame boundary
+GAIN_RAMP_SECONDS = 0.05
+AUDIO_EXTENSIONS = (".mp3", ".flac", ".wav", ".ogg", ".opus", ".m4a", ".aac", ".wma", ".aiff", ".aif", ".aifc")
+# Mono and stereo WAV, AIFF and raw PCM files of up to 48kHz are read in-process instead of through FFmpeg
+NATIVE_PCM_READER = True
+RAW_PCM_EXTENSIONS = (".pcm", ".raw")  # headerless, assumed to be 48kHz 16-bit stereo
+PLAYLIST_EXTENSIONS = (".m3u", ".m3u8", ".pls")
+# How many FFprobe runs happen at once during an import
+PROBE_WORKERS = 16
+# FFmpeg decoders: spare processes kept started per input kind, the most that may run at once in each
+# process (spares count towards it; opens beyond it are refused), and how long a read may hang before its process is killed. The supervisor checks on them this often
+DECODER_SPARES = 2
+MAX_DECODERS = 32
+DECODER_STUCK_SECONDS = 10.0
+DECODER_REAP_INTERVAL = 5.0
+# Formats FFmpeg can decode from a pipe, so a spare process can take them (MP4/M4A may keep their
+# index at the end of the file and are opened by path instead)
+PIPED_DECODER_EXTENSIONS = (".mp3", ".flac", ".ogg", ".opus", ".aac")
+# Playback benchmark (--bench-playback): every run is appended here as one line of JSON
+BENCH_RESULTS_FILE = "playback_bench.jsonl"
+BENCH_REPEATS = 5  # times each timed action is repeated per stream
+# The "now playing / queue" message the chat commands keep up to date is edited at most this often,
+# showing this many upcoming tracks
+STATUS_EDIT_INTERVAL = 2.0
+STATUS_QUEUE_LINES = 10
+# Folders whose files, subfolders and playlists may be queued by path from the chat. Everything
+# else typed after !play is a library search; any path can still be queued from the window or the API
+CHAT_MUSIC_ROOTS = []
+
+audio_pool = None
+library = None
+
+# Per-thread lists of numbers behind the metrics. Each recording thread gets its own list, so a
+# recording is a plain list update with no lock; a scrape adds the lists up, folding in those of
+# threads that have finished so the set stays small
+class MetricShards:
+    def __init__(self, size):
+        self.size = size
+        self.local = threading.local()
+        self.shards = []  # (thread, counts)
+        self.finished = [0] * size
+        self.lock = threading.Lock()  # only taken on a thread's first recording and by readers
+
+    def mine(self):
+        try:
+            return self.local.counts
+        except AttributeError:
+            counts = self.local.counts = [0] * self.size
+            with self.lock:
+                self.shards.append((threading.current_thread(), counts))
+            return counts
+
+    def totals(self):
+        with self.lock:
+            live = []
+            for thread, counts in self.shards:
+                if thread.is_alive():
+                    live.append((thread, counts))
+                else:
+                    self.finished = [a + b for a, b in zip(self.finished, counts)]
+            self.shards = live
+            return [sum(values) for values in zip(self.finished, *(counts for _, counts in live))]
+
+class Counter(MetricShards):
+    def __init__(self):
+        super().__init__(1)
+
+    def inc(self, amount=1):
+        self.mine()[0] += amount
+
+    def value(self):
+        return self.totals()[0]
+
+# Bucketed timings in seconds; the last two slots are the +Inf bucket and the sum
+class Histogram(MetricShards):
+    BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.02, 0.04, 0.1, 0.25, 1.0)
+
+    def __init__(self, bounds=BUCKETS):
+        super().__init__(len(bounds) + 2)
+        self.bounds = bounds
+
+    def observe(self, value):
+        counts = self.mine()
+        counts[bisect.bisect_left(self.bounds, value)] += 1
+        counts[-1] += value
+
+    # Upper bound of the bucket holding the given quantile, or None before anything was recorded
+    def quantile(self, q):
+        counts = self.totals()[:-1]
+        total = sum(counts)
+        if not total:
+            return None
+        seen = 0
+        for bound, count in zip(self.bounds + (float("inf"),), counts):
+            seen += count
+            if seen >= q * total:
+                return bound if bound != float("inf") else self.bounds[-1]
+
+# Named metrics with optional labels, rendered in Prometheus text format
+class Metrics:
+    def __init__(self):
+        self.families = OrderedDict()  # name -> (type, help, {labels: metric})
+        self.lock = threading.Lock()
+
+    def get(self, kind, name, help_text, make, labels):
+        key = tuple(sorted(labels.items()))
+        family = self.families.get(name)
+        if family is None or key not in family[2]:
+            with self.lock:
+                family = self.families.setdefault(name, (kind, help_text, {}))
+                family[2].setdefault(key, make())
+        return family[2][key]
+
+    def counter(self, name, help_text, **labels):
+        return self.get("counter", name, help_text, Counter, labels)
+
+    def histogram(self, name, help_text, **labels):
+        return self.get("histogram", name, help_text, Histogram, labels)
+
+    # A value read when the metrics are scraped
+    def gauge(self, name, help_text, function, **labels):
+        return self.get("gauge", name, help_text, lambda: function, labels)
+
+    def render(self):
+        lines = []
+        with self.lock:
+            families = [(name, kind, help_text, list(members.items())) for name, (kind, help_text, members) in self.families.items()]
+        for name, kind, help_text, members in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, metric in members:
+                labels = ",".join(f'{label}="{value}"' for label, value in key)
+                if kind == "histogram":
+                    counts = metric.totals()
+                    seen = 0
+                    for bound, count in zip(metric.bounds + ("+Inf",), counts[:-1]):
+                        seen += count
+                        lines.append(f'{name}_bucket{{{labels + "," if labels else ""}le="{bound}"}} {seen}')
+                    lines.append(f"{name}_sum{{{labels}}} {counts[-1]}" if labels else f"{name}_sum {counts[-1]}")
+                    lines.append(f"{name}_count{{{labels}}} {seen}" if labels else f"{name}_count {seen}")
+                else:
+                    value = metric.value() if kind == "counter" else metric()
+                    lines.append(f"{name}{{{labels}}} {value}" if labels else f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+# Recorded on the voice player's thread for every frame
+mixer_read_seconds = metrics.histogram("mixer_frame_read_seconds", "Time the mixer took to hand the voice client one frame")
+music_read_seconds = metrics.histogram("source_frame_read_seconds", "Time to read one frame from a source", source="music")
+effect_read_seconds = metrics.histogram("source_frame_read_seconds", "Time to read one frame from a source", source="quick_sound")
+frame_jitter_seconds = metrics.histogram("voice_frame_jitter_seconds", "How far each frame read strayed from its 20ms slot")
+frame_deadline_misses = metrics.counter("voice_frame_deadline_misses_total", "Frames read more than 20ms after they were due")
+mixer_lock_wait_seconds = metrics.histogram("mixer_lock_wait_seconds", "Time the voice player waited for the mixer lock")
+mixer_lock_hold_seconds = metrics.histogram("mixer_lock_hold_seconds", "Time the voice player held the mixer lock")
+ffmpeg_spawn_seconds = metrics.histogram("ffmpeg_spawn_seconds", "Time to start an FFmpeg decoder process")
+active_decoders = Counter()
+
+# FFmpeg processes running for playback: Opus passthrough readers plus supervised PCM decoders
+def decoders_running():
+    return active_decoders.value() + (decoder_supervisor.running() if decoder_supervisor else 0)
+
+metrics.gauge("ffmpeg_decoders_active", "FFmpeg processes running for playback", decoders_running)
+metrics.gauge("decoder_spares_ready", "Started FFmpeg decoders waiting for input", lambda: decoder_supervisor.spare_count() if decoder_supervisor else 0)
+decoder_reaped = metrics.counter("decoder_reaped_total", "FFmpeg decoders killed because they hung or their source was dropped")
+
+# Starts FFmpeg through discord.py while timing the spawn and counting the process until cleanup
+class MeteredFFmpeg:
+    def __init__(self, *args, **kwargs):
+        self.metered = False
+        started = time.perf_counter()
+        super().__init__(*args, **kwargs)
+        ffmpeg_spawn_seconds.observe(time.perf_counter() - started)
+        active_decoders.inc()
+        self.metered = True
+
+    def cleanup(self):
+        if getattr(self, "metered", False):
+            self.metered = False
+            active_decoders.inc(-1)
+        super().cleanup()
+
+class MeteredFFmpegOpusAudio(MeteredFFmpeg, discord.FFmpegOpusAudio):
+    pass
+
+# Serves the metrics in Prometheus text format at /metrics on the bot's loop
+async def start_metrics_server(host=METRICS_HOST, port=METRICS_PORT):
+    async def handle(reader, writer):
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            while (await reader.readline()).strip():
+                pass
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+            return
+        if len(request_line) >= 2 and request_line[1].partition("?")[0] == "/metrics":
+            status, body = "200 OK", metrics.render().encode()
+        else:
+            status, body = "404 Not Found", b"metrics are at /metrics\n"
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+            + body
+        )
+        try:
+            await writer.drain()
+            writer.close()
+        except ConnectionError:
+            pass
+
+    if not port:
+        return None
+    try:
+        server = await asyncio.start_server(handle, host, port)
+    except OSError as e:
+        print(f"❌ ERROR: Could not serve metrics on {host}:{port}: {e}")
+        return None
+    print(f"📈 Metrics at http://{host}:{port}/metrics")
+    return server
+
+# Catalog of known tracks and quick sounds in SQLite. Rows are written one change at a time,
+# and names are indexed by trigram, so a partial-title search only touches matching rows
+class Library:
+    def __init__(self, path=LIBRARY_DB):
+        self.path = path
+        self.pid = os.getpid()  # the connection must not be used from forked worker processes
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS tracks (
+                id INTEGER PRIMARY KEY,
+                path TEXT UNIQUE NOT NULL,
+                kind TEXT NOT NULL DEFAULT 'track',
+                hash TEXT, hash_mtime REAL, hash_size INTEGER,
+                mtime REAL, size INTEGER,
+                duration REAL, loudness REAL, loudness_mtime REAL, loudness_size INTEGER, loudness_peak REAL,
+                codec TEXT, sample_rate INTEGER,
+                title TEXT, artist TEXT, album TEXT,
+                search_text TEXT NOT NULL DEFAULT ''
+            );
+            CREATE TABLE IF NOT EXISTS trigrams (
+                gram TEXT NOT NULL,
+                track_id INTEGER NOT NULL,
+                PRIMARY KEY (gram, track_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS trigrams_by_track ON trigrams (track_id);
+            CREATE TABLE IF NOT EXISTS quick_sounds (
+                name TEXT PRIMARY KEY,
+                path TEXT NOT NULL
+            );
+        """)
+        # Columns added since the first version of the library
+        columns = {row[1] for row in self.db.execute("PRAGMA table_info(tracks)")}
+        for column, column_type in (("loudness_mtime", "REAL"), ("loudness_size", "INTEGER"), ("loudness_peak", "REAL")):
+            if column not in columns:
+                self.db.execute(f"ALTER TABLE tracks ADD COLUMN {column} {column_type}")
+        self.db.commit()
+        self.import_quick_play_file()
+
+    # Text a track is found by: its tags and file name, lowercased
+    def search_text(self, file_path, title=None, artist=None, album=None):
+        name = os.path.splitext(os.path.basename(file_path))[0]
+        return " ".join(part for part in (artist, title, album, name) if part).lower()
+
+    # Trigrams of the text with spaces around it, so the first letters of each word also
+    # form a gram and short queries can match word prefixes
+    def trigrams(self, text, pad_end=True):
+        text = " " + " ".join(text.split()) + (" " if pad_end else "")
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def index(self, track_id, text, new=False):
+        if not new:
+            self.db.execute("DELETE FROM trigrams WHERE track_id = ?", (track_id,))
+        self.db.executemany("INSERT OR IGNORE INTO trigrams (gram, track_id) VALUES (?, ?)", [(gram, track_id) for gram in self.trigrams(text)])
+        self.db.execute("UPDATE tracks SET search_text = ? WHERE id = ?", (text, track_id))
+
+    # Adds files the library hasn't seen yet; known files are left alone. Big imports are
+    # committed in chunks so searches can run in between
+    def add_files(self, file_paths, kind="track", chunk=1000):
+        added = 0
+        for start in range(0, len(file_paths), chunk):
+            with self.lock:
+                for file_path in file_paths[start:start + chunk]:
+                    cursor = self.db.execute("INSERT OR IGNORE INTO tracks (path, kind) VALUES (?, ?)", (file_path, kind))
+                    if cursor.rowcount:
+                        self.index(cursor.lastrowid, self.search_text(file_path), new=True)
+                        added += 1
+                self.db.commit()
+        return added
+
+    # Saves probe results given as (path, mtime, size, metadata) and re-indexes the names
+    def store_metadata(self, rows):
+        with self.lock:
+            for file_path, mtime, size, metadata in rows:
+                self.db.execute("INSERT OR IGNORE INTO tracks (path) VALUES (?)", (file_path,))
+                self.db.execute(
+                    """UPDATE tracks SET mtime = ?, size = ?, duration = ?, codec = ?, sample_rate = ?, title = ?, artist = ?, album = ?
+                       WHERE path = ?""",
+                    (mtime, size, metadata.get("duration"), metadata.get("codec"), metadata.get("sample_rate"),
+                     metadata.get("title"), metadata.get("artist"), metadata.get("album"), file_path)
+                )
+                track_id = self.db.execute("SELECT id FROM tracks WHERE path = ?", (file_path,)).fetchone()[0]
+                self.index(track_id, self.search_text(file_path, metadata.get("title"), metadata.get("artist"), metadata.get("album")))
+            self.db.commit()
+
+    # Probe results for every file that has been probed: path -> [mtime, size, metadata]
+    def load_metadata(self):
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT path, mtime, size, duration, codec, sample_rate, title, artist, album FROM tracks WHERE mtime IS NOT NULL"
+            ).fetchall()
+        return {
+            row[0]: [row[1], row[2], {"duration": row[3], "codec": row[4], "sample_rate": row[5], "title": row[6], "artist": row[7], "album": row[8]}]
+            for row in rows
+        }
+
+    # Content hash recorded for a file, if the file hasn't changed since
+    def get_hash(self, file_path, mtime, size):
+        if os.getpid() != self.pid:
+            return None
+        with self.lock:
+            row = self.db.execute("SELECT hash, hash_mtime, hash_size FROM tracks WHERE path = ?", (file_path,)).fetchone()
+        if row and row[0] and row[1] == mtime and row[2] == size:
+            return row[0]
+        return None
+
+    # (integrated loudness in LUFS, true peak in dBFS) measured for a file, if the file hasn't
+    # changed since. Rows measured before peaks were kept count as unmeasured
+    def get_loudness(self, file_path, mtime, size):
+        with self.lock:
+            row = self.db.execute("SELECT loudness, loudness_peak, loudness_mtime, loudness_size FROM tracks WHERE path = ?", (file_path,)).fetchone()
+        if row and row[0] is not None and row[1] is not None and row[2] == mtime and row[3] == size:
+            return row[0], row[1]
+        return None
+
+    def set_loudness(self, file_path, mtime, size, lufs, peak):
+        with self.lock:
+            cursor = self.db.execute("INSERT OR IGNORE INTO tracks (path) VALUES (?)", (file_path,))
+            if cursor.rowcount:
+                self.index(cursor.lastrowid, self.search_text(file_path), new=True)
+            self.db.execute(
+                "UPDATE tracks SET loudness = ?, loudness_peak = ?, loudness_mtime = ?, loudness_size = ? WHERE path = ?",
+                (lufs, peak, mtime, size, file_path)
+            )
+            self.db.commit()
+
+    def set_hash(self, file_path, mtime, size, digest):
+        if os.getpid() != self.pid:
+            return
+        with self.lock:
+            cursor = self.db.execute("INSERT OR IGNORE INTO tracks (path) VALUES (?)", (file_path,))
+            if cursor.rowcount:
+                self.index(cursor.lastrowid, self.search_text(file_path), new=True)
+            self.db.execute("UPDATE tracks SET hash = ?, hash_mtime = ?, hash_size = ? WHERE path = ?", (digest, mtime, size, file_path))
+            self.db.commit()
+
+    # Finds tracks whose tags or file name contain the query, shortest names first. Rows are
+    # pulled through the posting list of the query's rarest trigram and checked with instr,
+    # stopping as soon as enough have matched
+    def search(self, query, kind=None, limit=50):
+        text = " ".join(query.lower().split())
+        if not text:
+            return []
+        kind_filter = "AND kind = ?" if kind else ""
+        with self.lock:
+            if len(text) >= 3:
+                # The space-led gram only exists where the query starts a word, so it can't be required
+                grams = self.trigrams(text, pad_end=False) - {" " + text[:2]}
+                counts = {
+                    gram: self.db.execute("SELECT count(*) FROM (SELECT 1 FROM trigrams WHERE gram = ? LIMIT 1000)", (gram,)).fetchone()[0]
+                    for gram in grams
+                }
+                gram = min(counts, key=counts.get)
+                if counts[gram] == 0:
+                    return []
+                rows = self.db.execute(
+                    f"""SELECT path, kind, title, artist, duration, search_text FROM trigrams JOIN tracks ON tracks.id = trigrams.track_id
+                        WHERE gram = ? AND instr(search_text, ?) > 0 {kind_filter} LIMIT ?""",
+                    [gram, text] + ([kind] if kind else []) + [limit]
+                ).fetchall()
+            else:
+                # Too short for a trigram: match words starting with the query
+                rows = self.db.execute(
+                    f"""SELECT DISTINCT path, kind, title, artist, duration, search_text FROM trigrams JOIN tracks ON tracks.id = trigrams.track_id
+                        WHERE gram >= ? AND gram < ? {kind_filter} LIMIT ?""",
+                    [" " + text, " " + text + "\U0010ffff"] + ([kind] if kind else []) + [limit]
+                ).fetchall()
+        rows.sort(key=lambda row: len(row[5]))
+        return [row[:5] for row in rows]
+
+    # Quick sound button assignments: button name -> file path
+    def quick_sounds(self):
+        with self.lock:
+            return dict(self.db.execute("SELECT name, path FROM quick_sounds").fetchall())
+
+    def set_quick_sound(self, name, file_path):
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO quick_sounds (name, path) VALUES (?, ?)", (name, file_path))
+            self.db.commit()
+        self.add_files([file_path], kind="sound")
+
+    # Brings over the assignments from the old quick play text file the first time
+    def import_quick_play_file(self):
+        if not os.path.exists(QUICK_PLAY_FILE):
+            return
+        with self.lock:
+            if self.db.execute("SELECT 1 FROM quick_sounds LIMIT 1").fetchone():
+                return
+        with open(QUICK_PLAY_FILE, "r") as f:
+            for line in f:
+                if ":" in line:
+                    name, path = line.strip().split(":", 1)
+                    self.set_quick_sound(name, path)
+        print(f"📚 Imported quick sounds from {QUICK_PLAY_FILE} into {self.path}")
+
+# Loads quick play sound file paths from the library
+def load_quick_play_files():
+    return library.quick_sounds()
+
+# Saves a quick play sound file path to the library
+def save_quick_play_file(name, file_path):
+    library.set_quick_sound(name, file_path)
+
+# Decodes an audio file to raw 48kHz stereo PCM, in-process for WAV/AIFF/raw or with a single FFmpeg run
+def decode_to_pcm(file_path):
+    info = native_pcm_header(file_path) if NATIVE_PCM_READER else None
+    if info:
+        source = NativePCMAudio(file_path, info)
+        try:
+            return b"".join(iter(source.read, b""))
+        finally:
+            source.cleanup()
+    result = subprocess.run(
+        ["ffmpeg", "-v", "error", "-i", file_path,
+         "-f", "s16le", "-ar", str(SAMPLE_RATE), "-ac", str(CHANNELS), "pipe:1"],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"FFmpeg could not decode {file_path}: {result.stderr.decode(errors='ignore').strip()}")
+    return result.stdout
+
+# Asks FFprobe for the codec of a file's first audio stream
+def probe_codec(file_path):
+    result = subprocess.run(
+        ["ffprobe", "-v", "error", "-select_streams", "a:0", "-show_entries", "stream=codec_name",
+         "-of", "default=nw=1:nk=1", file_path],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    return result.stdout.decode(errors="ignore").strip()
+
+# Asks FFprobe for the length, format and tags of a file
+def probe_metadata(file_path):
+    result = subprocess.run(
+        ["ffprobe", "-v", "error", "-select_streams", "a:0",
+         "-show_entries", "stream=codec_name,sample_rate:format=duration:format_tags=title,artist,album",
+         "-of", "json", file_path],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    try:
+        info = json.loads(result.stdout or b"{}")
+    except ValueError:
+        info = {}
+    stream = (info.get("streams") or [{}])[0]
+    file_format = info.get("format", {})
+    tags = {key.lower(): value for key, value in file_format.get("tags", {}).items()}
+    duration = file_format.get("duration")
+    sample_rate = stream.get("sample_rate")
+    return {
+        "duration": float(duration) if duration not in (None, "N/A") else None,
+        "codec": stream.get("codec_name"),
+        "sample_rate": int(sample_rate) if sample_rate else None,
+        "title": tags.get("title"),
+        "artist": tags.get("artist"),
+        "album": tags.get("album"),
+    }
+
+# Lists the audio files under a folder in name order
+def find_audio_files(folder):
+    return sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(folder)
+        for name in names
+        if name.lower().endswith(AUDIO_EXTENSIONS)
+    )
+
+# Reads the local file entries of an M3U or PLS playlist, resolving them against the playlist's folder
+def read_playlist_file(playlist_path):
+    folder = os.path.dirname(os.path.abspath(playlist_path))
+    entries = []
+    with open(playlist_path, "r", encoding="utf-8-sig", errors="replace") as f:
+        if playlist_path.lower().endswith(".pls"):
+            for line in f:
+                key, _, value = line.strip().partition("=")
+                if key.lower().startswith("file") and value:
+                    entries.append(value)
+        else:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    entries.append(line)
+    files = []
+    for entry in entries:
+        if entry.lower().startswith("file:"):
+            # file:///C:/My%20Music/a.mp3, or file://server/share/a.mp3 for a network share
+            url = urllib.parse.urlparse(entry)
+            host = url.netloc if url.netloc.lower() not in ("", "localhost") else ""
+            entry = urllib.request.url2pathname(("//" + host if host else "") + url.path)
+        elif "://" in entry:
+            print(f"❌ ERROR: Skipping stream entry {entry}")
+            continue
+        files.append(os.path.normpath(os.path.join(folder, entry)))
+    return files
+
+# Collects the tracks to import from a folder, a playlist file or a single audio file
+def collect_tracks(path):
+    if os.path.isdir(path):
+        return find_audio_files(path)
+    if path.lower().endswith(PLAYLIST_EXTENSIONS):
+        return read_playlist_file(path)
+    return [path]
+
+# FFprobe results for library files, saved in the library and reused until a file's size or mtime changes
+class TrackMetadataCache:
+    def __init__(self, library, workers=PROBE_WORKERS):
+        self.library = library
+        self.workers = workers
+        self.entries = library.load_metadata()  # file path -> [mtime, size, metadata]
+        self.lock = threading.Lock()
+
+    # Metadata already known for a file, without touching the disk (safe from the GUI thread)
+    def get(self, file_path):
+        entry = self.entries.get(file_path)
+        return entry[2] if entry else None
+
+    # Metadata for a file if the cached probe still matches it
+    def lookup(self, file_path):
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        entry = self.entries.get(file_path)
+        if entry and entry[0] == stat.st_mtime and entry[1] == stat.st_size:
+            return entry[2]
+        return None
+
+    def probe(self, file_path):
+        stat = os.stat(file_path)
+        metadata = probe_metadata(file_path)
+        with self.lock:
+            self.entries[file_path] = [stat.st_mtime, stat.st_size, metadata]
+        return metadata
+
+    # Probes every file the cache doesn't already cover on a thread pool, handing the
+    # finished paths to on_batch a few times a second rather than once per file
+    def probe_all(self, file_paths, on_batch=None, interval=0.25):
+        missing = [file_path for file_path in dict.fromkeys(file_paths) if self.lookup(file_path) is None]
+        if on_batch and len(missing) < len(file_paths):
+            missing_set = set(missing)
+            on_batch([file_path for file_path in file_paths if file_path not in missing_set])
+        if not missing:
+            return 0
+        print(f"🔎 Probing {len(missing)} file(s)...")
+        batch = []
+        probed = 0
+        last_flush = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self.probe, file_path): file_path for file_path in missing}
+            for future in as_completed(futures):
+                if future.exception() is not None:
+                    print(f"❌ ERROR: Could not probe {futures[future]}: {future.exception()}")
+                    continue
+                probed += 1
+                batch.append(futures[future])
+                if time.perf_counter() - last_flush >= interval:
+                    self.flush(batch, on_batch)
+                    batch = []
+                    last_flush = time.perf_counter()
+        if batch:
+            self.flush(batch, on_batch)
+        print(f"🔎 Probed {probed}/{len(missing)} file(s).")
+        return probed
+
+    # Saves a batch of finished probes to the library and reports them
+    def flush(self, batch, on_batch):
+        self.library.store_metadata([(file_path, *self.entries[file_path]) for file_path in batch])
+        if on_batch:
+            on_batch(batch)
+
+# Hashes a file's contents, remembering the result until the file changes
+file_hashes = {}
+def file_content_hash(file_path):
+    stat = os.stat(file_path)
+    key = (file_path, stat.st_size, stat.st_mtime)
+    if key not in file_hashes:
+        # The library remembers hashes across restarts
+        known = library.get_hash(file_path, stat.st_mtime, stat.st_size) if library else None
+        if known is None:
+            digest = hashlib.sha1()
+            with open(file_path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(chunk)
+            known = digest.hexdigest()
+            if library:
+                library.set_hash(file_path, stat.st_mtime, stat.st_size, known)
+        file_hashes[key] = known
+    return file_hashes[key]
+
+# Where the pre-encoded Opus copy of a file lives. Normalized copies are named after the target
+# they were encoded for, so changing it encodes them again
+def opus_cache_path(file_path):
+    suffix = f".{LOUDNESS_TARGET_LUFS:g}lufs" if LOUDNESS_NORMALIZATION else ""
+    return os.path.join(OPUS_CACHE_DIR, file_content_hash(file_path) + suffix + ".opus")
+
+# Finds an Opus version of a track that can be passed straight through, or None.
+# Only containers that can hold Opus are checked, using the library's probe when it is current,
+# and the answer is kept per (path, mtime) so opening or seeking a track doesn't start FFprobe
+opus_codecs = {}
+def find_opus_source(file_path):
+    try:
+        cached = opus_cache_path(file_path)
+        mtime = os.path.getmtime(file_path)
+    except OSError:
+        return None
+    if os.path.exists(cached):
+        return cached
+    if not file_path.lower().endswith(OPUS_CONTAINER_EXTENSIONS):
+        return None
+    key = (file_path, mtime)
+    if key not in opus_codecs:
+        metadata = track_metadata.lookup(file_path)
+        opus_codecs[key] = (metadata["codec"] if metadata else probe_codec(file_path)) == "opus"
+    return file_path if opus_codecs[key] else None
+
+# Encodes one file into the Opus cache (runs in a worker process)
+def preencode_file(file_path):
+    try:
+        target = opus_cache_path(file_path)
+    except OSError:
+        return False
+    if os.path.exists(target):
+        return True
+    # Bake the loudness gain into the copy, so it can pass through at unity gain and still be normalized
+    gain = []
+    if LOUDNESS_NORMALIZATION:
+        _, _, lufs, peak = measure_loudness(file_path)
+        if lufs is not None:
+            gain = ["-af", f"volume={normalization_gain(lufs, peak):.6f}"]
+    temp_path = target + ".part"
+    result = subprocess.run(
+        ["ffmpeg", "-v", "error", "-y", "-i", file_path, "-vn", "-map_metadata", "-1", *gain,
+         "-c:a", "libopus", "-b:a", "128k", "-ar", str(SAMPLE_RATE), "-ac", str(CHANNELS),
+         "-frame_duration", "20", "-f", "opus", temp_path],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    if result.returncode != 0:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return False
+    os.replace(temp_path, target)
+    return True
+
+# Measures a file's EBU R128 integrated loudness and true peak with FFmpeg (runs in a worker process).
+# Returns (mtime, size, LUFS, peak dBFS), with LUFS None for silence or files FFmpeg can't read
+def measure_loudness(file_path):
+    stat = os.stat(file_path)
+    result = subprocess.run(
+        ["ffmpeg", "-nostats", "-i", file_path, "-vn", "-af", "ebur128=framelog=quiet:peak=true", "-f", "null", "-"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    output = result.stderr.decode(errors="ignore")
+    values = re.findall(r"I:\s+(-?[\d.]+) LUFS", output)
+    peaks = re.findall(r"Peak:\s+(-?[\d.]+|-inf) dBFS", output)
+    lufs = float(values[-1]) if result.returncode == 0 and values else None
+    if lufs is not None and lufs <= -70.0:
+        lufs = None  # nothing above the absolute gate
+    peak = float(peaks[-1]) if peaks else 0.0  # without a reading, assume the file already reaches full scale
+    return stat.st_mtime, stat.st_size, lufs, peak
+
+# Linear gain that brings a measured file to the target loudness, limited so quiet tracks with
+# loud peaks are not boosted into clipping
+def normalization_gain(lufs, peak):
+    gain_db = min(LOUDNESS_TARGET_LUFS - lufs, MAX_NORMALIZATION_GAIN_DB, LOUDNESS_PEAK_CEILING_DB - peak)
+    return 10 ** (gain_db / 20)
+
+# Background loudness analysis: measures files in a process pool, stores the results in the
+# library and turns them into the gain each track or sound is played with
+class LoudnessAnalyzer:
+    def __init__(self, library, workers=LOUDNESS_WORKERS):
+        self.library = library
+        self.workers = workers
+        self.executor = None
+        self.pending = {}  # file path -> future of its measurement
+        self.known = {}  # file path -> (mtime, size, (LUFS, peak)), so quick sounds don't wait on the database
+        self.lock = threading.Lock()
+
+    # Linear gain that brings a file to the target loudness, or 1.0 until it has been measured
+    def gain(self, file_path):
+        if not LOUDNESS_NORMALIZATION:
+            return 1.0
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return 1.0
+        known = self.known.get(file_path)
+        if known and known[0] == stat.st_mtime and known[1] == stat.st_size:
+            loudness = known[2]
+        else:
+            loudness = self.library.get_loudness(file_path, stat.st_mtime, stat.st_size)
+            if loudness is None:
+                self.schedule([file_path])  # normalized from the next play on
+                return 1.0
+            self.known[file_path] = (stat.st_mtime, stat.st_size, loudness)
+        return normalization_gain(*loudness)
+
+    # Gain from measurements already in memory, or None if the file hasn't been looked up yet.
+    # It touches neither the disk nor the database, which an import can hold for a while
+    def cached_gain(self, file_path):
+        if not LOUDNESS_NORMALIZATION:
+            return 1.0
+        known = self.known.get(file_path)
+        return normalization_gain(*known[2]) if known else None
+
+    # Queues files whose loudness isn't known yet for measuring
+    def schedule(self, file_paths):
+        if not LOUDNESS_NORMALIZATION:
+            return
+        submitted = []
+        for file_path in file_paths:
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+            loudness = self.library.get_loudness(file_path, stat.st_mtime, stat.st_size)
+            if loudness is not None:
+                self.known[file_path] = (stat.st_mtime, stat.st_size, loudness)  # ready for cached_gain
+                continue
+            with self.lock:
+                if file_path in self.pending:
+                    continue
+                if self.executor is None:
+                    self.executor = ProcessPoolExecutor(max_workers=self.workers)
+                future = self.executor.submit(measure_loudness, file_path)
+                self.pending[file_path] = future
+            future.add_done_callback(lambda future, file_path=file_path: self.finished(file_path, future))
+            submitted.append(file_path)
+        if submitted:
+            print(f"🔊 Measuring loudness of {len(submitted)} file(s) in the background...")
+
+    def finished(self, file_path, future):
+        with self.lock:
+            self.pending.pop(file_path, None)
+        if future.cancelled():
+            return
+        try:
+            mtime, size, lufs, peak = future.result()
+        except Exception as e:
+            print(f"❌ ERROR: Could not measure loudness of {file_path}: {e}")
+            return
+        if lufs is not None:
+            self.known[file_path] = (mtime, size, (lufs, peak))
+            self.library.set_loudness(file_path, mtime, size, lufs, peak)
+
+    def shutdown(self):
+        with self.lock:
+            futures = list(self.pending.values())
+        for future in futures:
+            future.cancel()
+        if self.executor:
+            self.executor.shutdown(wait=False)
+
+# Pre-encodes every audio file in a folder to the Opus cache using all CPU cores
+def preencode_folder(folder):
+    os.makedirs(OPUS_CACHE_DIR, exist_ok=True)
+    files = find_audio_files(folder)
+    print(f"📦 Pre-encoding {len(files)} file(s) from {folder}...")
+    done = 0
+    with ProcessPoolExecutor() as executor:
+        for file_path, ok in zip(files, executor.map(preencode_file, files)):
+            if ok:
+                done += 1
+            else:
+                print(f"❌ ERROR: Could not pre-encode {file_path}")
+    print(f"📦 Pre-encoded {done}/{len(files)} file(s) into {OPUS_CACHE_DIR}.")
+    return done
+
+# Plays a decoded track from the disk cache by slicing frames out of a memory map, no FFmpeg involved
+class MappedPCMAudio(discord.AudioSource):
+    file = map = view = None  # stay unset when the file can't be opened or mapped, and cleanup still runs then
+
+    def __init__(self, pcm_path):
+        self.file = open(pcm_path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.map)
+        self.position = 0
+
+    def read(self):
+        frame = self.view[self.position:self.position + FRAME_SIZE]
+        self.position += len(frame)
+        return frame
+
+    # Jumps straight to a time in the track
+    def seek(self, seconds):
+        self.position = min(int(seconds / 0.02) * FRAME_SIZE, len(self.view))
+
+    def is_opus(self):
+        return False
+
+    def cleanup(self):
+        try:
+            if self.view is not None:
+                self.view.release()
+            if self.map is not None:
+                self.map.close()
+        except BufferError:
+            pass  # a frame is still in use somewhere; the map closes when it is garbage collected
+        if self.file:
+            self.file.close()
+
+# Reads the header of a WAV, AIFF/AIFC or raw PCM file. Returns a dict describing the sample
+# data (offset, size, rate, channels, width, is_float, big_endian), or None for anything else
+def read_audio_header(file_path):
+    if file_path.lower().endswith(RAW_PCM_EXTENSIONS):
+        try:
+            size = os.path.getsize(file_path)
+        except OSError:
+            return None
+        return {"offset": 0, "size": size, "rate": SAMPLE_RATE, "channels": CHANNELS, "width": 2, "is_float": False, "big_endian": False}
+    try:
+        with open(file_path, "rb") as f:
+            head = f.read(12)
+            if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+                return read_wav_chunks(f)
+            if head[:4] == b"FORM" and head[8:12] in (b"AIFF", b"AIFC"):
+                return read_aiff_chunks(f, head[8:12] == b"AIFC")
+    except (OSError, ValueError, struct.error):
+        pass
+    return None
+
+def read_wav_chunks(f):
+    info = None
+    while True:
+        chunk = f.read(8)
+        if len(chunk) < 8:
+            return None
+        chunk_id, chunk_size = chunk[:4], struct.unpack("<I", chunk[4:])[0]
+        if chunk_id == b"fmt ":
+            fmt = f.read(chunk_size)
+            audio_format, channels, rate, _, _, bits = struct.unpack("<HHIIHH", fmt[:16])
+            if audio_format == 0xFFFE and len(fmt) >= 26:  # WAVE_FORMAT_EXTENSIBLE: real format is in the sub-format GUID
+                audio_format = struct.unpack("<H", fmt[24:26])[0]
+            if audio_format not in (1, 3) or bits not in (8, 16, 24, 32, 64) or not channels:
+                return None
+            info = {"rate": rate, "channels": channels, "width": bits // 8, "is_float": audio_format == 3, "big_endian": False}
+            f.seek(chunk_size & 1, 1)
+        elif chunk_id == b"data":
+            if info is None:
+                return None
+            info["offset"] = f.tell()
+            end = f.seek(0, 2)
+            info["size"] = min(chunk_size, end - info["offset"]) if chunk_size not in (0, 0xFFFFFFFF) else end - info["offset"]
+            return info
+        else:
+            f.seek(chunk_size + (chunk_size & 1), 1)
+
+def read_aiff_chunks(f, compressed):
+    info = None
+    while True:
+        chunk = f.read(8)
+        if len(chunk) < 8:
+            return None
+        chunk_id, chunk_size = chunk[:4], struct.unpack(">I", chunk[4:])[0]
+        if chunk_id == b"COMM":
+            comm = f.read(chunk_size)
+            channels, _, bits = struct.unpack(">hIh", comm[:8])
+            exponent, mantissa = struct.unpack(">HQ", comm[8:18])  # 80-bit extended float sample rate
+            rate = int(round(mantissa * 2.0 ** ((exponent & 0x7FFF) - 16383 - 63)))
+            compression = comm[18:22] if compressed else b"NONE"
+            if compression in (b"NONE", b"twos"):
+                info = {"is_float": False, "big_endian": True}
+            elif compression == b"sowt":
+                info = {"is_float": False, "big_endian": False}
+            elif compression in (b"fl32", b"FL32"):
+                info, bits = {"is_float": True, "big_endian": True}, 32
+            elif compression in (b"fl64", b"FL64"):
+                info, bits = {"is_float": True, "big_endian": True}, 64
+            else:
+                return None
+            if bits not in (8, 16, 24, 32, 64) or channels <= 0 or rate <= 0:
+                return None
+            info.update(rate=rate, channels=channels, width=(bits + 7) // 8)
+            f.seek(chunk_size & 1, 1)
+        elif chunk_id == b"SSND":
+            if info is None:
+                return None
+            offset = struct.unpack(">I", f.read(8)[:4])[0]
+            info["offset"] = f.tell() + offset
+            end = f.seek(0, 2)
+            info["size"] = min(chunk_size - 8 - offset, end - info["offset"])
+            return info
+        else:
+            f.seek(chunk_size + (chunk_size & 1), 1)
+
+# Converts raw sample bytes to float32 frames (one row per frame) on the 16-bit scale
+def samples_to_float(data, info):
+    width, channels = info["width"], info["channels"]
+    data = data[:len(data) - len(data) % (width * channels)]
+    order = ">" if info["big_endian"] else "<"
+    if info["is_float"]:
+        samples = np.frombuffer(data, dtype=f"{order}f{width}").astype(np.float32) * 32767
+    elif width == 1:
+        # WAV stores 8-bit audio unsigned, AIFF signed
+        samples = np.frombuffer(data, dtype=np.int8 if info["big_endian"] else np.uint8).astype(np.float32)
+        samples = (samples if info["big_endian"] else samples - 128) * 256
+    elif width == 3:
+        raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        if info["big_endian"]:
+            raw = raw[:, ::-1]
+        samples = ((raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)) << 8 >> 8).astype(np.float32) / 256
+    else:
+        samples = np.frombuffer(data, dtype=f"{order}i{width}").astype(np.float32) / (1 << (8 * width - 16))
+    samples = samples.reshape(-1, channels)
+    if channels == 1:
+        return np.repeat(samples, 2, axis=1)
+    return samples
+
+# Header of a file the in-process reader converts as well as FFmpeg would, or None. More than two
+# channels need a proper downmix and higher sample rates a low-pass filter before downsampling,
+# so those files still go through FFmpeg
+def native_pcm_header(file_path):
+    info = read_audio_header(file_path)
+    if info is None or info["channels"] > CHANNELS or info["rate"] > SAMPLE_RATE:
+        return None
+    return info
+
+# Streams 48kHz stereo frames from a WAV, AIFF or raw PCM file without an FFmpeg process.
+# 16-bit stereo at 48kHz goes straight from the file; anything else (mono or stereo, at most
+# 48kHz) is converted a second at a time, with mono doubled and the rate raised by linear
+# interpolation in NumPy
+class NativePCMAudio(discord.AudioSource):
+    CHUNK_FRAMES = 50  # output frames converted per file read once playback is under way
+    file = None  # stays unset when the file is refused, and cleanup still runs then
+
+    def __init__(self, file_path, info=None):
+        self.info = info or native_pcm_header(file_path)
+        if self.info is None:
+            raise ValueError(f"{file_path} is not a mono or stereo WAV, AIFF or raw PCM file of at most {SAMPLE_RATE} Hz")
+        self.file = open(file_path, "rb")
+        self.direct = (self.info["rate"] == SAMPLE_RATE and self.info["channels"] == CHANNELS and self.info["width"] == 2
+                       and not self.info["is_float"] and not self.info["big_endian"])
+        self.step = self.info["rate"] / SAMPLE_RATE  # input frames per output frame
+        self.frame_bytes = self.info["width"] * self.info["channels"]
+        self.seek(0)
+
+    # Jumps straight to a time in the file
+    def seek(self, seconds):
+        frame = min(int(seconds * self.info["rate"]), self.info["size"] // self.frame_bytes)
+        self.file.seek(self.info["offset"] + frame * self.frame_bytes)
+        self.remaining = self.info["size"] - frame * self.frame_bytes
+        self.carry = np.zeros((0, 2), dtype=np.float32)  # input frames not yet interpolated past
+        self.phase = 0.0  # position of the next output frame within carry
+        self.output = b""
+        self.output_position = 0
+        self.chunk_frames = 1  # start small so the first frame is quick, then double up to CHUNK_FRAMES
+
+    def read(self):
+        if self.direct:
+            data = self.file.read(min(FRAME_SIZE, self.remaining))
+            self.remaining -= len(data)
+            return data
+        while len(self.output) - self.output_position < FRAME_SIZE and self.fill():
+            pass
+        frame = self.output[self.output_position:self.output_position + FRAME_SIZE]
+        self.output_position += len(frame)
+        return frame
+
+    # Converts the next chunk of the file; returns False once there is nothing left
+    def fill(self):
+        wanted = int(self.chunk_frames * FRAME_SIZE // 4 * self.step) + 2
+        self.chunk_frames = min(self.chunk_frames * 2, self.CHUNK_FRAMES)
+        data = self.file.read(min(wanted * self.frame_bytes, self.remaining))
+        self.remaining -= len(data)
+        at_end = self.remaining <= 0 or not data
+        samples = np.concatenate((self.carry, samples_to_float(data, self.info))) if data else self.carry
+        if self.step == 1.0:
+            out, self.carry = samples, samples[:0]
+        else:
+            # Interpolate every output frame that has both neighbours available (or all of them at the end)
+            last = len(samples) - 1 if at_end else len(samples) - 2
+            count = int((last - self.phase) // self.step) + 1 if last >= self.phase else 0
+            out = np.empty((count, 2), dtype=np.float32)
+            if count:
+                positions = self.phase + self.step * np.arange(count)
+                base = np.arange(len(samples))
+                out[:, 0] = np.interp(positions, base, samples[:, 0])
+                out[:, 1] = np.interp(positions, base, samples[:, 1])
+            self.phase += self.step * count
+            consumed = min(int(self.phase), len(samples))
+            self.carry = samples[consumed:]
+            self.phase -= consumed
+        np.clip(out, -32768, 32767, out=out)
+        self.output = self.output[self.output_position:] + out.astype(np.int16).tobytes()
+        self.output_position = 0
+        if at_end:
+            self.carry = self.carry[:0]
+        return not at_end or len(out) > 0
+
+    def is_opus(self):
+        return False
+
+    def cleanup(self):
+        if self.file:
+            self.file.close()
+
+# One FFmpeg process decoding to 48kHz stereo PCM, reading its input from a pipe or from a path
+class DecoderProcess:
+    def __init__(self, input_args):
+        started = time.perf_counter()
+        try:
+            self.process = subprocess.Popen(
+                ["ffmpeg", "-hide_banner", "-loglevel", "warning", *input_args,
+                 "-f", "s16le", "-ar", str(SAMPLE_RATE), "-ac", str(CHANNELS), "pipe:1"],
+                stdin=subprocess.PIPE if "pipe:0" in input_args else subprocess.DEVNULL, stdout=subprocess.PIPE
+            )
+        except FileNotFoundError:
+            raise discord.ClientException("ffmpeg was not found.") from None
+        ffmpeg_spawn_seconds.observe(time.perf_counter() - started)
+        self.owner = None  # weak reference to the source reading from it
+        self.reading_since = None  # start of a read that hasn't returned yet
+        self.last_read = time.monotonic()
+
+    def kill(self):
+        if self.process.poll() is None:
+            self.process.kill()
+            try:
+                self.process.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                print(f"⚠️ FFmpeg process {self.process.pid} did not exit after being killed.")
+        for pipe in (self.process.stdin, self.process.stdout):
+            if pipe:
+                try:
+                    pipe.close()
+                except OSError:
+                    pass
+
+# PCM source reading from a supervised FFmpeg process. Piped processes are fed the file from offset by
+# a writer thread, and skip_bytes of output are dropped first so a seek lands on the exact sample
+class SupervisedDecoderAudio(discord.AudioSource):
+    def __init__(self, supervisor, decoder, file_path=None, offset=0, skip_bytes=0):
+        self.supervisor = supervisor
+        self.decoder = decoder
+        self.skip_bytes = skip_bytes
+        decoder.owner = weakref.ref(self)
+        if file_path is not None:
+            threading.Thread(target=self.feed, args=(decoder.process.stdin, file_path, offset), daemon=True).start()
+
+    @staticmethod
+    def feed(stdin, file_path, offset):
+        try:
+            with open(file_path, "rb") as f:
+                f.seek(offset)
+                for chunk in iter(lambda: f.read(64 * 1024), b""):
+                    stdin.write(chunk)
+        except (OSError, ValueError):
+            pass  # the decoder was stopped before it had the whole file
+        finally:
+            try:
+                stdin.close()
+            except OSError:
+                pass
+
+    def read(self):
+        decoder = self.decoder
+        decoder.reading_since = time.monotonic()
+        try:
+            while self.skip_bytes:
+                dropped = decoder.process.stdout.read(min(self.skip_bytes, 64 * 1024))
+                if not dropped:
+                    return b""
+                self.skip_bytes -= len(dropped)
+            data = decoder.process.stdout.read(FRAME_SIZE)
+        except (OSError, ValueError):
+            return b""
+        finally:
+            decoder.reading_since = None
+            decoder.last_read = time.monotonic()
+        return data if len(data) == FRAME_SIZE else b""
+
+    def is_opus(self):
+        return False
+
+    def cleanup(self):
+        self.supervisor.release(self.decoder)
+
+# Hands out FFmpeg decoders and looks after them. A few processes per input kind are started ahead
+# of time reading from a pipe, so opening a track or seeking doesn't wait for a process to start.
+# No more than limit processes run at once, spares included, and a background thread kills decoders
+# that hang in a read or whose source was dropped without being cleaned up, so long sessions keep a
+# flat process count
+class DecoderSupervisor:
+    def __init__(self, spares=DECODER_SPARES, limit=MAX_DECODERS):
+        self.pid = os.getpid()
+        self.spares_wanted = spares
+        self.limit = limit
+        self.spares = {"mp3": deque(), "piped": deque()}  # input kind -> processes waiting for input
+        self.live = set()  # decoders handed out to sources
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.failed = False  # FFmpeg couldn't be started, so stop trying to keep spares
+        self.stopped = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while not self.stopped:
+            self.refill()
+            self.reap()
+            self.wake.wait(DECODER_REAP_INTERVAL)
+            self.wake.clear()
+
+    # Starts spares until each input kind has enough
+    def refill(self):
+        for kind, spares in self.spares.items():
+            while not self.failed and not self.stopped and len(spares) < self.spares_wanted and self.process_count() < self.limit:
+                try:
+                    decoder = DecoderProcess(["-f", "mp3", "-i", "pipe:0"] if kind == "mp3" else ["-i", "pipe:0"])
+                except (discord.ClientException, OSError) as e:
+                    print(f"❌ ERROR: Could not start spare decoders: {e}")
+                    self.failed = True
+                    return
+                with self.lock:
+                    spares.append(decoder)
+
+    # Kills decoders that hang in a read or lost their source, and drops spares that died
+    def reap(self):
+        now = time.monotonic()
+        with self.lock:
+            decoders = list(self.live)
+            for spares in self.spares.values():
+                for decoder in [decoder for decoder in spares if decoder.process.poll() is not None]:
+                    spares.remove(decoder)
+        for decoder in decoders:
+            if decoder.owner is not None and decoder.owner() is None:
+                print(f"🧹 Killing FFmpeg process {decoder.process.pid}: its source was dropped without cleanup")
+                self.release(decoder)
+                decoder_reaped.inc()
+            elif decoder.reading_since is not None and now - decoder.reading_since > DECODER_STUCK_SECONDS:
+                print(f"🧹 Killing FFmpeg process {decoder.process.pid}: no output for {now - decoder.reading_since:.0f}s")
+                decoder.kill()  # the blocked read returns and the track ends like any other
+                decoder_reaped.inc()
+
+    # Decoder processes handed out and still running
+    def running(self):
+        with self.lock:
+            return sum(1 for decoder in self.live if decoder.process.poll() is None)
+
+    def spare_count(self):
+        with self.lock:
+            return sum(len(spares) for spares in self.spares.values())
+
+    # Every decoder process this supervisor has running, spares included; the limit applies to this
+    def process_count(self):
+        with self.lock:
+            return sum(1 for decoder in self.live if decoder.process.poll() is None) + sum(len(spares) for spares in self.spares.values())
+
+    # Frees a slot for a new process once the limit is reached. Decoders whose source is gone are
+    # reaped and then a spare is given up, but a decoder a source still owns is never stopped: if
+    # they are all in use the open is refused and the track fails like one FFmpeg can't read
+    def make_room(self):
+        if self.process_count() < self.limit:
+            return
+        self.reap()
+        if self.process_count() < self.limit:
+            return
+        with self.lock:
+            spares = max(self.spares.values(), key=len)
+            spare = spares.popleft() if spares else None
+        if spare is None:
+            raise discord.ClientException(f"{self.limit} FFmpeg decoders are already in use.")
+        spare.kill()
+
+    # Opens a file at start seconds. Formats that stream go to a spare process through a pipe (MP3s
+    # from the seek point's byte offset); the rest, and non-MP3 seeks, get a new process on the path
+    def open(self, file_path, start=0.0, seek_point=None):
+        kind = None
+        if file_path.lower().endswith(".mp3") and (seek_point or not start):
+            kind = "mp3"
+        elif file_path.lower().endswith(PIPED_DECODER_EXTENSIONS) and not start:
+            kind = "piped"
+        if kind is None:
+            self.make_room()
+            decoder = DecoderProcess(["-ss", f"{start:.3f}", "-i", file_path] if start else ["-i", file_path])
+            with self.lock:
+                self.live.add(decoder)
+            return SupervisedDecoderAudio(self, decoder)
+        with self.lock:
+            decoder = self.spares[kind].popleft() if self.spares[kind] else None
+        if decoder is None or decoder.process.poll() is not None:
+            self.make_room()  # taking a spare doesn't add a process, starting one here does
+            decoder = DecoderProcess(["-f", "mp3", "-i", "pipe:0"] if kind == "mp3" else ["-i", "pipe:0"])
+        with self.lock:
+            self.live.add(decoder)
+        self.wake.set()  # start a replacement spare
+        offset, skip = seek_point or (0, 0.0)
+        return SupervisedDecoderAudio(self, decoder, file_path, offset, int(skip * SAMPLE_RATE) * CHANNELS * 2)
+
+    def release(self, decoder):
+        with self.lock:
+            self.live.discard(decoder)
+        decoder.kill()
+
+    def shutdown(self):
+        self.stopped = True
+        self.wake.set()
+        with self.lock:
+            decoders = list(self.live) + [decoder for spares in self.spares.values() for decoder in spares]
+            self.live.clear()
+            for spares in self.spares.values():
+                spares.clear()
+        for decoder in decoders:
+            decoder.kill()
+
+decoder_supervisor = None
+
+# This process's decoder supervisor, started on first use (audio worker processes get their own)
+def get_decoder_supervisor():
+    global decoder_supervisor
+    if decoder_supervisor is None or decoder_supervisor.pid != os.getpid():
+        decoder_supervisor = DecoderSupervisor()
+    return decoder_supervisor
+
+# Opens a file for decoding to PCM: WAV, AIFF and raw PCM are read in-process, everything else through
+# a supervised FFmpeg decoder. Decoding starts at start seconds; an MP3 seek point from
+# MP3SeekIndex.locate() lets FFmpeg begin at the right frame instead of decoding everything before it
+def open_pcm_decoder(file_path, start=0.0, seek_point=None):
+    info = native_pcm_header(file_path) if NATIVE_PCM_READER else None
+    if info:
+        source = NativePCMAudio(file_path, info)
+        if start:
+            source.seek(start)
+        return source
+    return get_decoder_supervisor().open(file_path, start, seek_point)
+
+# CPU time used by this process and its finished child processes
+def cpu_seconds():
+    times = os.times()
+    return time.process_time() + times.children_user + times.children_system
+
+# Compares the in-process reader with FFmpeg on one file: time to the first frame (process spawn
+# plus header parsing) and steady-state CPU per second of audio produced
+def benchmark_decoders(file_path, frames=500):
+    results = {}
+    for name, make in (("native", lambda: NativePCMAudio(file_path)), ("ffmpeg", lambda: discord.FFmpegPCMAudio(file_path))):
+        started = time.perf_counter()
+        try:
+            source = make()
+            first = source.read()
+        except Exception as e:
+            print(f"❌ ERROR: {name} decoder could not open {file_path}: {e}")
+            continue
+        first_frame = time.perf_counter() - started
+        cpu_started = cpu_seconds()
+        count = 0
+        while count < frames and source.read():
+            count += 1
+        source.cleanup()  # FFmpeg's CPU time is only counted once the process has been reaped
+        cpu = cpu_seconds() - cpu_started
+        results[name] = {
+            "first_frame_ms": round(first_frame * 1000, 2),
+            "cpu_ms_per_audio_second": round(cpu / max(count * 0.02, 0.02) * 1000, 2),
+            "frames": count + (1 if first else 0),
+        }
+        print(f"⏱️ {name}: first frame after {results[name]['first_frame_ms']} ms, "
+              f"{results[name]['cpu_ms_per_audio_second']} ms CPU per second of audio over {count} frames")
+    return results
+
+# Layer III bitrates in kbps by bitrate index, for MPEG-1 and for MPEG-2/2.5
+MP3_BITRATES = {
+    True: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    False: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+# Sample rates by the header's version bits (3 = MPEG-1, 2 = MPEG-2, 0 = MPEG-2.5)
+MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+# Reads the MPEG audio frame header at pos: (frame length, sample rate, samples per frame, mono, MPEG-1),
+# or None if there is no valid Layer III header there
+def parse_mp3_frame_header(data, pos):
+    if pos + 4 > len(data) or data[pos] != 0xFF or data[pos + 1] & 0xE0 != 0xE0:
+        return None
+    version = (data[pos + 1] >> 3) & 3
+    layer = (data[pos + 1] >> 1) & 3
+    bitrate_index = data[pos + 2] >> 4
+    rate_index = (data[pos + 2] >> 2) & 3
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return None  # reserved values, free format, or not Layer III
+    mpeg1 = version == 3
+    sample_rate = MP3_SAMPLE_RATES[version][rate_index]
+    padding = (data[pos + 2] >> 1) & 1
+    length = (144 if mpeg1 else 72) * MP3_BITRATES[mpeg1][bitrate_index] * 1000 // sample_rate + padding
+    return length, sample_rate, 1152 if mpeg1 else 576, data[pos + 3] >> 6 == 3, mpeg1
+
+# Byte offset of every audio frame in an MP3, so a time maps straight to a place in the file.
+# Samples are counted the way FFmpeg decodes the file from the start: the encoder delay from the
+# LAME tag plus the decoder's own 529 samples are skipped before the first audible one
+class MP3SeekIndex:
+    def __init__(self, sample_rate, samples_per_frame, start_skip, end_skip, offsets):
+        self.sample_rate = sample_rate
+        self.samples_per_frame = samples_per_frame
+        self.start_skip = start_skip
+        self.end_skip = end_skip
+        self.offsets = offsets
+
+    # Scans the frame headers of a file; returns None if it doesn't look like an MP3
+    @classmethod
+    def build(cls, file_path):
+        with open(file_path, "rb") as f:
+            data = f.read()
+        pos = 0
+        if data[:3] == b"ID3" and len(data) >= 10:
+            pos = 10 + (data[6] << 21 | data[7] << 14 | data[8] << 7 | data[9]) + (10 if data[5] & 0x10 else 0)
+        first = None
+        start_skip = end_skip = 0
+        offsets = []
+        while pos + 4 <= len(data):
+            header = parse_mp3_frame_header(data, pos)
+            if header is None or (first and header[1:3] != first[1:3]):
+                pos = cls.resync(data, pos + 1, first)
+                if pos is None:
+                    break
+                continue
+            if first is None:
+                first = header
+                start_skip, end_skip, is_info = cls.read_info_frame(data, pos, header)
+                if is_info:
+                    pos += header[0]  # the Xing/Info frame carries no audio
+                    continue
+            offsets.append(pos)
+            pos += header[0]
+        if not offsets:
+            return None
+        return cls(first[1], first[2], start_skip, end_skip, np.array(offsets, dtype=np.int64))
+
+    # Finds the next frame after junk or a stray tag: a header followed by another one where it says it ends
+    @staticmethod
+    def resync(data, pos, first):
+        while True:
+            pos = data.find(b"\xff", pos)
+            if pos < 0:
+                return None
+            header = parse_mp3_frame_header(data, pos)
+            if header and (first is None or header[1:3] == first[1:3]):
+                following = parse_mp3_frame_header(data, pos + header[0])
+                if following and following[1:3] == header[1:3]:
+                    return pos
+            pos += 1
+
+    # Checks the first frame for a Xing/Info header and reads the encoder delay and padding from its
+    # LAME tag: (samples skipped at the start, samples dropped at the end, is an info frame)
+    @staticmethod
+    def read_info_frame(data, pos, header):
+        _, _, _, mono, mpeg1 = header
+        tag = pos + 4 + ((17 if mono else 32) if mpeg1 else (9 if mono else 17))  # after the side information
+        if data[tag:tag + 4] not in (b"Xing", b"Info"):
+            return 0, 0, False
+        flags = int.from_bytes(data[tag + 4:tag + 8], "big")
+        lame = tag + 8 + (4 if flags & 1 else 0) + (4 if flags & 2 else 0) + (100 if flags & 4 else 0) + (4 if flags & 8 else 0)
+        if data[lame:lame + 4] not in (b"LAME", b"Lavf", b"Lavc") or len(data) < lame + 24:
+            return 0, 0, True
+        delay = data[lame + 21] << 4 | data[lame + 22] >> 4
+        padding = (data[lame + 22] & 0x0F) << 8 | data[lame + 23]
+        return delay + 529, padding, True
+
+    # Length of the audio in seconds
+    def duration(self):
+        samples = len(self.offsets) * self.samples_per_frame - self.start_skip - self.end_skip
+        return max(samples, 0) / self.sample_rate
+
+    # Where to start decoding for a time in seconds: (byte offset, seconds of decoded audio to drop).
+    # Decoding begins a few frames early because a frame's data may live in the frames before it
+    def locate(self, seconds):
+        sample = int(seconds * self.sample_rate) + self.start_skip
+        frame = min(sample // self.samples_per_frame, len(self.offsets) - 1)
+        first = max(frame - MP3_PRIMING_FRAMES, 0)
+        return int(self.offsets[first]), (sample - first * self.samples_per_frame) / self.sample_rate
+
+    def save(self, path):
+        header = np.array([self.sample_rate, self.samples_per_frame, self.start_skip, self.end_skip], dtype=np.int64)
+        np.save(path, np.concatenate((header, self.offsets)))
+
+    @classmethod
+    def load(cls, path):
+        values = np.load(path)
+        return cls(int(values[0]), int(values[1]), int(values[2]), int(values[3]), values[4:])
+
+# MP3 seek indexes already loaded, by file path: (size, mtime, index or None)
+mp3_seek_indexes = {}
+
+# Returns the seek index of an MP3, reading it from SEEK_INDEX_DIR or building and saving it the first
+# time; None for files that aren't MP3s or can't be read
+def load_mp3_seek_index(file_path):
+    if not file_path.lower().endswith(".mp3"):
+        return None
+    try:
+        stat = os.stat(file_path)
+        known = mp3_seek_indexes.get(file_path)
+        if known and known[:2] == (stat.st_size, stat.st_mtime):
+            return known[2]
+        cached = os.path.join(SEEK_INDEX_DIR, file_content_hash(file_path) + ".npy")
+        index = None
+        if os.path.exists(cached):
+            try:
+                index = MP3SeekIndex.load(cached)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Rebuilding unreadable seek index for {file_path}: {e}")
+        if index is None:
+            index = MP3SeekIndex.build(file_path)
+            if index is not None:
+                os.makedirs(SEEK_INDEX_DIR, exist_ok=True)
+                index.save(cached)
+    except OSError as e:
+        print(f"❌ ERROR: Could not index {file_path} for seeking: {e}")
+        return None
+    mp3_seek_indexes[file_path] = (stat.st_size, stat.st_mtime, index)
+    return index
+
+# Size-limited folder of tracks decoded to raw PCM, keyed by content hash and mtime, least recently used evicted first
+class PCMDiskCache:
+    def __init__(self, folder=PCM_CACHE_DIR, limit=PCM_CACHE_LIMIT):
+        self.folder = folder
+        self.limit = limit
+        self.entries = OrderedDict()  # cache file name -> size
+        self.total_size = 0
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        if os.path.isdir(folder):
+            names = [name for name in os.listdir(folder) if name.endswith(".pcm")]
+            for name in sorted(names, key=lambda name: os.path.getmtime(os.path.join(folder, name))):
+                size = os.path.getsize(os.path.join(folder, name))
+                self.entries[name] = size
+                self.total_size += size
+
+    def cache_name(self, file_path):
+        return f"{file_content_hash(file_path)}-{int(os.path.getmtime(file_path))}.pcm"
+
+    # Returns the cached PCM file for a track, or None if it hasn't been decoded yet
+    def lookup(self, file_path):
+        try:
+            name = self.cache_name(file_path)
+        except OSError:
+            return None
+        with self.lock:
+            if name not in self.entries:
+                return None
+            self.entries.move_to_end(name)
+        path = os.path.join(self.folder, name)
+        try:
+            os.utime(path)  # keeps the use order across restarts
+        except OSError:
+            return None
+        return path
+
+    # Decodes a track into the cache in the background, one track at a time
+    def schedule(self, file_path):
+        with self.lock:
+            if file_path in self.pending:
+                return
+            self.pending.add(file_path)
+        self.executor.submit(self.add, file_path)
+
+    def add(self, file_path):
+        try:
+            if NATIVE_PCM_READER and native_pcm_header(file_path):
+                return  # already read without FFmpeg, caching would only copy it
+            name = self.cache_name(file_path)
+            if name in self.entries:
+                return
+            os.makedirs(self.folder, exist_ok=True)
+            path = os.path.join(self.folder, name)
+            result = subprocess.run(
+                ["ffmpeg", "-v", "error", "-y", "-i", file_path,
+                 "-f", "s16le", "-ar", str(SAMPLE_RATE), "-ac", str(CHANNELS), path + ".part"],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            if result.returncode != 0:
+                print(f"❌ ERROR: Could not cache {file_path}")
+                return
+            os.replace(path + ".part", path)
+            size = os.path.getsize(path)
+            with self.lock:
+                self.entries[name] = size
+                self.total_size += size
+                self.evict()
+        except OSError as e:
+            print(f"❌ ERROR: Could not cache {file_path}: {e}")
+        finally:
+            with self.lock:
+                self.pending.discard(file_path)
+
+    # Deletes the least recently used tracks until the cache fits its size limit
+    def evict(self):
+        while self.total_size > self.limit and len(self.entries) > 1:
+            name, size = self.entries.popitem(last=False)
+            self.total_size -= size
+            try:
+                os.remove(os.path.join(self.folder, name))
+            except OSError:
+                pass  # still mapped by a player; it gets cleaned up on a later start
+
+# Audio source that plays already decoded PCM straight from memory
+class PCMBufferAudio(discord.AudioSource):
+    def __init__(self, pcm, click_time=None, on_first_frame=None):
+        self.pcm = memoryview(pcm)
+        self.position = 0
+        self.click_time = click_time
+        self.on_first_frame = on_first_frame
+
+    def read(self):
+        if self.position >= len(self.pcm):
+            return b""
+        if self.position == 0 and self.click_time is not None and self.on_first_frame:
+            self.on_first_frame(time.perf_counter() - self.click_time)
+        frame = bytes(self.pcm[self.position:self.position + FRAME_SIZE])
+        self.position += FRAME_SIZE
+        if len(frame) < FRAME_SIZE:
+            frame += b"\x00" * (FRAME_SIZE - len(frame))
+        return frame
+
+    def is_opus(self):
+        return False
+
+# Wraps a PCM source to count the frames actually sent and keep recent audio in memory
+class TrackedAudio(discord.AudioSource):
+    # start is where in the track the source begins, so positions stay relative to the whole track
+    def __init__(self, source, read_ahead=READ_AHEAD_FRAMES, history=HISTORY_FRAMES, on_eof=None, start=0.0):
+        self.source = source
+        self.on_eof = on_eof
+        self.read_ahead = read_ahead
+        self.ahead = deque()
+        self.history = deque(maxlen=history)
+        self.frames_played = round(start / 0.02)
+        self.eof = False
+        self.closed = False
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self.fill, daemon=True)
+        self.thread.start()
+
+    # Background decoder loop that keeps the read-ahead buffer topped up
+    def fill(self):
+        while True:
+            with self.condition:
+                while len(self.ahead) >= self.read_ahead and not self.closed:
+                    self.condition.wait()
+                if self.closed:
+                    return
+            frame = self.source.read()
+            with self.condition:
+                if not frame:
+                    self.eof = True
+                    self.condition.notify_all()
+                    break
+                self.ahead.append(frame)
+                self.condition.notify_all()
+        # The decoder is done, so the rest of the track is already sitting in the buffer
+        if self.on_eof:
+            self.on_eof()
+
+    def read(self):
+        with self.condition:
+            while not self.ahead and not self.eof and not self.closed:
+                self.condition.wait(0.02)
+            if not self.ahead:
+                return b""
+            frame = self.ahead.popleft()
+            self.history.append(frame)
+            self.frames_played += 1
+            self.condition.notify_all()
+        return frame
+
+    # Frames left to play, known exactly once the decoder has reached the end of the track
+    def remaining_frames(self):
+        with self.condition:
+            return len(self.ahead) if self.eof else None
+
+    # Playback position in seconds, exact to the 20ms frame
+    def position(self):
+        return self.frames_played * 0.02
+
+    # Steps back through the frames kept in memory so they get played again
+    def rewind(self, seconds):
+        with self.condition:
+            frames = min(int(seconds / 0.02), len(self.history))
+            for _ in range(frames):
+                self.ahead.appendleft(self.history.pop())
+            self.frames_played -= frames
+        return frames * 0.02
+
+    def is_opus(self):
+        return False
+
+    def cleanup(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join(timeout=1)
+        self.ahead.clear()
+        self.history.clear()
+        self.source.cleanup()
+
+# Latest-value volume: the GUI or a command stores a new value and every gain stage sharing it
+# picks it up on its next frame. Setting it is a single attribute store, with no event loop
+# round trip or lock, so however fast a slider moves only the newest value is ever used
+class VolumeControl:
+    def __init__(self, value=1.0):
+        self.value = value
+
+# Gain stage: scales a PCM source by the user's volume times the track's loudness gain in one
+# NumPy pass. A new volume is reached by a per-sample ramp over GAIN_RAMP_SECONDS, carried
+# across frames, so slider moves don't click; at unity gain frames pass through untouched.
+# The volume may be a number or a VolumeControl shared with the player
+class GainAudio(discord.AudioSource):
+    def __init__(self, source, volume=1.0, track_gain=1.0, ramp_seconds=GAIN_RAMP_SECONDS):
+        self.source = source
+        self.control = volume if isinstance(volume, VolumeControl) else VolumeControl(volume)
+        self.track_gain = track_gain
+        self.ramp_samples = max(1, int(SAMPLE_RATE * ramp_seconds))
+        self.current = self.target()  # gain at the end of the last frame
+        self.ramp_from = self.ramp_to = self.current
+        self.ramp_position = self.ramp_samples
+
+    @property
+    def volume(self):
+        return self.control.value
+
+    @volume.setter
+    def volume(self, value):
+        self.control.value = value
+
+    def target(self):
+        return max(self.control.value, 0.0) * self.track_gain
+
+    # True when frames go out exactly as they came in
+    def is_unity(self):
+        return self.current == 1.0 and self.target() == 1.0
+
+    def remaining_frames(self):
+        return self.source.remaining_frames() if hasattr(self.source, "remaining_frames") else None
+
+    def read_pcm(self):
+        return self.source.read()
+
+    def read(self):
+        pcm = self.read_pcm()
+        if not pcm:
+            return b""
+        target = self.target()
+        if target != self.ramp_to:
+            self.ramp_from, self.ramp_to, self.ramp_position = self.current, target, 0
+        if self.ramp_position >= self.ramp_samples and target == 1.0:
+            return pcm
+        samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32).reshape(-1, CHANNELS)
+        if self.ramp_position < self.ramp_samples:
+            steps = np.arange(self.ramp_position + 1, self.ramp_position + 1 + len(samples), dtype=np.float32)
+            gains = self.ramp_from + (self.ramp_to - self.ramp_from) * np.minimum(steps / self.ramp_samples, 1.0)
+            samples *= gains[:, None]
+            self.ramp_position = min(self.ramp_position + len(samples), self.ramp_samples)
+            self.current = self.ramp_to if self.ramp_position >= self.ramp_samples else float(gains[-1])
+        else:
+            samples *= target
+        np.clip(samples, -32768, 32767, out=samples)
+        return samples.astype(np.int16).tobytes()
+
+    def cleanup(self):
+        self.source.cleanup()
+
+# Gain stage for an Opus track: hands packets through untouched, or decodes them when they need mixing
+class OpusTrackAudio(GainAudio):
+    def __init__(self, source, volume=1.0, track_gain=1.0):
+        super().__init__(source, volume, track_gain)
+        self.decoder = None
+
+    # Next Opus packet, for when the mixer can send it without touching it
+    def read_opus(self):
+        return self.source.read()
+
+    def read_pcm(self):
+        packet = self.source.read()
+        if not packet:
+            return b""
+        if self.decoder is None:
+            self.decoder = discord.opus.Decoder()
+        return self.decoder.decode(packet, fec=False)
+
+# Keeps quick sounds decoded in memory so a button press doesn't need FFmpeg
+class QuickSoundBank:
+    def __init__(self, limit=QUICK_SOUND_BANK_LIMIT):
+        self.limit = limit
+        self.sounds = OrderedDict()  # file path -> (mtime, pcm), oldest used first
+        self.total_size = 0
+        self.lock = threading.Lock()
+        self.last_latency = None
+
+    # Decodes a sound into the bank, skipping it if the cached copy is still current
+    def load(self, file_path):
+        try:
+            mtime = os.path.getmtime(file_path)
+        except OSError:
+            print(f"❌ ERROR: Quick sound file not found: {file_path}")
+            return None
+        with self.lock:
+            entry = self.sounds.get(file_path)
+            if entry and entry[0] == mtime:
+                self.sounds.move_to_end(file_path)
+                return entry[1]
+        try:
+            pcm = decode_to_pcm(file_path)
+        except (OSError, RuntimeError) as e:
+            print(f"❌ ERROR: {e}")
+            return None
+        self.store(file_path, mtime, pcm)
+        print(f"🎵 Decoded quick sound into memory: {os.path.basename(file_path)} ({len(pcm) // 1024} KB)")
+        return pcm
+
+    # Puts already decoded audio into the bank
+    def store(self, file_path, mtime, pcm):
+        with self.lock:
+            old = self.sounds.pop(file_path, None)
+            if old:
+                self.total_size -= len(old[1])
+            self.sounds[file_path] = (mtime, pcm)
+            self.total_size += len(pcm)
+            self.evict()
+
+    # Drops the least recently used sounds until the bank fits in its memory limit
+    def evict(self):
+        while self.total_size > self.limit and len(self.sounds) > 1:
+            file_path, (_, pcm) = self.sounds.popitem(last=False)
+            self.total_size -= len(pcm)
+            print(f"🧹 Evicted quick sound from memory: {os.path.basename(file_path)}")
+
+    # Decodes a list of sounds in the background
+    def preload(self, file_paths):
+        thread = threading.Thread(target=lambda: [self.load(path) for path in file_paths], daemon=True)
+        thread.start()
+
+    # Returns a cached sound, or None if it is missing or the file has changed since decoding
+    def get(self, file_path):
+        try:
+            mtime = os.path.getmtime(file_path)
+        except OSError:
+            return None
+        with self.lock:
+            entry = self.sounds.get(file_path)
+            if entry and entry[0] == mtime:
+                self.sounds.move_to_end(file_path)
+                return entry[1]
+        return None
+
+    # Builds an in-memory audio source for a sound, decoding it first if needed
+    def make_source(self, file_path, click_time=None):
+        pcm = self.get(file_path) or self.load(file_path)
+        if pcm is None:
+            return None
+        return PCMBufferAudio(pcm, click_time, self.report_latency)
+
+    # Records and prints the time from button click to first audio frame
+    def report_latency(self, latency):
+        self.last_latency = latency
+        print(f"⚡ Quick sound click-to-first-frame latency: {latency * 1000:.1f} ms")
+
+# Base for the mixers: lets the event loop wait for the voice player's next read instead of polling
+class WaitableAudio(discord.AudioSource):
+    # Runs a callback on the player thread right after the next frame is handed out
+    def call_on_next_read(self, callback):
+        with self.lock:
+            if not self.finished:
+                self.read_waiters.append(callback)
+                return
+        callback()
+
+    def run_read_waiters(self):
+        with self.lock:
+            waiters, self.read_waiters = self.read_waiters, []
+        for callback in waiters:
+            callback()
+
+    def read(self):
+        started = time.perf_counter()
+        self.follow_clock(started)
+        frame = self.next_frame()
+        mixer_read_seconds.observe(time.perf_counter() - started)
+        if self.read_waiters:
+            self.run_read_waiters()
+        return frame
+
+    # Keeps the voice player's 20ms clock: how far each read is from its slot, and reads that come
+    # a whole frame late. A break of over 200ms is a pause, after which the clock starts again
+    def follow_clock(self, now):
+        clock = self.read_clock
+        if clock is None or now - clock[2] > 0.2:
+            self.read_clock = [now, 0, now]  # start, frames since, last read
+            return
+        clock[1] += 1
+        clock[2] = now
+        lateness = now - (clock[0] + 0.02 * clock[1])
+        frame_jitter_seconds.observe(abs(lateness))
+        if lateness > 0.02:
+            frame_deadline_misses.inc()
+
+# Audio source that owns the voice client and sums music and quick sounds frame by frame
+class MixerAudio(WaitableAudio):
+    # keep_alive mixers play silence when idle instead of finishing, and passthrough lets
+    # an Opus track go out without re-encoding (audio workers turn both the other way round).
+    # crossfade_frames is how long the next track overlaps the end of the current one
+    def __init__(self, duck_volume=MUSIC_DUCK_VOLUME, keep_alive=False, passthrough=True, crossfade_frames=0):
+        self.keep_alive = keep_alive
+        self.passthrough = passthrough
+        self.crossfade_frames = crossfade_frames
+        self.fade = None  # (outgoing, incoming, length in frames) of the crossfade under way
+        self.opus_frame = False
+        self.music = None
+        self.music_after = None
+        self.music_paused = False
+        self.next_music = None  # prefetched track switched in the moment the music ends
+        self.next_after = None
+        self.gap_frames = None  # frames without music since the last track ended
+        self.last_gap_frames = None
+        self.effects = []  # list of (source, after callback)
+        self.retired = []  # sources waiting to be cleaned up on the player thread
+        self.duck_level = int(duck_volume * 256)
+        self.finished = False
+        self.read_waiters = []
+        self.read_clock = None
+        self.lock = threading.Lock()
+
+    # Replaces the music source; the old one is cleaned up without calling its after callback.
+    # Returns False if the mixer has already finished and a new one is needed
+    def set_music(self, source, after=None):
+        with self.lock:
+            if self.finished:
+                return False
+            if self.music is not None:
+                self.retired.append(self.music)
+            if source is not None and source is self.next_music:
+                self.next_music = None
+                self.next_after = None
+            self.music = source
+            self.music_after = after
+            self.music_paused = False
+            self.gap_frames = None
+            return True
+
+    # Queues a warmed-up track to take over on the exact frame the current music ends
+    def set_next_music(self, source, after=None):
+        with self.lock:
+            if self.next_music is not None and self.next_music is not source:
+                self.retired.append(self.next_music)
+            self.next_music = source
+            self.next_after = after
+
+    # Starts a quick sound on top of whatever is playing
+    def add_effect(self, source, after=None):
+        with self.lock:
+            if self.finished:
+                return False
+            self.effects.append((source, after))
+            return True
+
+    # Takes the music source out of the mixer without cleaning it up so it can be played again later
+    def detach_music(self):
+        with self.lock:
+            source, after = self.music, self.music_after
+            self.music = None
+            self.music_after = None
+        return source, after
+
+    def has_music(self):
+        return self.music is not None
+
+    def has_effects(self):
+        return bool(self.effects)
+
+    # Reads one frame from a sub-source as int32 samples, or None when it has ended
+    @staticmethod
+    def read_samples(source, timing):
+        started = time.perf_counter()
+        data = source.read()
+        timing.observe(time.perf_counter() - started)
+        if not data:
+            return None
+        if len(data) < FRAME_SIZE:
+            data = bytes(data) + b"\x00" * (FRAME_SIZE - len(data))
+        return np.frombuffer(data, dtype=np.int16).astype(np.int32)
+
+    # Equal-power gains for the outgoing and incoming track over this frame's samples, or None
+    # outside a crossfade. The fade starts on the frame the outgoing track has crossfade_frames
+    # left in its buffer (or as soon as the next track is ready, if that is later) and ends on
+    # its last frame, so it is timed by frame counts alone and the next track needs no extra start-up
+    def crossfade_gains(self, music, next_music):
+        if not self.crossfade_frames or music is None or next_music is None:
+            self.fade = None
+            return None
+        remaining = music.remaining_frames()
+        if not remaining:
+            return None
+        if self.fade is None or self.fade[0] is not music or self.fade[1] is not next_music or remaining > self.fade[2]:
+            if remaining > self.crossfade_frames:
+                self.fade = None
+                return None
+            self.fade = (music, next_music, remaining)
+        length = self.fade[2]
+        frame_samples = FRAME_SIZE // (2 * CHANNELS)
+        first = (length - remaining) * frame_samples
+        angles = (np.arange(first, first + frame_samples, dtype=np.float32) + 0.5) * (np.pi / 2 / (length * frame_samples))
+        return np.cos(angles), np.sin(angles)
+
+    def next_frame(self):
+        started = time.perf_counter()
+        with self.lock:
+            locked = time.perf_counter()
+            music, music_after = (None, None) if self.music_paused else (self.music, self.music_after)
+            next_music = self.next_music if music is not None else None
+            effects = list(self.effects)
+            retired, self.retired = self.retired, []
+        mixer_lock_wait_seconds.observe(locked - started)
+        mixer_lock_hold_seconds.observe(time.perf_counter() - locked)
+        for source in retired:
+            source.cleanup()
+
+        fade = self.crossfade_gains(music, next_music)
+
+        # A lone Opus track at full volume goes out as-is, with no decode or encode
+        self.opus_frame = False
+        if self.passthrough and music is not None and fade is None and not effects and hasattr(music, "read_opus") and music.is_unity():
+            read_started = time.perf_counter()
+            packet = music.read_opus()
+            music_read_seconds.observe(time.perf_counter() - read_started)
+            if packet:
+                if self.gap_frames is not None:
+                    self.report_gap()
+                self.opus_frame = True
+                return packet
+
+        mix = np.zeros(FRAME_SIZE // 2, dtype=np.int32)
+        ended = []
+        for source, after in effects:
+            samples = self.read_samples(source, effect_read_seconds)
+            if samples is None:
+                ended.append((source, after))
+            else:
+                mix += samples
+        active_effects = len(effects) > len(ended)
+
+        music_ended = False
+        samples = None
+        if music is not None:
+            samples = self.read_samples(music, music_read_seconds)
+            if samples is None:
+                music_ended = True
+                self.gap_frames = 0
+                with self.lock:
+                    next_music = self.next_music if self.music is music else None
+                    if next_music is not None:
+                        self.music, self.music_after = self.next_music, self.next_after
+                        self.next_music = None
+                        self.next_after = None
+                if next_music is not None:
+                    samples = self.read_samples(next_music, music_read_seconds)
+            elif fade is not None:
+                # Both tracks are already decoded ahead, so the overlap is one vectorized mix
+                out_gains, in_gains = fade
+                faded = samples.reshape(-1, CHANNELS) * out_gains[:, None]
+                incoming = self.read_samples(next_music, music_read_seconds)
+                if incoming is not None:
+                    faded += incoming.reshape(-1, CHANNELS) * in_gains[:, None]
+                samples = faded.astype(np.int32).ravel()
+        if samples is not None:
+            if self.gap_frames is not None:
+                self.report_gap()
+            if active_effects:
+                mix += (samples * self.duck_level) >> 8
+            else:
+                mix += samples
+        elif self.gap_frames is not None and not self.music_paused:
+            self.gap_frames += 1
+
+        with self.lock:
+            for item in ended:
+                self.effects.remove(item)
+            if music_ended and self.music is music:
+                self.music = None
+                self.music_after = None
+            if self.music is None and not self.effects and not self.keep_alive:
+                self.finished = True
+        for source, after in ended:
+            source.cleanup()
+            if after:
+                after(None)
+        if music_ended:
+            music.cleanup()
+            if music_after:
+                music_after(None)
+
+        if self.finished:
+            return b""
+        np.clip(mix, -32768, 32767, out=mix)
+        return mix.astype(np.int16).tobytes()
+
+    # Records and prints how much silence there was between the last track and this one
+    def report_gap(self):
+        self.last_gap_frames = self.gap_frames
+        self.gap_frames = None
+        print(f"🔁 Inter-track gap: {self.last_gap_frames} frames ({self.last_gap_frames * 20} ms)")
+
+    # The voice player asks this after every read, so it describes the frame just returned
+    def is_opus(self):
+        return self.opus_frame
+
+    def cleanup(self):
+        with self.lock:
+            sources = [source for source, _ in self.effects] + self.retired
+            for source in (self.music, self.next_music):
+                if source is not None:
+                    sources.append(source)
+            self.effects, self.retired, self.music, self.next_music = [], [], None, None
+            self.finished = True
+        for source in sources:
+            source.cleanup()
+        self.run_read_waiters()
+
+# Opens a music file as a position-tracked source plus the volume stage that goes into the mixer.
+# With an Opus version of the file the track buffers packets and only decodes them when mixed,
+# and with a cached PCM file it is played from a memory map instead of FFmpeg.
+# Playback begins start seconds in, using seek_point to jump into an MP3 (see open_pcm_decoder)
+def open_music_source(file_path, volume, on_eof=None, opus_path=None, pcm_path=None, track_gain=1.0, start=0.0, seek_point=None, read_ahead=READ_AHEAD_FRAMES):
+    if opus_path:
+        packets = MeteredFFmpegOpusAudio(opus_path, codec="copy", before_options=f"-ss {start:.3f}" if start else None)
+        track = TrackedAudio(packets, read_ahead=read_ahead, on_eof=on_eof, start=start)
+        return track, OpusTrackAudio(track, volume=volume, track_gain=track_gain)
+    if pcm_path:
+        decoder = MappedPCMAudio(pcm_path)
+        if start:
+            decoder.seek(start)
+    else:
+        decoder = open_pcm_decoder(file_path, start, seek_point)
+    track = TrackedAudio(decoder, read_ahead=read_ahead, on_eof=on_eof, start=start)
+    return track, GainAudio(track, volume=volume, track_gain=track_gain)
+
+# Stand-in for a track that couldn't be opened: it ends on its first frame, so whoever is waiting
+# for it to finish hears about it the same way as after a file FFmpeg can't read
+def open_empty_track(volume, on_eof=None, start=0.0):
+    track = TrackedAudio(PCMBufferAudio(b""), on_eof=on_eof, start=start)
+    return track, GainAudio(track, volume=volume)
+
+# Shared-memory ring of encoded Opus packets, written by an audio worker and read by the voice player
+class OpusRing:
+    HEADER_SIZE = 48  # write index, read index, underrun count, spare, then music and quick sound volume
+
+    def __init__(self, name=None):
+        size = self.HEADER_SIZE + RING_SLOTS * RING_SLOT_SIZE
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            try:
+                self.shm = shared_memory.SharedMemory(name=name, track=False)
+            except TypeError:  # Python < 3.13 tracks attached segments too, so stop it unlinking ours
+                self.shm = shared_memory.SharedMemory(name=name)
+                resource_tracker.unregister(self.shm._name, "shared_memory")
+        self.name = self.shm.name
+        self.header = np.ndarray((4,), dtype=np.int64, buffer=self.shm.buf)
+        self.volumes = np.ndarray((2,), dtype=np.float64, buffer=self.shm.buf, offset=32)
+        if name is None:
+            self.volumes[:] = 1.0
+
+    def free_slots(self):
+        return RING_SLOTS - int(self.header[0] - self.header[1])
+
+    # Worker side: stores one packet (only call when free_slots() > 0)
+    def put(self, packet):
+        write = int(self.header[0])
+        offset = self.HEADER_SIZE + (write % RING_SLOTS) * RING_SLOT_SIZE
+        self.shm.buf[offset:offset + 2] = len(packet).to_bytes(2, "little")
+        self.shm.buf[offset + 2:offset + 2 + len(packet)] = packet
+        self.header[0] = write + 1
+
+    # Player side: takes the oldest packet, or None if the worker hasn't caught up
+    def get(self):
+        read = int(self.header[1])
+        if read >= self.header[0]:
+            return None
+        offset = self.HEADER_SIZE + (read % RING_SLOTS) * RING_SLOT_SIZE
+        length = int.from_bytes(self.shm.buf[offset:offset + 2], "little")
+        packet = bytes(self.shm.buf[offset + 2:offset + 2 + length])
+        self.header[1] = read + 1
+        return packet
+
+    def underruns(self):
+        return int(self.header[2])
+
+    def close(self, unlink=False):
+        del self.header
+        del self.volumes
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+# Worker side of a volume kept in a ring's header: the player copies its VolumeControl there every frame
+class RingVolumeControl:
+    def __init__(self, ring, index):
+        self.ring = ring
+        self.index = index
+
+    @property
+    def value(self):
+        return float(self.ring.volumes[self.index])
+
+# Entry point of an audio worker process: decodes, mixes and Opus-encodes its streams into shared memory
+def audio_worker_main(commands, events):
+    encoder_class = discord.opus.Encoder
+    streams = {}  # stream id -> (mixer, ring, encoder)
+    sources = {}  # source id -> source given to a mixer
+    controls = {}  # stream id -> (music volume, quick sound volume) read from the stream's ring
+    tracks = {}  # source id -> TrackedAudio, for position reports
+    bank = QuickSoundBank()
+
+    # Drops a source the worker no longer needs to keep track of
+    def forget(source_id):
+        tracks.pop(source_id, None)
+        return sources.pop(source_id, None)
+
+    # Mixer callback: tells the bot process that a source finished playing
+    def source_ended(event, stream_id, source_id):
+        forget(source_id)
+        events.put((event, stream_id, source_id))
+
+    # Carries out one command from the bot process; returns True once told to stop
+    def run_command(command):
+        kind = command[0]
+        if kind == "stop":
+            for mixer, ring, _ in streams.values():
+                mixer.cleanup()
+                ring.close()
+            return True
+        elif kind == "open_stream":
+            _, stream_id, ring_name, crossfade_frames = command
+            ring = OpusRing(ring_name)
+            streams[stream_id] = (MixerAudio(keep_alive=True, passthrough=False, crossfade_frames=crossfade_frames), ring, encoder_class())
+            controls[stream_id] = (RingVolumeControl(ring, 0), RingVolumeControl(ring, 1))
+        elif kind == "close_stream":
+            stream = streams.pop(command[1], None)
+            controls.pop(command[1], None)
+            if stream:
+                stream[0].cleanup()
+                stream[1].close()
+        elif kind == "open_track":
+            _, source_id, file_path, volume, pcm_path, track_gain, start, seek_point, read_ahead = command
+            on_eof = lambda source_id=source_id: events.put(("eof", source_id))
+            try:
+                track, volume_source = open_music_source(file_path, volume, on_eof=on_eof, pcm_path=pcm_path, track_gain=track_gain, start=start, seek_point=seek_point, read_ahead=read_ahead)
+            except Exception as e:
+                print(f"❌ ERROR: Could not open {os.path.basename(file_path)}: {e}")
+                track, volume_source = open_empty_track(volume, on_eof=on_eof, start=start)
+            volume_source.source_id = source_id
+            sources[source_id] = volume_source
+            tracks[source_id] = track
+        elif kind == "store_sound":
+            _, file_path, mtime, pcm = command
+            bank.store(file_path, mtime, pcm)
+        elif kind == "open_effect":
+            _, source_id, file_path, volume, click_time, track_gain = command
+            try:
+                original_source = bank.make_source(file_path, click_time) if bank.get(file_path) else open_pcm_decoder(file_path)
+            except Exception as e:
+                print(f"❌ ERROR: Could not play {os.path.basename(file_path)}: {e}")
+                return  # adding the missing source reports the effect as ended
+            sources[source_id] = GainAudio(original_source, volume=volume, track_gain=track_gain)
+            sources[source_id].source_id = source_id
+        elif kind in ("set_music", "set_next_music", "add_effect"):
+            _, stream_id, source_id = command
+            if stream_id not in streams:
+                return
+            mixer = streams[stream_id][0]
+            event = "effect_ended" if kind == "add_effect" else "music_ended"
+            after = lambda e, event=event, stream_id=stream_id, source_id=source_id: source_ended(event, stream_id, source_id)
+            source = sources.get(source_id)
+            if source is None and source_id is not None and kind != "add_effect":
+                # Lost to a failed open or a worker restart: it plays as an empty track, so its end is still reported
+                tracks[source_id], source = open_empty_track(1.0)
+                source.source_id = source_id
+                sources[source_id] = source
+            if source is not None:
+                # From here on the source follows the player's volume slider
+                source.control = controls[stream_id][1 if kind == "add_effect" else 0]
+            if kind == "add_effect":
+                if source:
+                    mixer.add_effect(source, after)
+                else:
+                    after(None)
+                return
+            replaced = mixer.music if kind == "set_music" else mixer.next_music
+            getattr(mixer, kind)(source, after if source else None)
+            if replaced is not None and replaced is not source:
+                forget(replaced.source_id)
+        elif kind == "detach_music":
+            if command[1] in streams:
+                streams[command[1]][0].detach_music()
+        elif kind == "pause":
+            if command[1] in streams:
+                streams[command[1]][0].music_paused = command[2]
+        elif kind == "crossfade":
+            if command[1] in streams:
+                streams[command[1]][0].crossfade_frames = command[2]
+        elif kind == "rewind":
+            if command[1] in tracks:
+                tracks[command[1]].rewind(command[2])
+        elif kind == "release":
+            source = forget(command[1])
+            if source:
+                source.cleanup()
+
+    # Closes a stream that failed and tells the bot process, so the player using it can start over
+    def end_stream(stream_id):
+        stream = streams.pop(stream_id, None)
+        controls.pop(stream_id, None)
+        if stream:
+            try:
+                stream[0].cleanup()
+            except Exception as e:
+                print(f"⚠️ Could not clean up audio worker stream {stream_id}: {e}")
+            stream[1].close()
+        events.put(("stream_ended", stream_id))
+
+    produced = True
+    while True:
+        # Handle every waiting command, only sleeping on the queue when there was nothing to encode
+        pending = []
+        try:
+            pending.append(commands.get(timeout=0.005) if not produced else commands.get_nowait())
+            while True:
+                pending.append(commands.get_nowait())
+        except Empty:
+            pass
+        for command in pending:
+            try:
+                if run_command(command):
+                    return
+            except Exception as e:
+                print(f"❌ ERROR: Audio worker command '{command[0]}' failed: {e}")
+                if command[0] in ("open_stream", "set_music", "set_next_music", "add_effect", "detach_music", "pause", "crossfade"):
+                    end_stream(command[1])
+
+        produced = False
+        for stream_id, (mixer, ring, encoder) in list(streams.items()):
+            try:
+                # Idle streams produce nothing; the voice player fills the time with silence itself
+                while ring.free_slots() > 0 and (mixer.has_effects() or (mixer.has_music() and not mixer.music_paused)):
+                    pcm = mixer.read()
+                    ring.put(encoder.encode(pcm, encoder_class.SAMPLES_PER_FRAME))
+                    produced = True
+                    music_id = getattr(mixer.music, "source_id", None)
+                    if music_id in tracks and tracks[music_id].frames_played % 10 == 0:
+                        events.put(("position", music_id, tracks[music_id].frames_played))
+            except Exception as e:
+                print(f"❌ ERROR: Audio worker stream {stream_id} failed: {e}")
+                end_stream(stream_id)
+
+# Stand-in for a track or quick sound living inside an audio worker process
+class RemoteSource:
+    def __init__(self, worker, on_eof=None, start=0.0):
+        self.worker = worker
+        self.source_id = worker.new_id()
+        self.on_eof = on_eof
+        self.eof = False
+        self.frames_played = round(start / 0.02)
+        worker.sources[self.source_id] = self
+
+    # Last position the worker reported, in seconds
+    def position(self):
+        return self.frames_played * 0.02
+
+    def rewind(self, seconds):
+        self.worker.send("rewind", self.source_id, seconds)
+        return seconds
+
+    def cleanup(self):
+        self.worker.sources.pop(self.source_id, None)
+        self.worker.send("release", self.source_id)
+
+# Mixer whose audio is produced by a worker process; it mirrors MixerAudio's state so the
+# player can use it the same way, and plays the worker's Opus packets from shared memory
+class RemoteMixer(WaitableAudio):
+    def __init__(self, worker, music_control=None, quick_sound_control=None, crossfade_frames=0):
+        self.worker = worker
+        self.music_control = music_control or VolumeControl()
+        self.quick_sound_control = quick_sound_control or VolumeControl()
+        self.stream_id = worker.new_id()
+        self.ring = OpusRing()
+        self.music = None
+        self.music_after = None
+        self.next_music = None
+        self.next_after = None
+        self.effects = []  # list of (source, after callback)
+        self._music_paused = False
+        self._crossfade_frames = crossfade_frames
+        self.started = False
+        self.finished = False
+        self.read_waiters = []
+        self.read_clock = None
+        self.lock = threading.Lock()
+        worker.streams[self.stream_id] = self
+        worker.send("open_stream", self.stream_id, self.ring.name, crossfade_frames)
+
+    @property
+    def music_paused(self):
+        return self._music_paused
+
+    @music_paused.setter
+    def music_paused(self, value):
+        self._music_paused = value
+        self.worker.send("pause", self.stream_id, value)
+
+    # The worker's mixer runs the crossfade; the track switch still arrives as a music_ended event
+    @property
+    def crossfade_frames(self):
+        return self._crossfade_frames
+
+    @crossfade_frames.setter
+    def crossfade_frames(self, value):
+        self._crossfade_frames = value
+        self.worker.send("crossfade", self.stream_id, value)
+
+    def set_music(self, source, after=None):
+        with self.lock:
+            if self.finished:
+                return False
+            if self.music is not None and self.music is not source:
+                self.worker.sources.pop(self.music.source_id, None)
+            if source is not None and source is self.next_music:
+                self.next_music = None
+                self.next_after = None
+            self.music = source
+            self.music_after = after
+            self._music_paused = False
+            self.worker.send("set_music", self.stream_id, source.source_id if source else None)
+            return True
+
+    def set_next_music(self, source, after=None):
+        with self.lock:
+            if self.next_music is not None and self.next_music is not source:
+                self.worker.sources.pop(self.next_music.source_id, None)
+            self.next_music = source
+            self.next_after = after
+            self.worker.send("set_next_music", self.stream_id, source.source_id if source else None)
+
+    def add_effect(self, source, after=None):
+        with self.lock:
+            if self.finished:
+                return False
+            self.effects.append((source, after))
+            self.worker.send("add_effect", self.stream_id, source.source_id)
+            return True
+
+    def detach_music(self):
+        with self.lock:
+            source, after = self.music, self.music_after
+            self.music = None
+            self.music_after = None
+            self.worker.send("detach_music", self.stream_id)
+        return source, after
+
+    def has_music(self):
+        return self.music is not None
+
+    def has_effects(self):
+        return bool(self.effects)
+
+    # Worker event: a music source ran out, so switch to the next one like the worker's mixer did
+    def music_ended(self, source_id):
+        with self.lock:
+            if self.music is None or self.music.source_id != source_id:
+                return
+            after = self.music_after
+            self.worker.sources.pop(source_id, None)
+            self.music, self.music_after = self.next_music, self.next_after
+            self.next_music = None
+            self.next_after = None
+            self.check_finished()
+        if after:
+            after(None)
+
+    # Worker event: a quick sound finished
+    def effect_ended(self, source_id):
+        with self.lock:
+            ended = [item for item in self.effects if item[0].source_id == source_id]
+            for item in ended:
+                self.effects.remove(item)
+            self.check_finished()
+        for source, after in ended:
+            self.worker.sources.pop(source.source_id, None)
+            if after:
+                after(None)
+
+    # Worker event: the worker gave up on this stream (or died), so everything in it has ended.
+    # The mixer finishes and the player starts a new one with whatever it plays next
+    def stream_ended(self):
+        with self.lock:
+            ended = [(self.music, self.music_after)] + self.effects
+            if self.next_music is not None:
+                self.worker.sources.pop(self.next_music.source_id, None)
+            self.music = self.music_after = self.next_music = self.next_after = None
+            self.effects = []
+            self.finished = True
+        for source, after in ended:
+            if source is not None:
+                self.worker.sources.pop(source.source_id, None)
+                if after:
+                    after(None)
+
+    def check_finished(self):
+        if self.music is None and not self.effects:
+            self.finished = True
+
+    def next_frame(self):
+        # Hand the worker the latest volumes; it reads them on the next frame it mixes
+        self.ring.volumes[0] = self.music_control.value
+        self.ring.volumes[1] = self.quick_sound_control.value
+        packet = self.ring.get()
+        if packet is not None:
+            self.started = True
+            return packet
+        if self.finished:
+            return b""
+        if self.started and (self.effects or (self.music is not None and not self._music_paused)):
+            self.ring.header[2] += 1  # the worker missed this frame's deadline
+        return OPUS_SILENCE
+
+    def is_opus(self):
+        return True
+
+    def cleanup(self):
+        self.finished = True
+        if self.worker.streams.pop(self.stream_id, None) is None:
+            return  # already done: the voice player and garbage collection both call this
+        self.worker.closed_misses += self.ring.underruns()
+        self.worker.send("close_stream", self.stream_id)
+        self.ring.close(unlink=True)
+        self.run_read_waiters()
+
+# Main-process handle for one audio worker process
+class AudioWorker:
+    def __init__(self, index):
+        self.index = index
+        self.commands = multiprocessing.Queue()
+        self.events = multiprocessing.Queue()
+        self.ids = itertools.count(1)
+        self.sources = {}  # source id -> RemoteSource
+        self.streams = {}  # stream id -> RemoteMixer
+        self.sent_sounds = {}  # quick sound path -> mtime already copied to the worker
+        self.players = 0
+        self.closed_misses = 0
+        self.stopped = False
+        self.process = multiprocessing.Process(target=audio_worker_main, args=(self.commands, self.events), name=f"audio-worker-{index}", daemon=True)
+        self.process.start()
+        threading.Thread(target=self.dispatch_events, daemon=True).start()
+
+    # Starts a new process in place of one that died. Everything the old one was playing is gone,
+    # so its mixers finish and their tracks end, and the players carry on with fresh streams here
+    def restart(self):
+        print(f"❌ ERROR: Audio worker {self.index} stopped (exit code {self.process.exitcode}), starting a new one.")
+        self.commands.cancel_join_thread()  # nothing will read what was still waiting for the old process
+        self.commands = multiprocessing.Queue()
+        self.events = multiprocessing.Queue()
+        self.sent_sounds = {}
+        self.process = multiprocessing.Process(target=audio_worker_main, args=(self.commands, self.events), name=f"audio-worker-{self.index}", daemon=True)
+        self.process.start()
+        for stream in list(self.streams.values()):
+            stream.stream_ended()
+
+    def new_id(self):
+        return next(self.ids)
+
+    def send(self, *command):
+        self.commands.put(command)
+
+    # Copies a decoded quick sound into the worker's own bank the first time it is used there
+    def send_sound(self, file_path, pcm):
+        mtime = os.path.getmtime(file_path)
+        if self.sent_sounds.get(file_path) != mtime:
+            self.send("store_sound", file_path, mtime, pcm)
+            self.sent_sounds[file_path] = mtime
+
+    # Passes worker events on to the mirrors and stand-ins they belong to, and restarts the worker
+    # if its process has died
+    def dispatch_events(self):
+        while not self.stopped:
+            try:
+                event = self.events.get(timeout=1.0)
+            except Empty:
+                if not self.process.is_alive() and not self.stopped:
+                    self.restart()
+                continue
+            except (EOFError, OSError):
+                return
+            kind = event[0]
+            if kind in ("music_ended", "effect_ended"):
+                stream = self.streams.get(event[1])
+                if stream:
+                    getattr(stream, kind)(event[2])
+            elif kind == "stream_ended":
+                stream = self.streams.get(event[1])
+                if stream:
+                    stream.stream_ended()
+            elif kind == "position":
+                source = self.sources.get(event[1])
+                if source:
+                    source.frames_played = event[2]
+            elif kind == "eof":
+                source = self.sources.get(event[1])
+                if source:
+                    source.eof = True
+                    if source.on_eof:
+                        source.on_eof()
+
+    # Frames the voice player had to fill with silence because this worker was late
+    def deadline_misses(self):
+        return self.closed_misses + sum(stream.ring.underruns() for stream in list(self.streams.values()))
+
+    def stop(self):
+        self.stopped = True
+        self.send("stop")
+        self.process.join(timeout=2)
+
+# Pool of audio worker processes, one per CPU core by default
+class AudioWorkerPool:
+    def __init__(self, size=None):
+        # The workers encode with the same Opus library, and would die on their first stream without it
+        discord.opus.Encoder()
+        size = size or os.cpu_count() or 1
+        self.workers = [AudioWorker(i) for i in range(size)]
+        print(f"🧵 Started {size} audio worker process(es).")
+
+    # Picks the worker with the fewest players for a new guild
+    def assign(self):
+        worker = min(self.workers, key=lambda worker: worker.players)
+        worker.players += 1
+        return worker
+
+    # Per-worker stream count and frame deadline misses
+    def stats(self):
+        return [
+            {"worker": worker.index, "players": worker.players, "streams": len(worker.streams), "deadline_misses": worker.deadline_misses()}
+            for worker in self.workers
+        ]
+
+    def shutdown(self):
+        for worker in self.workers:
+            worker.stop()
+
+# Play queue built for the event loop: items live in blocks indexed by a Fenwick tree of block
+# lengths, so positional insert, move and remove cost O(log n) plus a short in-block shift,
+# while append, pop from the front and clear stay constant time. Every change bumps the
+# version and goes to the listeners, so displays can follow diffs instead of copying the queue.
+class Playlist:
+    def __init__(self, block_size=PLAYLIST_BLOCK_SIZE):
+        self.block_size = block_size
+        self.blocks = []
+        self.tree = [0]  # 1-based Fenwick tree over len(block)
+        self.length = 0
+        self.version = 0
+        self.listeners = []  # called with each (version, operation, arguments...) change as it happens
 
-# Global variables
-vc = None
-file_queue = Queue()
-paused_file = None
-paused_position = 0
-current_file = None
-start_time = None
-music_volume = 1.0
-quick_sound_volume = 1.0
-vc_lock = asyncio.Lock()
-is_playing_quick_sound = False
-
-# Loads quick play sound file paths from a text file
-def load_quick_play_files():
-    quick_play_files = {}
-    if os.path.exists(QUICK_PLAY_FILE):
-        with open(QUICK_PLAY_FILE, "r") as f:
-            lines = f.readlines()
-            for line in lines:
-                name, path = line.strip().split(":", 1)
-                quick_play_files[name] = path
-    return quick_play_files
+    def __len__(self):
+        return self.length
 
-# Saves a quick play sound file path to a text file
-def save_quick_play_file(name, file_path):
-    quick_play_files = load_quick_play_files()
-    quick_play_files[name] = file_path
-    with open(QUICK_PLAY_FILE, "w") as f:
-        for name, path in quick_play_files.items():
-            f.write(f"{name}:{path}\n")
+    def __iter__(self):
+        for block in self.blocks:
+            yield from block
 
-# Bot thread to run the Discord bot
-class BotThread(QThread):
-    update_signal = pyqtSignal()
-    ready_signal = pyqtSignal(bool)
+    def __getitem__(self, index):
+        block, offset = self.locate(index)
+        return self.blocks[block][offset]
 
-    def run(self):
-        asyncio.run(self.start_bot())
-
-    async def start_bot(self):
-        @bot.event
-        async def on_ready():
-            print(f"Bot is logged in as {bot.user}")
-            if bot.guilds:
-                print(f"Connected to {len(bot.guilds)} guild(s).")
-            else:
-                print("❌ ERROR: Bot is not in any guilds!")
-            self.ready_signal.emit(True)
+    # Fenwick tree helpers
+    def tree_add(self, block, delta):
+        i = block + 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
 
-        await bot.start(TOKEN)
+    def rebuild_tree(self):
+        self.tree = [0] * (len(self.blocks) + 1)
+        for i, block in enumerate(self.blocks, 1):
+            self.tree[i] += len(block)
+            parent = i + (i & -i)
+            if parent < len(self.tree):
+                self.tree[parent] += self.tree[i]
 
-# Main GUI window class for the Discord music player
-class MainWindow(QMainWindow):
-    stop_button_signal = pyqtSignal(bool)
-
-    def __init__(self, bot_thread):
-        super().__init__()
-        self.setWindowTitle("Discord Music Player")
-        self.setGeometry(100, 100, 600, 400)
-
-        self.central_widget = QWidget()
-        self.setCentralWidget(self.central_widget)
-        layout = QVBoxLayout(self.central_widget)
-
-        # Connection Controls
-        connection_layout = QHBoxLayout()
-        self.connect_button = QPushButton("Connect")
-        self.connect_button.clicked.connect(self.connect_to_voice)
-        self.connect_button.setEnabled(False)
-        connection_layout.addWidget(self.connect_button)
-
-        self.disconnect_button = QPushButton("Disconnect")
-        self.disconnect_button.clicked.connect(self.disconnect_from_voice)
-        self.disconnect_button.setEnabled(False)
-        connection_layout.addWidget(self.disconnect_button)
-        layout.addLayout(connection_layout)
-
-        # Playback Controls
-        playback_layout = QHBoxLayout()
-        self.pause_button = QPushButton("Pause")
-        self.pause_button.clicked.connect(lambda: asyncio.run_coroutine_threadsafe(self.pause_music(), bot.loop))
-        playback_layout.addWidget(self.pause_button)
-
-        self.play_button = QPushButton("Play")
-        self.play_button.clicked.connect(lambda: asyncio.run_coroutine_threadsafe(self.resume_music(), bot.loop))
-        playback_layout.addWidget(self.play_button)
-
-        self.stop_button = QPushButton("Stop")
-        self.stop_button.clicked.connect(lambda: asyncio.run_coroutine_threadsafe(self.stop_music(), bot.loop))
-        self.stop_button.setEnabled(False)
-        playback_layout.addWidget(self.stop_button)
-
-        self.skip_button = QPushButton("Skip")
-        self.skip_button.clicked.connect(lambda: asyncio.run_coroutine_threadsafe(self.skip_to_next(), bot.loop))
-        playback_layout.addWidget(self.skip_button)
-
-        layout.addLayout(playback_layout)
-
-        # Volume Controls
-        volume_layout = QHBoxLayout()
-        self.music_volume_slider = QSlider()
-        self.music_volume_slider.setMinimum(0)
-        self.music_volume_slider.setMaximum(100)
-        self.music_volume_slider.setValue(100)
-        self.music_volume_slider.valueChanged.connect(self.update_music_volume)
-        volume_layout.addWidget(QLabel("Music Volume"))
-        volume_layout.addWidget(self.music_volume_slider)
-        layout.addLayout(volume_layout)
-
-        quick_volume_layout = QHBoxLayout()
-        self.quick_sound_volume_slider = QSlider()
-        self.quick_sound_volume_slider.setMinimum(0)
-        self.quick_sound_volume_slider.setMaximum(100)
-        self.quick_sound_volume_slider.setValue(100)
-        self.quick_sound_volume_slider.valueChanged.connect(self.update_quick_sound_volume)
-        quick_volume_layout.addWidget(QLabel("Quick Sound Volume"))
-        quick_volume_layout.addWidget(self.quick_sound_volume_slider)
-        layout.addLayout(quick_volume_layout)
-
-        # File Picker
-        self.pick_file_button = QPushButton("Pick File")
-        self.pick_file_button.clicked.connect(self.pick_file)
-        layout.addWidget(self.pick_file_button)
-
-        # Queue Display
-        self.queue_list = QListWidget()
-        layout.addWidget(self.queue_list)
-
-        # Quick Sound Buttons
-        quick_sound_layout = QVBoxLayout()
-        self.quick_buttons = {}
-        for i in range(1, 13):
-            button = QPushButton(f"Quick Sound {i}")
-            button.clicked.connect(lambda _, i=i: self.play_quick_sound(i))
-            quick_sound_layout.addWidget(button)
-            self.quick_buttons[i] = button
-        layout.addLayout(quick_sound_layout)
-
-        # Connect signals
-        bot_thread.ready_signal.connect(self.on_bot_ready)
-        self.stop_button_signal.connect(self.stop_button.setEnabled)
-
-        # Load existing quick play files
-        quick_play_files = load_quick_play_files()
-        for i in range(1, 13):
-            if f"Quick Sound {i}" in quick_play_files:
-                file_path = quick_play_files[f"Quick Sound {i}"]
-                self.quick_buttons[i].setText(os.path.basename(file_path))
-
-    # Handles bot ready event to enable connection button
-    def on_bot_ready(self, ready):
-        if ready:
-            self.connect_button.setEnabled(True)
-            print("Bot is ready, connect button enabled.")
-
-    # Initiates connection to voice channel
-    def connect_to_voice(self):
-        asyncio.run_coroutine_threadsafe(self.connect_to_voice_async(), bot.loop)
-
-    # Asynchronous method to connect to voice channel
-    async def connect_to_voice_async(self):
-        global vc
-        print("Attempting to connect to voice...")
-        if not bot.guilds:
-            print("❌ ERROR: Bot is not in any servers!")
+    # Turns an index, which may count from the end, into a position in the queue
+    def position(self, index):
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("playlist index out of range")
+        return index
+
+    # Finds (block number, offset in block) for a position in O(log n)
+    def locate(self, index):
+        index = self.position(index)
+        block = 0
+        step = 1 << (len(self.tree) - 1).bit_length()
+        while step:
+            nxt = block + step
+            if nxt < len(self.tree) and self.tree[nxt] <= index:
+                block = nxt
+                index -= self.tree[nxt]
+            step >>= 1
+        return block, index
+
+    # Records a change and tells the listeners about it
+    def changed(self, *change):
+        self.version += 1
+        change = (self.version,) + change
+        for listener in self.listeners:
+            listener(change)
+
+    def append(self, item):
+        self.extend([item])
+
+    # Adds several items as a single change
+    def extend(self, items):
+        items = list(items)
+        if not items:
             return
-        guild = bot.guilds[0]
-        print(f"🔍 Searching for voice channel in: {guild.name}")
-        voice_channel = discord.utils.get(guild.voice_channels, name="tutturu~")
-        if voice_channel:
-            print(f"🎤 Found voice channel: {voice_channel.name}, joining...")
+        start = self.length
+        for item in items:
+            self.put_at(self.length, item)
+        self.changed("insert", start, items)
+
+    # Fills in the tree node of a block just appended at the end
+    def fix_new_block(self):
+        i = len(self.blocks)
+        lowest = i & -i
+        self.tree[i] = sum(len(self.blocks[j]) for j in range(i - lowest, i))
+
+    # Takes the first item off the queue
+    def popleft(self):
+        if not self.length:
+            raise IndexError("pop from empty playlist")
+        item = self.take_at(0)
+        self.changed("remove", 0, 1)
+        return item
+
+    def clear(self):
+        self.blocks = []
+        self.tree = [0]
+        self.length = 0
+        self.changed("clear")
+
+    def insert(self, index, item):
+        index = max(0, min(index, self.length))
+        self.put_at(index, item)
+        self.changed("insert", index, [item])
+
+    def remove(self, index):
+        index = self.position(index)
+        item = self.take_at(index)
+        self.changed("remove", index, 1)
+        return item
+
+    # Moves an item so that it ends up at the target position
+    def move(self, source, target):
+        source = self.position(source)
+        target = max(0, min(target, self.length - 1))
+        item = self.take_at(source)
+        self.put_at(target, item)
+        if source != target:
+            self.changed("move", source, target)
+
+    # Inserts without recording a change
+    def put_at(self, index, item):
+        if index == self.length:
+            if not self.blocks or len(self.blocks[-1]) >= self.block_size:
+                self.blocks.append([])
+                self.tree.append(0)
+                self.fix_new_block()
+            block, offset = len(self.blocks) - 1, len(self.blocks[-1])
+        else:
+            block, offset = self.locate(index)
+        self.blocks[block].insert(offset, item)
+        self.length += 1
+        if len(self.blocks[block]) > self.block_size * 2:
+            # Split an overgrown block so in-block shifts stay short
+            half = len(self.blocks[block]) // 2
+            self.blocks.insert(block + 1, self.blocks[block][half:])
+            del self.blocks[block][half:]
+            self.rebuild_tree()
+        else:
+            self.tree_add(block, 1)
+
+    # Removes without recording a change
+    def take_at(self, index):
+        block, offset = self.locate(index)
+        item = self.blocks[block].pop(offset)
+        self.length -= 1
+        if self.blocks[block]:
+            self.tree_add(block, -1)
+        else:
+            self.blocks.pop(block)
+            self.rebuild_tree()
+        return item
+
+    # Full copy of the queue along with the version it reflects
+    def snapshot(self):
+        return self.version, list(self)
+
+# Player states; only the player's actor moves between them
+STATE_DISCONNECTED = "disconnected"
+STATE_IDLE = "idle"
+STATE_PLAYING = "playing"
+STATE_PAUSED = "paused"
+
+# Playback state and controls for one guild's voice session, driven by a queue of commands
+# that a single actor task works through in order
+class GuildPlayer:
+    def __init__(self, guild_id, channel_name=VOICE_CHANNEL_NAME):
+        self.guild_id = guild_id
+        self.channel_name = channel_name
+        self.channel_id = None  # voice channel joined last, rejoined when no other one is picked
+        self.state = STATE_DISCONNECTED
+        self.vc = None
+        self.mixer = None
+        self.playlist = Playlist()
+        self.current_file = None
+        self.current_track = None
+        self.prefetched = None  # (file path, tracked source, volume source) of the next track warming up
+        self.interrupted_music = None
+        self.music_control = VolumeControl()  # shared by every music gain stage this player makes
+        self.quick_sound_control = VolumeControl()
+        self.crossfade_seconds = CROSSFADE_SECONDS
+        self.commands = None  # asyncio queue of (name, args, future, time queued), made on the bot loop
+        self.actor = None
+        self.command_stats = {}  # command name -> [count, total seconds, worst seconds] from queued to done
+        self.worker = audio_pool.assign() if audio_pool else None  # audio runs here when worker processes are on
+        self.listeners = []  # called with the player whenever its queue or playback state changes
+
+    # Volumes can be set from any thread; playing audio picks them up on its next frame
+    @property
+    def music_volume(self):
+        return self.music_control.value
+
+    @music_volume.setter
+    def music_volume(self, value):
+        self.music_control.value = value
+
+    @property
+    def quick_sound_volume(self):
+        return self.quick_sound_control.value
+
+    @quick_sound_volume.setter
+    def quick_sound_volume(self, value):
+        self.quick_sound_control.value = value
+
+    # Tells whoever is displaying this player that something changed
+    def notify(self):
+        for listener in self.listeners:
+            listener(self)
+
+    # Queues a command for the player's actor and waits for its result (call on the bot loop)
+    async def send(self, name, *args):
+        future = asyncio.get_running_loop().create_future()
+        self.post(name, *args, future=future)
+        return await future
+
+    # Queues a command without waiting for it (call on the bot loop)
+    def post(self, name, *args, future=None):
+        if self.actor is None:
+            self.commands = asyncio.Queue()
+            self.actor = asyncio.get_running_loop().create_task(self.run())
+        self.commands.put_nowait((name, args, future, time.perf_counter()))
+
+    # Queues a command from another thread, such as the GUI or the voice player
+    def post_threadsafe(self, name, *args):
+        bot.loop.call_soon_threadsafe(lambda: self.post(name, *args))
+
+    # The actor: runs one command at a time, so playback state is only ever touched from here
+    async def run(self):
+        while True:
+            name, args, future, queued_at = await self.commands.get()
+            started = time.perf_counter()
             try:
-                vc = await voice_channel.connect()
-                print("🎶 Successfully connected to voice channel.")
-                self.disconnect_button.setEnabled(True)
-                self.connect_button.setEnabled(False)
-            except discord.errors.ClientException:
-                print("❌ ERROR: Already connected to a voice channel!")
+                result = await getattr(self, "on_" + name)(*args)
+                if future and not future.done():
+                    future.set_result(result)
+            except Exception as e:
+                print(f"❌ ERROR: '{name}' command failed: {e}")
+                if future and not future.done():
+                    future.set_exception(e)
+            self.record_latency(name, queued_at, started)
+
+    # Keeps queued-to-done timings for each kind of command, and how long each one waited and ran
+    def record_latency(self, name, queued_at, started):
+        finished = time.perf_counter()
+        latency = finished - queued_at
+        metrics.histogram("player_command_wait_seconds", "Time a player command waited behind earlier ones", command=name).observe(started - queued_at)
+        metrics.histogram("player_command_run_seconds", "Time a player command took to run", command=name).observe(finished - started)
+        stats = self.command_stats.setdefault(name, [0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += latency
+        stats[2] = max(stats[2], latency)
+        if latency > 0.05 and name != "connect":
+            print(f"🐢 '{name}' command took {latency * 1000:.1f} ms from click to effect")
+
+    def set_state(self, state):
+        if state != self.state:
+            print(f"🔀 Player state: {self.state} -> {state}")
+            self.state = state
+
+    # Returns the mixer playing on the voice client, starting a new one if the last one finished
+    def get_mixer(self):
+        if self.mixer is None or self.mixer.finished:
+            if self.vc.is_playing() or self.vc.is_paused():
+                self.vc.stop()
+            crossfade_frames = round(self.crossfade_seconds / 0.02)
+            if self.worker:
+                self.mixer = RemoteMixer(self.worker, self.music_control, self.quick_sound_control, crossfade_frames)
+            else:
+                self.mixer = MixerAudio(crossfade_frames=crossfade_frames)
+            self.vc.play(self.mixer, after=self.after_mixer)
+        return self.mixer
+
+    # Plays a music source through the mixer
+    def mix_music(self, source, after):
+        while not self.get_mixer().set_music(source, after):
+            pass
+
+    # Plays a quick sound through the mixer on top of the music
+    def mix_effect(self, source, after):
+        while not self.get_mixer().add_effect(source, after):
+            pass
+
+    # Opens a queued file as (tracked source, volume source), in this process or in the audio worker,
+    # starting start seconds into the track. The read-ahead covers the crossfade too, so the decoder
+    # finishes, and the next track is opened, before the fade has to begin
+    async def open_track(self, file_path, start=0.0):
+        read_ahead = READ_AHEAD_FRAMES + round(self.crossfade_seconds / 0.02)
+        loop = asyncio.get_running_loop()
+        opus_path = None
+        if OPUS_PASSTHROUGH and not self.worker:
+            opus_path = await loop.run_in_executor(None, find_opus_source, file_path)
+            if opus_path:
+                print(f"🎧 Opus passthrough available for {os.path.basename(file_path)}")
+        pcm_path = None
+        if not opus_path:
+            pcm_path = await loop.run_in_executor(None, pcm_cache.lookup, file_path)
+            if pcm_path is None:
+                pcm_cache.schedule(file_path)  # next time it plays straight from disk
+        if opus_path and opus_path != file_path:
+            track_gain = 1.0  # the pre-encoded copy was normalized when it was made
         else:
-            print("❌ ERROR: Voice channel 'tutturu~' not found!")
-
-    # Disconnects from voice channel
-    def disconnect_from_voice(self):
-        global vc
-        if vc:
-            asyncio.run_coroutine_threadsafe(vc.disconnect(), bot.loop)
-            print("👋 Disconnected from voice channel.")
-            self.disconnect_button.setEnabled(False)
-            self.connect_button.setEnabled(True)
+            track_gain = await loop.run_in_executor(None, loudness_analyzer.gain, file_path)
+        seek_point = None
+        if not opus_path and not pcm_path:
+            if start:
+                index = await loop.run_in_executor(None, load_mp3_seek_index, file_path)
+                seek_point = index.locate(start) if index else None
+            else:
+                loop.run_in_executor(None, load_mp3_seek_index, file_path)  # ready before the first scrub
+        if self.worker:
+            source = RemoteSource(self.worker, on_eof=self.decoder_finished, start=start)
+            self.worker.send("open_track", source.source_id, file_path, self.music_volume, pcm_path, track_gain, start, seek_point, read_ahead)
+            return source, source
+        return open_music_source(file_path, self.music_control, on_eof=self.decoder_finished, opus_path=opus_path, pcm_path=pcm_path, track_gain=track_gain, start=start, seek_point=seek_point, read_ahead=read_ahead)
+
+    # Waits, without polling, until the voice player has taken its next frame.
+    # Sources dropped from the mixer are released on that read, and resumed audio is flowing after it
+    async def wait_for_mixer(self, timeout=1.0):
+        mixer = self.mixer
+        if mixer is None or mixer.finished or self.vc is None:
+            return
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        mixer.call_on_next_read(lambda: loop.call_soon_threadsafe(resolve_future, future))
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            print("⚠️ Voice player did not read from the mixer in time.")
+
+    # Current playback position of the music track in seconds
+    def music_position(self):
+        return self.current_track.position() if self.current_track else 0
+
+    # Length of the music track in seconds, or None if it isn't known yet
+    def music_duration(self):
+        return track_duration(self.current_file) if self.current_file else None
+
+    # Checks if a music track is loaded in the mixer (playing or paused)
+    def is_music_loaded(self):
+        return self.vc is not None and self.mixer is not None and not self.mixer.finished and self.mixer.has_music()
+
+    def after_mixer(self, error):
+        if error:
+            print(f"Mixer stopped with error: {error}")
+
+    # Commands. Each public coroutine queues a command for the actor; the on_ methods run inside it
+
+    # Connects to a voice channel of this guild: the one with channel_id if given, otherwise the
+    # channel joined last or the one named channel_name
+    async def connect(self, channel_id=None):
+        return await self.send("connect", channel_id)
+
+    async def on_connect(self, channel_id=None):
+        if self.state != STATE_DISCONNECTED:
+            print("❌ ERROR: Already connected to a voice channel!")
+            return False
+        print("Attempting to connect to voice...")
+        guild = bot.get_guild(self.guild_id)
+        if guild is None:
+            print("❌ ERROR: Bot is not in this server!")
+            return False
+        print(f"🔍 Searching for voice channel in: {guild.name}")
+        channel_id = channel_id or self.channel_id
+        if channel_id:
+            voice_channel = guild.get_channel(channel_id)
         else:
+            voice_channel = discord.utils.get(guild.voice_channels, name=self.channel_name)
+        if not isinstance(voice_channel, discord.VoiceChannel):
+            print(f"❌ ERROR: Voice channel '{channel_id or self.channel_name}' not found!")
+            return False
+        print(f"🎤 Found voice channel: {voice_channel.name}, joining...")
+        try:
+            self.vc = await voice_channel.connect()
+        except discord.errors.ClientException:
+            print("❌ ERROR: Already connected to a voice channel!")
+            return False
+        print("🎶 Successfully connected to voice channel.")
+        self.channel_id = voice_channel.id
+        self.set_state(STATE_IDLE)
+        if self.interrupted_music:
+            # Pick the track back up from memory after the voice connection was dropped
+            source, after = self.interrupted_music
+            self.interrupted_music = None
+            self.current_track.rewind(INTERRUPT_REWIND_SECONDS)
+            self.mix_music(source, after)
+            self.set_state(STATE_PLAYING)
+            print(f"▶️ Resumed {self.current_file} at {self.music_position():.2f}s")
+            if self.current_track.eof:
+                await self.on_prefetch()  # its decoder already finished, so nothing else will ask
+        elif self.playlist:
+            await self.on_next()
+        return True
+
+    # Keeps the current track and its buffered audio alive, then leaves the voice channel
+    async def disconnect(self):
+        return await self.send("disconnect")
+
+    async def on_disconnect(self):
+        if self.state == STATE_DISCONNECTED:
             print("❌ ERROR: Not connected to any voice channel.")
+            return False
+        if self.is_music_loaded():
+            source, after = self.mixer.detach_music()
+            if source:
+                self.interrupted_music = (source, after)
+                print(f"⏸️ Holding {self.current_file} at {self.music_position():.2f}s until reconnect")
+        # The voice client cleans up the mixer, and the prefetched track with it, as it stops
+        self.drop_prefetched()
+        await self.vc.disconnect()
+        self.vc = None
+        self.set_state(STATE_DISCONNECTED)
+        print("👋 Disconnected from voice channel.")
+        return True
 
-    # Pauses the currently playing music
+    # Pauses the currently playing music; quick sounds can still play over the pause
     async def pause_music(self):
-        async with vc_lock:
-            print(f"Pausing music. Is playing: {vc.is_playing() if vc else False}")
-            if vc and vc.is_playing():
-                vc.pause()
-            else:
-                print("Nothing is playing, cannot pause.")
+        return await self.send("pause")
+
+    async def on_pause(self):
+        print(f"Pausing music at {self.music_position():.2f}s. Is playing: {self.state == STATE_PLAYING}")
+        if self.state != STATE_PLAYING:
+            print("Nothing is playing, cannot pause.")
+            return False
+        self.mixer.music_paused = True
+        if not self.mixer.has_effects():
+            self.vc.pause()
+        self.set_state(STATE_PAUSED)
+        return True
 
-    # Resumes paused music
+    # Resumes paused music, returning once the voice player is taking frames again
     async def resume_music(self):
-        async with vc_lock:
-            if vc and vc.is_paused():
-                vc.resume()
+        if await self.send("resume"):
+            await self.wait_for_mixer()
 
-    # Stops the currently playing music
+    async def on_resume(self):
+        if self.state != STATE_PAUSED:
+            return False
+        self.mixer.music_paused = False
+        if self.vc.is_paused():
+            self.vc.resume()
+        self.set_state(STATE_PLAYING)
+        return True
+
+    # Stops the music and clears the queue, returning once the track has been released
     async def stop_music(self):
-        global paused_file, paused_position, current_file
-        async with vc_lock:
-            if vc:
-                if vc.is_playing():
-                    vc.stop()
-                while not file_queue.empty():
-                    file_queue.get()
-                paused_file = None
-                paused_position = 0
-                current_file = None
-        self.update_stop_button_state()
-        self.update_queue_display()
-    
-    # Skips to next track 
+        if await self.send("stop"):
+            await self.wait_for_mixer()
+
+    async def on_stop(self):
+        if self.interrupted_music:
+            self.interrupted_music[0].cleanup()
+            self.interrupted_music = None
+        self.drop_prefetched()
+        stopped = False
+        if self.state in (STATE_PLAYING, STATE_PAUSED):
+            self.drop_music()
+            stopped = True
+        self.playlist.clear()
+        self.current_file = None
+        self.current_track = None
+        if self.state != STATE_DISCONNECTED:
+            self.set_state(STATE_IDLE)
+        self.notify()
+        return stopped
+
+    # Skips to next track, returning once the old track has been released
     async def skip_to_next(self):
-        async with vc_lock:
-            if vc and vc.is_playing():
-                vc.stop()
-                while vc.is_playing():  # Wait for the voice client to stop playing audio
-                    await asyncio.sleep(0.1)
-        await self.play_next()
-        self.update_stop_button_state()
-    
-    # Opens a file dialog to select a music file and adds it to the queue
-    def pick_file(self):
-        file_path, _ = QFileDialog.getOpenFileName(self, "Select File", "", "MP3 files (*.mp3);;All Files (*)")
-        if file_path:
-            self.add_to_queue(file_path)
-    
-    # Adds a file to the music queue
+        if await self.send("skip"):
+            await self.wait_for_mixer()
+
+    async def on_skip(self):
+        skipped = self.state in (STATE_PLAYING, STATE_PAUSED)
+        if skipped:
+            self.drop_music()
+            self.set_state(STATE_IDLE)
+        await self.on_next()
+        return skipped
+
+    # Takes the current track out of the mixer without firing after_playing
+    def drop_music(self):
+        if self.is_music_loaded():
+            self.mixer.set_music(None)
+        if self.vc.is_paused():
+            self.vc.resume()  # so the mixer runs once more and releases the track
+
+    # Adds a file to the music queue (safe to call from the GUI thread)
     def add_to_queue(self, file_path):
         print(f"🎶 Adding to queue: {file_path}")
-        file_queue.put(file_path)
-        self.update_queue_display()
-        self.update_stop_button_state()
-        if not vc or not vc.is_playing():
-            asyncio.run_coroutine_threadsafe(self.play_next(), bot.loop)
-             
-    # Updates the queue display in the GUI
-    def update_queue_display(self):
-        self.queue_list.clear()
-        queue_list = list(file_queue.queue)
-        for i, item in enumerate(queue_list):
-            item_display = QListWidgetItem(f"{i+1}: {item}")
-            if i == 0 and vc and vc.is_playing():
-                item_display.setForeground(QColor("green"))
-            elif i == 1:
-                item_display.setForeground(QColor("orange"))
-            self.queue_list.addItem(item_display)
-
-    # Assigns a sound to a quick sound button
-    def assign_sound(self, button_index):
-        button = self.quick_buttons[button_index]
-        file_path, _ = QFileDialog.getOpenFileName(self, f"Select Sound for {button.text()}", "", "MP3 files (*.mp3);;All Files (*)")
-        if file_path:
-            button.setText(os.path.basename(file_path))
-            save_quick_play_file(f"Quick Sound {button_index}", file_path)
-
-    # Pauses the current music to play a quick sound
-    async def pause_current_music(self):
-        global paused_file, paused_position, start_time
-        async with vc_lock:
-            if vc and vc.is_playing():
-                paused_file = current_file
-                paused_position = time.time() - start_time
-                vc.stop()
-
-    # Resumes the paused music after a quick sound finishes
-    async def resume_current_music(self):
-        global paused_file, paused_position, start_time, music_volume
-        async with vc_lock:
-            if paused_file:
-                while vc.is_playing():
-                    await asyncio.sleep(0.1)
-                original_source = discord.FFmpegPCMAudio(paused_file, before_options=f"-ss {paused_position}")
-                volume_source = discord.PCMVolumeTransformer(original_source, volume=music_volume)
-                vc.play(volume_source, after=self.after_playing)
-                start_time = time.time() - paused_position
-                paused_file = None
-                paused_position = 0
-        self.update_stop_button_state()
+        self.post_threadsafe("enqueue", file_path)
+
+    async def on_enqueue(self, file_path):
+        self.playlist.append(file_path)
+        await self.queue_changed()
+
+    # Adds many files to the queue as one change (safe to call from the GUI thread)
+    def add_many_to_queue(self, file_paths):
+        print(f"🎶 Adding {len(file_paths)} file(s) to queue")
+        self.post_threadsafe("enqueue_many", file_paths)
+
+    async def on_enqueue_many(self, file_paths):
+        self.playlist.extend(file_paths)
+        await self.queue_changed()
+
+    # Puts a file at a position in the queue (safe to call from the GUI thread)
+    def insert_into_queue(self, index, file_path):
+        self.post_threadsafe("insert", index, file_path)
+
+    async def on_insert(self, index, file_path):
+        self.playlist.insert(index, file_path)
+        await self.queue_changed()
+
+    # Takes the file at a position out of the queue (safe to call from the GUI thread)
+    def remove_from_queue(self, index):
+        self.post_threadsafe("remove", index)
+
+    async def on_remove(self, index):
+        if not -len(self.playlist) <= index < len(self.playlist):
+            print(f"❌ ERROR: No queue entry at position {index + 1}.")
+            return
+        self.playlist.remove(index)
+        await self.queue_changed()
+
+    # Moves a queued file to another position (safe to call from the GUI thread)
+    def move_in_queue(self, source, target):
+        self.post_threadsafe("move", source, target)
+
+    async def on_move(self, source, target):
+        if not -len(self.playlist) <= source < len(self.playlist):
+            print(f"❌ ERROR: No queue entry at position {source + 1}.")
+            return
+        self.playlist.move(source, target)
+        await self.queue_changed()
+
+    # Starts playback or fixes up the prefetched track after the queue was edited
+    async def queue_changed(self):
+        self.notify()
+        if self.prefetched and (not self.playlist or self.playlist[0] != self.prefetched[0]):
+            self.drop_prefetched()
+        if self.state == STATE_IDLE:
+            await self.on_next()
+        elif self.current_track and self.current_track.eof:
+            await self.on_prefetch()
+
+    # Jumps to a time in the current track, returning once audio from there is playing
+    async def seek_music(self, seconds):
+        if await self.send("seek", seconds) and self.state == STATE_PLAYING:
+            await self.wait_for_mixer()
+
+    async def on_seek(self, seconds):
+        if self.state not in (STATE_PLAYING, STATE_PAUSED) or not self.current_file:
+            print("Nothing is playing, cannot seek.")
+            return False
+        if self.prefetched and self.is_music_loaded() and self.mixer.music is self.prefetched[2]:
+            return False  # the track ended while this was queued and the next one has taken over
+        duration = self.music_duration()
+        seconds = max(0.0, seconds if duration is None else min(seconds, duration))
+        # Open the track again at the new position and swap it in; a prefetched next track stays queued
+        self.current_track, volume_source = await self.open_track(self.current_file, start=seconds)
+        self.mix_music(volume_source, after=self.after_playing)
+        if self.state == STATE_PAUSED:
+            self.mixer.music_paused = True
+        print(f"⏩ Seeked to {format_duration(seconds)} in {os.path.basename(self.current_file)}")
+        self.notify()
+        return True
 
     # Plays a quick sound with volume control
-    async def play_quick_sound_coroutine(self, sound_file):
-        global quick_sound_volume, is_playing_quick_sound, paused_file, paused_position
-        async with vc_lock:
-            if vc and vc.is_playing():
-                paused_file = current_file
-                paused_position = time.time() - start_time
-                vc.stop()  # Stop the current music
-            is_playing_quick_sound = True
-            original_source = discord.FFmpegPCMAudio(sound_file)
-            volume_source = discord.PCMVolumeTransformer(original_source, volume=quick_sound_volume)
-            if vc:
-                vc.play(volume_source, after=lambda e: asyncio.run_coroutine_threadsafe(self.resume_music_after_quick_sound(e), bot.loop))
+    async def play_quick_sound(self, sound_file, click_time=None):
+        # Use the in-memory copy when we have one, otherwise decode it off the event loop before queueing
+        original_source = quick_sound_bank.make_source(sound_file, click_time) if quick_sound_bank.get(sound_file) else None
+        if original_source is None:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, quick_sound_bank.load, sound_file)
+            original_source = quick_sound_bank.make_source(sound_file, click_time)
+        track_gain = loudness_analyzer.cached_gain(sound_file)
+        if track_gain is None:
+            # Look the gain up off the loop for the next press; this one plays as it is
+            asyncio.get_running_loop().run_in_executor(None, loudness_analyzer.gain, sound_file)
+            track_gain = 1.0
+        if self.worker:
+            # The worker keeps its own copy of the decoded sound and plays it there
+            if original_source is not None:
+                self.worker.send_sound(sound_file, original_source.pcm.obj)
+            original_source = RemoteSource(self.worker)
+            self.worker.send("open_effect", original_source.source_id, sound_file, self.quick_sound_volume, click_time, track_gain)
+        if original_source is None:
+            try:
+                original_source = open_pcm_decoder(sound_file)
+            except discord.ClientException as e:
+                print(f"❌ ERROR: Could not play {os.path.basename(sound_file)}: {e}")
+                return
+        await self.send("quick_sound", original_source, track_gain)
+
+    async def on_quick_sound(self, original_source, track_gain=1.0):
+        if self.state == STATE_DISCONNECTED:
+            original_source.cleanup()
+            print("Not connected to voice.")
+            return
+        volume_source = original_source if self.worker else GainAudio(original_source, volume=self.quick_sound_control, track_gain=track_gain)
+        # Mixed over the music, which is ducked but keeps playing
+        self.mix_effect(volume_source, after=lambda e: self.post_threadsafe("quick_sound_finished", e))
+        if self.vc.is_paused():
+            self.vc.resume()
+
+    # Puts the voice client back into pause once quick sounds over paused music are done
+    async def on_quick_sound_finished(self, error):
+        if error:
+            print(f"Quick sound playback error: {error}")
+        if self.state == STATE_PAUSED and not self.mixer.has_effects() and not self.vc.is_paused():
+            self.vc.pause()
+
+    # Plays the next song in the queue
+    async def on_next(self):
+        if self.state != STATE_DISCONNECTED and self.playlist:
+            if self.prefetched and self.is_music_loaded() and self.mixer.music is self.prefetched[2]:
+                # The mixer already switched to the prefetched track on the frame boundary
+                self.current_file, self.current_track, _ = self.prefetched
+                self.prefetched = None
+                self.playlist.popleft()
+                print(f"Playing next track: {self.current_file}")
+            elif not self.is_music_loaded():  # Check if a track is not already playing
+                self.current_file = self.playlist.popleft()
+                if self.prefetched and self.prefetched[0] == self.current_file:
+                    _, self.current_track, volume_source = self.prefetched
+                    self.prefetched = None
+                else:
+                    self.drop_prefetched()
+                    try:
+                        self.current_track, volume_source = await self.open_track(self.current_file)
+                    except (discord.ClientException, OSError) as e:
+                        # Skipped like a track that ended straight away, so the rest of the queue still plays
+                        print(f"❌ ERROR: Could not open {os.path.basename(self.current_file)}: {e}")
+                        self.current_file = self.current_track = None
+                        self.post("track_ended")
+                        self.notify()
+                        return
+                self.mix_music(volume_source, after=self.after_playing)
+                if self.vc.is_paused():
+                    self.vc.resume()
+                print(f"Playing next track: {self.current_file}")
             else:
-                print("Not connected to voice.")
-    
-    # Resumes track after quick sound has played
-    async def resume_music_after_quick_sound(self, error):
-        global is_playing_quick_sound, paused_file, paused_position, start_time, music_volume
-        async with vc_lock:
-            is_playing_quick_sound = False
-            if error:
-                print(f"Quick sound playback error: {error}")
-            if paused_file:
-                if not vc:
-                    await self.connect_to_voice_async()
-                while vc.is_playing():
-                    await asyncio.sleep(0.1)
-                original_source = discord.FFmpegPCMAudio(paused_file, before_options=f"-ss {paused_position}")
-                volume_source = discord.PCMVolumeTransformer(original_source, volume=music_volume)
-                vc.play(volume_source, after=self.after_playing)
-                start_time = time.time() - paused_position
-                paused_file = None
-                paused_position = 0
-
-     # Handles playing a quick sound when a button is clicked
-    def play_quick_sound(self, button_index):
-        button = self.quick_buttons[button_index]
-        sound_file = load_quick_play_files().get(f"Quick Sound {button_index}")
-        if sound_file:
-            print(f"🎶 Playing assigned sound: {sound_file}")
-            asyncio.run_coroutine_threadsafe(self.pause_current_music(), bot.loop)
-            asyncio.run_coroutine_threadsafe(self.play_quick_sound_coroutine(sound_file), bot.loop)
+                print("Already playing audio, skipping...")
+            self.set_state(STATE_PLAYING)
         else:
-            self.prompt_assign_sound(button_index)
-
-    # Prompts the user to assign a sound to a quick sound button
-    def prompt_assign_sound(self, button_index):
-        button = self.quick_buttons[button_index]
-        response = QMessageBox.question(
-            self,
-            "No Sound Assigned",
-            f"No sound is currently assigned to {button.text()}. Would you like to assign one now?",
-            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
-            QMessageBox.StandardButton.Yes
-        )
-        if response == QMessageBox.StandardButton.Yes:
-            self.assign_sound(button_index)
-
-     # Plays the next song in the queue
-    async def play_next(self):
-        global current_file, start_time, music_volume
-        async with vc_lock:
-            if vc is not None and not file_queue.empty():
-                current_file = file_queue.get()
-                original_source = discord.FFmpegPCMAudio(current_file)
-                volume_source = discord.PCMVolumeTransformer(original_source, volume=music_volume)
-                if not vc.is_playing():  # Check if the voice client is not already playing audio
-                    vc.play(volume_source, after=self.after_playing)
-                    start_time = time.time()
-                    print(f"Playing next track: {current_file}")
-                else:
-                    print("Already playing audio, skipping...")
+            print("No more tracks in the queue.")
+            if self.state != STATE_DISCONNECTED and not self.is_music_loaded():
+                self.set_state(STATE_IDLE)
+        self.notify()
+
+    # Starts decoding the next queued track while the current one plays out its buffer
+    async def on_prefetch(self):
+        if self.prefetched or not self.playlist or not self.is_music_loaded():
+            return
+        next_file = self.playlist[0]
+        track, volume_source = await self.open_track(next_file)
+        self.prefetched = (next_file, track, volume_source)
+        self.mixer.set_next_music(volume_source, after=self.after_playing)
+        print(f"⏩ Prefetching next track: {next_file}")
+
+    # Throws away a prefetched track that is no longer next in line
+    def drop_prefetched(self):
+        if self.prefetched:
+            if self.mixer is not None and not self.mixer.finished and self.mixer.next_music is self.prefetched[2]:
+                self.mixer.set_next_music(None)
             else:
-                print("No more tracks in the queue.")
-        self.update_stop_button_state()
-        self.update_queue_display()
+                self.prefetched[2].cleanup()
+            self.prefetched = None
 
+    # Called from a track's decoder thread once the whole track has been decoded
+    def decoder_finished(self):
+        self.post_threadsafe("prefetch")
+
+    # Called by the mixer when the music track runs out
     def after_playing(self, error):
-        global is_playing_quick_sound
         if error:
             print(f"Playback stopped with error: {error}")
-        if not is_playing_quick_sound:  # Only proceed to next track if not a quick sound
-            asyncio.run_coroutine_threadsafe(self.play_next(), bot.loop)
+        self.post_threadsafe("track_ended")
+
+    async def on_track_ended(self):
+        await self.on_next()
+
+    # Sets the volume of the music; safe from any thread and never waits on the actor
+    def set_music_volume(self, new_volume):
+        self.music_volume = new_volume
+
+    # Sets how long queued tracks overlap; safe from any thread. A track that is already decoding
+    # keeps its read-ahead, so the fade into the track after it may come out shorter than asked
+    def set_crossfade(self, seconds):
+        self.crossfade_seconds = min(max(seconds, 0.0), MAX_CROSSFADE_SECONDS)
+        if self.mixer is not None and not self.mixer.finished:
+            self.mixer.crossfade_frames = round(self.crossfade_seconds / 0.02)
+
+    # Checks if there is anything for the stop button to stop
+    def has_music(self):
+        return self.state in (STATE_PLAYING, STATE_PAUSED) or (self.state == STATE_IDLE and bool(self.playlist))
+
+# Completes a future unless something already did (used from loop.call_soon_threadsafe)
+def resolve_future(future, result=None):
+    if not future.done():
+        future.set_result(result)
+
+# One player per guild, so a single bot process can play in many servers at once
+players = {}
+metrics.gauge("players", "Servers with a player", lambda: len(players))
+metrics.gauge("player_queue_length", "Tracks waiting in all play queues", lambda: sum(len(player.playlist) for player in list(players.values())))
+metrics.gauge("audio_worker_frame_deadline_misses", "Frames the audio workers produced late", lambda: sum(worker["deadline_misses"] for worker in audio_pool.stats()) if audio_pool else 0)
+
+# Returns the player for a guild, creating it the first time it is used
+def get_player(guild_id):
+    if guild_id not in players:
+        players[guild_id] = GuildPlayer(guild_id)
+    return players[guild_id]
+
+# Decoded quick sounds and cached tracks are shared by every server's player
+quick_sound_bank = QuickSoundBank()
+pcm_cache = PCMDiskCache()
+library = Library()
+track_metadata = TrackMetadataCache(library)
+loudness_analyzer = LoudnessAnalyzer(library)
+
+# How a queued track is shown: tags and length once probed, otherwise the path
+def describe_track(file_path):
+    metadata = track_metadata.get(file_path)
+    if not metadata:
+        return file_path
+    name = metadata.get("title") or os.path.basename(file_path)
+    if metadata.get("artist"):
+        name = f"{metadata['artist']} - {name}"
+    if metadata.get("duration"):
+        name += f" ({format_duration(metadata['duration'])})"
+    return name
+
+# Formats seconds as m:ss
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes}:{seconds:02d}"
+
+# Reads a time typed as seconds, m:ss or h:mm:ss
+def parse_duration(text):
+    seconds = 0.0
+    for part in text.split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+# Length of a track from its probed metadata or its MP3 seek index, without touching the disk
+def track_duration(file_path):
+    metadata = track_metadata.get(file_path)
+    if metadata and metadata.get("duration"):
+        return float(metadata["duration"])
+    known = mp3_seek_indexes.get(file_path)
+    if known and known[2]:
+        return known[2].duration()
+    return None
+
+# Queues files, folders or playlists as one queue change; the library, loudness and metadata are
+# filled in on a background thread like a GUI import. Returns how many tracks were queued
+# Only tracks that pass allowed (if given) are queued
+async def queue_paths(player, paths, allowed=None):
+    loop = asyncio.get_running_loop()
+    file_paths = []
+    for path in paths:
+        file_paths.extend(await loop.run_in_executor(None, collect_tracks, path))
+    if allowed:
+        file_paths = [file_path for file_path in file_paths if allowed(file_path)]
+    if file_paths:
+        player.add_many_to_queue(file_paths)
+        def index():
+            library.add_files(file_paths)
+            loudness_analyzer.schedule(file_paths)
+            track_metadata.probe_all(file_paths)
+        threading.Thread(target=index, daemon=True).start()
+    return len(file_paths)
+
+status_edits = metrics.counter("status_message_edits_total", "Edits and posts of the chat status message")
+status_changes = metrics.counter("status_message_changes_total", "Player changes the chat status message was told about")
+
+# A server's "now playing / queue" message, edited in place as the player changes. Changes are
+# coalesced: at most one edit goes out every STATUS_EDIT_INTERVAL seconds, showing the latest state,
+# so a big enqueue or a busy channel costs one edit instead of a message per track
+class StatusMessage:
+    def __init__(self, player):
+        self.player = player
+        self.channel = None
+        self.message = None
+        self.content = None
+        self.last_edit = 0.0
+        self.pending = None  # task that makes the next edit
+        player.listeners.append(lambda player: bot.loop.call_soon_threadsafe(self.changed))
+
+    # Shows the message in a channel; repost moves it below the latest chat
+    async def show_in(self, channel, repost=False):
+        if self.message is not None and (repost or channel != self.channel):
+            try:
+                await self.message.delete()
+            except discord.HTTPException:
+                pass
+            self.message = None
+            self.content = None
+        self.channel = channel
+        self.changed()
+
+    def changed(self):
+        status_changes.inc()
+        if self.channel is None or (self.pending is not None and not self.pending.done()):
+            return  # the edit already on its way will pick this change up
+        self.pending = asyncio.ensure_future(self.update())
+
+    async def update(self):
+        delay = self.last_edit + STATUS_EDIT_INTERVAL - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        self.pending = None  # changes from here on need another edit
+        content = self.render()
+        if content == self.content:
+            return
+        self.last_edit = time.perf_counter()
+        self.content = content
+        status_edits.inc()
+        try:
+            if self.message is not None:
+                try:
+                    await self.message.edit(content=content)
+                    return
+                except discord.NotFound:
+                    self.message = None  # deleted by someone, post a new one
+            self.message = await self.channel.send(content)
+        except discord.HTTPException as e:
+            self.content = None
+            print(f"❌ ERROR: Could not update the status message: {e}")
+
+    def render(self):
+        player = self.player
+        if player.current_file and player.state in (STATE_PLAYING, STATE_PAUSED):
+            paused = " (paused)" if player.state == STATE_PAUSED else ""
+            lines = [f"🎶 Now playing{paused}: {describe_track(player.current_file)}"]
+        else:
+            lines = ["🎶 Nothing playing"]
+        queued = len(player.playlist)
+        if queued:
+            lines.append(f"Up next ({queued} queued, volume {int(player.music_volume * 100)}%):")
+            for i in range(min(queued, STATUS_QUEUE_LINES)):
+                lines.append(f"{i + 1}. {describe_track(player.playlist[i])}"[:150])
+            if queued > STATUS_QUEUE_LINES:
+                lines.append(f"...and {queued - STATUS_QUEUE_LINES} more")
+        return "\n".join(lines)
+
+# One status message per server, made the first time a chat command is used there
+status_messages = {}
+
+def get_status_message(player):
+    if player.guild_id not in status_messages:
+        status_messages[player.guild_id] = StatusMessage(player)
+    return status_messages[player.guild_id]
+
+# True if a path really lies inside one of CHAT_MUSIC_ROOTS, after following links and ".."
+def in_chat_music_root(path):
+    real = os.path.realpath(path)
+    for root in CHAT_MUSIC_ROOTS:
+        root = os.path.realpath(root)
+        try:
+            if os.path.commonpath([real, root]) == root:
+                return True
+        except ValueError:  # on another drive
+            pass
+    return False
+
+# !play <search words, or a file, folder or playlist under CHAT_MUSIC_ROOTS>: queues it all at once,
+# joining the voice channel if needed
+@bot.command(name="play")
+async def play_command(ctx, *, query: str):
+    if ctx.guild is None:
+        return
+    player = get_player(ctx.guild.id)
+    loop = asyncio.get_running_loop()
+    path = query.strip().strip('"')
+    if CHAT_MUSIC_ROOTS and in_chat_music_root(path) and await loop.run_in_executor(None, os.path.exists, path):
+        paths = [path]
+    else:
+        rows = await loop.run_in_executor(None, lambda: library.search(query, kind="track", limit=1))
+        if not rows:
+            await ctx.send(f"Nothing in the library matches '{query}'.")
+            return
+        paths = [rows[0][0]]
+    # Join whichever voice channel the caller is sitting in
+    channel_id = ctx.author.voice.channel.id if getattr(ctx.author, "voice", None) and ctx.author.voice.channel else None
+    if player.state == STATE_DISCONNECTED and not await player.connect(channel_id):
+        await ctx.send("Could not join the voice channel.")
+        return
+    if not await queue_paths(player, paths, allowed=lambda file_path: file_path == paths[0] or in_chat_music_root(file_path)):
+        await ctx.send("No audio files found there.")
+        return
+    await get_status_message(player).show_in(ctx.channel)
+    await ctx.message.add_reaction("✅")
+
+# !queue: (re)posts the status message at the bottom of this channel
+@bot.command(name="queue")
+async def queue_command(ctx):
+    if ctx.guild is None:
+        return
+    await get_status_message(get_player(ctx.guild.id)).show_in(ctx.channel, repost=True)
+
+# !skip: moves on to the next queued track
+@bot.command(name="skip")
+async def skip_command(ctx):
+    if ctx.guild is None:
+        return
+    player = get_player(ctx.guild.id)
+    await player.skip_to_next()
+    await get_status_message(player).show_in(ctx.channel)
+    await ctx.message.add_reaction("⏭️")
+
+# !sound <button number or name>: plays a quick sound over the music
+@bot.command(name="sound")
+async def sound_command(ctx, *, name: str):
+    click_time = time.perf_counter()
+    if ctx.guild is None:
+        return
+    player = get_player(ctx.guild.id)
+    # Both lookups read the library, which an import can hold, so they run off the loop
+    loop = asyncio.get_running_loop()
+    sound_file = (await loop.run_in_executor(None, load_quick_play_files)).get(f"Quick Sound {name.strip()}")
+    if sound_file is None:
+        rows = await loop.run_in_executor(None, lambda: library.search(name, kind="sound", limit=1))
+        sound_file = rows[0][0] if rows else None
+    if sound_file is None:
+        await ctx.send(f"No quick sound called '{name}'.")
+        return
+    await player.play_quick_sound(sound_file, click_time)
+
+# !volume [0-100]: sets or shows the music volume
+@bot.command(name="volume")
+async def volume_command(ctx, percent: int = None):
+    if ctx.guild is None:
+        return
+    player = get_player(ctx.guild.id)
+    if percent is None:
+        await ctx.send(f"🔊 Music volume is {int(player.music_volume * 100)}%.")
+        return
+    player.set_music_volume(min(max(percent, 0), 100) / 100)
+    get_status_message(player).changed()
+    await ctx.message.add_reaction("🔊")
+
+# !crossfade [0-10]: sets or shows how many seconds queued tracks overlap
+@bot.command(name="crossfade")
+async def crossfade_command(ctx, seconds: float = None):
+    if ctx.guild is None:
+        return
+    player = get_player(ctx.guild.id)
+    if seconds is None:
+        await ctx.send(f"🔀 Crossfade is {player.crossfade_seconds:g} s.")
+        return
+    player.set_crossfade(seconds)
+    await ctx.message.add_reaction("🔀")
+
+# !seek 1:23 jumps to a time in the current track; !seek +10 and !seek -10 skip forward and back
+@bot.command(name="seek")
+async def seek_command(ctx, position: str):
+    if ctx.guild is None:
+        return
+    player = get_player(ctx.guild.id)
+    try:
+        seconds = parse_duration(position.lstrip("+-"))
+    except ValueError:
+        await ctx.send("Usage: !seek 1:23, !seek +10 or !seek -10")
+        return
+    if position[0] in "+-":
+        seconds = player.music_position() + (seconds if position[0] == "+" else -seconds)
+    if await player.send("seek", seconds):
+        await ctx.send(f"⏩ {format_duration(player.music_position())}")
+    else:
+        await ctx.send("Nothing is playing.")
+
+# Current resident memory of this process in MB, or None where it can't be read
+def resident_memory_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024  # peak, not current
+    except ImportError:
+        return None
+
+# Prints how long the bot took to come up and how much memory it holds, so modes can be compared
+def report_startup(mode):
+    global startup_seconds
+    startup_seconds = time.perf_counter() - PROCESS_STARTED
+    rss = resident_memory_mb()
+    print(f"⏱️ {mode} startup: ready after {startup_seconds:.2f}s, resident memory {f'{rss:.1f} MB' if rss is not None else 'unknown'}")
+
+# Logs the bot's guilds once Discord has accepted the login
+def log_ready():
+    print(f"Bot is logged in as {bot.user}")
+    if bot.guilds:
+        print(f"Connected to {len(bot.guilds)} guild(s).")
+    else:
+        print("❌ ERROR: Bot is not in any guilds!")
+
+startup_seconds = None
+
+# Gateway events received since start, by event type. Only counted while measuring: discord.py starts a
+# task for every event that has a listener, which a normal run shouldn't pay for
+gateway_events = {}
+
+async def on_socket_event_type(event_type):
+    gateway_events[event_type] = gateway_events.get(event_type, 0) + 1
+    metrics.counter("gateway_events_total", "Gateway events received from Discord", event=event_type).inc()
+
+# Runs the bot without the window for a while and reports resident memory, gateway events per second
+# and cache sizes every 10 seconds, so the gateway profiles can be compared. The totals are appended
+# to results_path
+async def measure_gateway(seconds, results_path=GATEWAY_RESULTS_FILE):
+    bot.add_listener(on_socket_event_type)
+
+    @bot.event
+    async def on_ready():
+        log_ready()
+        report_startup(f"Gateway measurement ({GATEWAY_PROFILE} profile)")
+
+    async def measure():
+        await bot.wait_until_ready()
+        events_at_ready = sum(gateway_events.values())
+        ready_at = time.perf_counter()
+        ready_after = ready_at - PROCESS_STARTED
+        samples = []
+        last_events, last_time = events_at_ready, ready_at
+        while time.perf_counter() - ready_at < seconds:
+            await asyncio.sleep(min(10.0, max(seconds - (time.perf_counter() - ready_at), 0.1)))
+            now, events = time.perf_counter(), sum(gateway_events.values())
+            rate = (events - last_events) / (now - last_time)
+            rss = resident_memory_mb()
+            samples.append((rate, rss))
+            last_events, last_time = events, now
+            members = sum(len(guild.members) for guild in bot.guilds)
+            print(f"📡 {rate:.1f} gateway events/s, resident memory {f'{rss:.1f} MB' if rss is not None else 'unknown'}, "
+                  f"{members} cached members, {len(bot.cached_messages)} cached messages")
+        elapsed = time.perf_counter() - ready_at
+        run = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "profile": GATEWAY_PROFILE,
+            "guilds": len(bot.guilds),
+            "seconds": round(elapsed, 1),
+            "startup_seconds": round(ready_after, 2),
+            "events_before_ready": events_at_ready,
+            "events_per_second": round((sum(gateway_events.values()) - events_at_ready) / elapsed, 2),
+            "resident_memory_mb": round(max(rss for _, rss in samples), 1) if samples and samples[0][1] is not None else None,
+            "cached_members": sum(len(guild.members) for guild in bot.guilds),
+            "top_events": dict(sorted(gateway_events.items(), key=lambda item: -item[1])[:8]),
+        }
+        print(f"📡 {GATEWAY_PROFILE} profile: {run['events_per_second']} events/s after ready, "
+              f"{run['events_before_ready']} before, peak resident memory {run['resident_memory_mb']} MB")
+        with open(results_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(run) + "\n")
+        print(f"📝 Results added to {results_path}")
+        await bot.close()
+
+    task = asyncio.create_task(measure())
+    try:
+        await bot.start(TOKEN)
+    finally:
+        task.cancel()
+        if not bot.is_closed():
+            await bot.close()
+
+# Stand-in for discord.VoiceClient used by the playback benchmark. It pulls frames from its source on a
+# real 20ms clock the way discord.py's audio player does, and logs when each one went out and what was in it
+class FakeVoiceClient:
+    def __init__(self):
+        self.runner = None  # (thread, stop event) of the source being played
+        self.resumed = threading.Event()
+        self.resumed.set()
+        self.frames = []  # (time sent, left sample, right sample) from the middle of each frame
+        self.deadline_misses = 0
+        self.decoder = None
+
+    def play(self, source, after=None):
+        self.stop()
+        stop = threading.Event()
+        thread = threading.Thread(target=self.run, args=(source, after, stop), daemon=True)
+        self.runner = (thread, stop)
+        self.resumed.set()
+        thread.start()
+
+    def run(self, source, after, stop):
+        error = None
+        start = time.perf_counter()
+        sent = 0
+        try:
+            while not stop.is_set():
+                if not self.resumed.is_set():
+                    self.resumed.wait()
+                    start, sent = time.perf_counter(), 0  # the clock restarts on resume, as in discord.py
+                    continue
+                data = source.read()
+                if not data:
+                    break
+                now = time.perf_counter()
+                if now - (start + 0.02 * sent) > 0.02:
+                    self.deadline_misses += 1  # handed over more than a whole frame after it was due
+                self.frames.append((now, *self.sample(data, source.is_opus())))
+                sent += 1
+                time.sleep(max(0.0, start + 0.02 * sent - time.perf_counter()))
+        except Exception as e:
+            error = e
+        if self.runner and self.runner[0] is threading.current_thread():
+            self.runner = None
+        if after:
+            after(error)
+        source.cleanup()  # as discord.py's AudioPlayer does once it stops
+
+    # Left and right sample from the middle of a frame, decoding Opus packets first
+    def sample(self, data, opus):
+        if opus:
+            if data == OPUS_SILENCE:
+                return 0, 0
+            if self.decoder is None:
+                self.decoder = discord.opus.Decoder()
+            data = self.decoder.decode(data)
+        samples = np.frombuffer(data, dtype=np.int16)
+        middle = len(samples) // 4 * 2
+        return (int(samples[middle]), int(samples[middle + 1])) if len(samples) >= 2 else (0, 0)
+
+    def is_playing(self):
+        return self.runner is not None and self.resumed.is_set()
+
+    def is_paused(self):
+        return self.runner is not None and not self.resumed.is_set()
+
+    def pause(self):
+        self.resumed.clear()
+
+    def resume(self):
+        self.resumed.set()
+
+    def stop(self):
+        runner, self.runner = self.runner, None
+        if runner:
+            runner[1].set()
+            self.resumed.set()
+            if runner[0] is not threading.current_thread():
+                runner[0].join(timeout=1)
+
+    async def disconnect(self, force=False):
+        self.stop()
+
+    # Waits for the first frame logged after index mark, and sent at or after since, that passes test
+    async def wait_for_frame(self, mark, since, test, timeout=5.0):
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            while mark < len(self.frames):
+                frame = self.frames[mark]
+                mark += 1
+                if frame[0] >= since and test(frame):
+                    return frame
+            await asyncio.sleep(0.002)
+        return None
+
+# Writes a 48kHz 16-bit stereo WAV for the benchmark. The right channel holds a constant level that
+# identifies the file, and the left channel counts 20ms frames (1000 + 256 * frame number, wrapping
+# every 100 frames) so the audio that comes out after a pause shows where playback picked up
+def write_bench_tone(file_path, seconds, level):
+    frames = int(seconds * 50)
+    samples = np.empty((frames, FRAME_SIZE // 4, CHANNELS), dtype="<i2")
+    samples[:, :, 0] = (1000 + 256 * (np.arange(frames) % 100))[:, None]
+    samples[:, :, 1] = level
+    data = samples.tobytes()
+    fmt = struct.pack("<HHIIHH", 1, CHANNELS, SAMPLE_RATE, SAMPLE_RATE * 4, 4, 16)
+    with open(file_path, "wb") as f:
+        f.write(b"RIFF" + struct.pack("<I", 36 + len(data)) + b"WAVE" + b"fmt " + struct.pack("<I", 16) + fmt)
+        f.write(b"data" + struct.pack("<I", len(data)) + data)
+
+# Frame counter written by write_bench_tone, read back from a frame's left sample
+def bench_frame_number(frame):
+    return round((frame[1] - 1000) / 256) % 100
+
+# Plays through the benchmark on one player: start, quick sounds, volume changes, pause and resume,
+# skip, and one track running into the next. Timings in ms are added to results by name
+async def bench_player(player, files, results):
+    vc = player.vc
+    music, first_short, second_short, sound = files
+    near = lambda level: lambda frame: abs(frame[2] - level) < 500
+
+    def record(name, since, frame):
+        if frame is None:
+            print(f"⚠️ Benchmark: no audio for '{name}' within the timeout")
+            results.setdefault("timeouts", []).append(1)
+        else:
+            results.setdefault(name, []).append((frame[0] - since) * 1000)
+
+    mark, since = len(vc.frames), time.perf_counter()
+    player.add_many_to_queue([music, first_short, second_short])
+    record("start", since, await vc.wait_for_frame(mark, since, near(8000)))
+    await asyncio.sleep(1.0)
+
+    for _ in range(BENCH_REPEATS):
+        mark, since = len(vc.frames), time.perf_counter()
+        await player.play_quick_sound(sound, since)
+        record("quick_sound", since, await vc.wait_for_frame(mark, since, lambda frame: frame[2] > 16000))
+        await asyncio.sleep(0.8)
+
+    for _ in range(BENCH_REPEATS):
+        mark, since = len(vc.frames), time.perf_counter()
+        player.set_music_volume(0.5)
+        record("volume", since, await vc.wait_for_frame(mark, since, lambda frame: 0 < frame[2] < 7600))
+        player.set_music_volume(1.0)
+        await asyncio.sleep(0.3)
+
+    for _ in range(BENCH_REPEATS):
+        await player.pause_music()
+        await asyncio.sleep(0.1)  # lets a frame already being read reach the log
+        paused_at = bench_frame_number(vc.frames[-1])
+        await asyncio.sleep(0.2)
+        mark, since = len(vc.frames), time.perf_counter()
+        await player.resume_music()
+        frame = await vc.wait_for_frame(mark, since, near(8000))
+        record("resume", since, frame)
+        if frame is not None:
+            # Frames skipped (or repeated, if negative) across the pause
+            skipped = (bench_frame_number(frame) - paused_at - 1 + 50) % 100 - 50
+            results.setdefault("resume_drift", []).append(skipped * 20)
+        await asyncio.sleep(0.3)
+
+    mark, since = len(vc.frames), time.perf_counter()
+    await player.skip_to_next()
+    record("skip", since, await vc.wait_for_frame(mark, since, near(5000)))
+    # The first short track plays out and the second one has to follow without a gap
+    mark = len(vc.frames)
+    frame = await vc.wait_for_frame(mark, 0, near(3000), timeout=10.0)
+    if frame is not None:
+        last = max(sent for sent, _, right in vc.frames[mark:] if abs(right - 5000) < 500 and sent < frame[0])
+        results.setdefault("track_gap", []).append((frame[0] - last - 0.02) * 1000)
+    await player.stop_music()
+
+# Drives real players against fake voice clients and reports click-to-audio latency, inter-track gap,
+# resume drift, CPU per stream and frame deadline misses. The run is appended to results_path
+async def benchmark_playback(streams=1, results_path=BENCH_RESULTS_FILE):
+    global LOUDNESS_NORMALIZATION
+    LOUDNESS_NORMALIZATION = False  # the test tones have to reach the voice client unchanged
+    bot.loop = asyncio.get_running_loop()
+    folder = tempfile.mkdtemp(prefix="bench_")
+    files = [os.path.join(folder, name) for name in ("music.wav", "first_short.wav", "second_short.wav", "sound.wav")]
+    for file_path, seconds, level in zip(files, (30, 2, 2, 0.5), (8000, 5000, 3000, 24000)):
+        write_bench_tone(file_path, seconds, level)
+    quick_sound_bank.load(files[3])
+    bench_players = []
+    for i in range(streams):
+        player = get_player(-1 - i)  # ids no real server has
+        player.vc = FakeVoiceClient()
+        player.state = STATE_IDLE
+        bench_players.append(player)
+    print(f"⏱️ Benchmarking playback on {streams} stream(s)...")
+    results = {}
+    cpu_started, started = cpu_seconds(), time.perf_counter()
+    try:
+        await asyncio.gather(*(bench_player(player, files, results) for player in bench_players))
+    finally:
+        wall = time.perf_counter() - started
+        cpu = cpu_seconds() - cpu_started
+        for player in bench_players:
+            player.vc.stop()
+            players.pop(player.guild_id, None)
+        shutil.rmtree(folder, ignore_errors=True)
+    run = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "streams": streams,
+        "audio_workers": AUDIO_WORKERS,
+        "python": sys.version.split()[0],
+        "timings_ms": {
+            name: {
+                "median": round(float(np.median(values)), 2),
+                "p95": round(float(np.percentile(values, 95)), 2),
+                "max": round(float(np.max(values)), 2),
+                "count": len(values),
+            }
+            for name, values in sorted(results.items()) if name != "timeouts"
+        },
+        "timeouts": len(results.get("timeouts", [])),
+        "cpu_ms_per_stream_second": round(cpu * 1000 / (wall * streams), 2),
+        "frames": sum(len(player.vc.frames) for player in bench_players),
+        "deadline_misses": sum(player.vc.deadline_misses for player in bench_players),
+    }
+    record_benchmark(run, results_path)
+    return run
+
+# Prints a benchmark run next to the last recorded run with the same settings, then appends it to the file
+def record_benchmark(run, results_path):
+    previous = None
+    if os.path.exists(results_path):
+        with open(results_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if (entry.get("streams"), entry.get("audio_workers")) == (run["streams"], run["audio_workers"]):
+                    previous = entry
+    before = lambda key, name=None: (previous.get(key) if name is None else previous.get(key, {}).get(name, {}).get("median")) if previous else None
+    for name, stats in run["timings_ms"].items():
+        was = f" (last run {before('timings_ms', name)})" if before("timings_ms", name) is not None else ""
+        print(f"⏱️ {name}: median {stats['median']} ms, p95 {stats['p95']} ms, max {stats['max']} ms{was}")
+    for key in ("cpu_ms_per_stream_second", "deadline_misses", "timeouts"):
+        was = f" (last run {before(key)})" if before(key) is not None else ""
+        print(f"⏱️ {key}: {run[key]}{was}")
+    with open(results_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(run) + "\n")
+    print(f"📝 Results added to {results_path}")
+
+# Small HTTP control API for running without the window. It listens on localhost (or a Unix
+# socket) on the bot's own loop and offers what the window's buttons do, answering in JSON
+class ControlServer:
+    def __init__(self, host=CONTROL_HOST, port=CONTROL_PORT, socket_path=CONTROL_SOCKET):
+        self.host = host
+        self.port = port
+        self.socket_path = socket_path
+        self.server = None
+        self.routes = {
+            ("GET", "/guilds"): self.guilds,
+            ("GET", "/status"): self.status,
+            ("GET", "/queue"): self.queue,
+            ("GET", "/search"): self.search,
+            ("POST", "/connect"): lambda player, request: player.connect(int(request["channel"]) if "channel" in request else None),
+            ("POST", "/disconnect"): lambda player, request: player.disconnect(),
+            ("POST", "/pause"): lambda player, request: player.pause_music(),
+            ("POST", "/resume"): lambda player, request: player.resume_music(),
+            ("POST", "/stop"): lambda player, request: player.stop_music(),
+            ("POST", "/skip"): lambda player, request: player.skip_to_next(),
+            ("POST", "/seek"): lambda player, request: player.seek_music(float(request["position"])),
+            ("POST", "/volume"): self.volume,
+            ("POST", "/crossfade"): self.crossfade,
+            ("POST", "/enqueue"): self.enqueue,
+            ("POST", "/remove"): lambda player, request: player.send("remove", int(request["index"])),
+            ("POST", "/move"): lambda player, request: player.send("move", int(request["from"]), int(request["to"])),
+            ("POST", "/quick_sound"): self.quick_sound,
+            ("POST", "/preencode"): self.preencode,
+        }
+
+    async def start(self):
+        if self.socket_path:
+            self.server = await asyncio.start_unix_server(self.handle, path=self.socket_path)
+            print(f"🛰️ Control API listening on {self.socket_path}")
         else:
-            print("Quick sound finished, not advancing queue.")
-
-    # Updates the music volume based on the slider
-    def update_music_volume(self):
-        global music_volume
-        music_volume = self.music_volume_slider.value() / 100
-        asyncio.run_coroutine_threadsafe(self.set_music_volume(music_volume), bot.loop)
-
-    # Updates the quick sound volume based on the slider
-    def update_quick_sound_volume(self):
-        global quick_sound_volume
-        quick_sound_volume = self.quick_sound_volume_slider.value() / 100
-
-    # Sets the volume of the currently playing music
-    async def set_music_volume(self, new_volume):
-        async with vc_lock:
-            if vc and vc.source:
-                vc.source.volume = new_volume
-    # Handles the stop button 
-    def update_stop_button_state(self):
-        is_enabled = vc and (vc.is_playing() or not file_queue.empty())
-        self.stop_button_signal.emit(is_enabled)
-    # Handles closing the application window
-    def closeEvent(self, event):
-        event.accept()
+            self.server = await asyncio.start_server(self.handle, self.host, self.port)
+            print(f"🛰️ Control API listening on http://{self.host}:{self.port}")
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+            if self.socket_path and os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+    # Reads one request, runs it and closes the connection
+    async def handle(self, reader, writer):
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1").strip()
+                if not line:
+                    break
+                key, _, value = line.partition(":")
+                headers[key.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+            if len(request_line) < 2:
+                status, result = 400, {"error": "bad request"}
+            # A web page can only send a JSON content type after a CORS preflight, which this server never
+            # answers, so requiring it keeps any site open in a browser from driving the bot
+            elif request_line[0].upper() == "POST" and headers.get("content-type", "").partition(";")[0].strip().lower() != "application/json":
+                status, result = 415, {"error": "POST requests need Content-Type: application/json"}
+            else:
+                status, result = await self.dispatch(request_line[0].upper(), request_line[1], body)
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError) as e:
+            status, result = 400, {"error": str(e)}
+        payload = json.dumps(result).encode()
+        reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 415: "Unsupported Media Type", 500: "Internal Server Error"}.get(status, "")
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\nContent-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode()
+            + payload
+        )
+        try:
+            await writer.drain()
+            writer.close()
+        except ConnectionError:
+            pass
+
+    # Runs a route; query string and JSON body are merged into one request dict
+    async def dispatch(self, method, target, body):
+        path, _, query = target.partition("?")
+        handler = self.routes.get((method, path))
+        if handler is None:
+            return 404, {"error": f"no route for {method} {path}"}
+        request = dict(urllib.parse.parse_qsl(query))
+        if body:
+            fields = json.loads(body)
+            if not isinstance(fields, dict):
+                return 400, {"error": "request body must be a JSON object"}
+            request.update(fields)
+        player = None
+        if path not in ("/guilds", "/search", "/preencode"):
+            guild_id = request.get("guild") or (bot.guilds[0].id if len(bot.guilds) == 1 else None)
+            if guild_id is None:
+                return 400, {"error": "pass guild=<id> (see /guilds)"}
+            player = get_player(int(guild_id))
+        try:
+            result = await handler(player, request)
+        except (KeyError, ValueError, TypeError) as e:
+            return 400, {"error": f"bad argument: {e}"}
+        except Exception as e:
+            print(f"❌ ERROR: Control request {method} {path} failed: {e}")
+            return 500, {"error": str(e)}
+        return 200, {"ok": True} if result is None else result
+
+    async def guilds(self, player, request):
+        return [{"id": guild.id, "name": guild.name} for guild in bot.guilds]
+
+    async def status(self, player, request):
+        return {
+            "state": player.state,
+            "current_file": player.current_file,
+            "position": player.music_position(),
+            "duration": player.music_duration(),
+            "queued": len(player.playlist),
+            "music_volume": player.music_volume,
+            "quick_sound_volume": player.quick_sound_volume,
+            "crossfade_seconds": player.crossfade_seconds,
+            "startup_seconds": startup_seconds,
+            "resident_memory_mb": resident_memory_mb(),
+        }
+
+    async def queue(self, player, request):
+        start = int(request.get("start", 0))
+        count = int(request.get("count", 100))
+        end = min(start + count, len(player.playlist))
+        return {"version": player.playlist.version, "total": len(player.playlist),
+                "items": [player.playlist[i] for i in range(start, end)]}
+
+    async def search(self, player, request):
+        rows = library.search(request["q"], kind=request.get("kind"), limit=int(request.get("limit", 50)))
+        return [{"path": row[0], "kind": row[1], "title": row[2], "artist": row[3], "duration": row[4]} for row in rows]
+
+    async def volume(self, player, request):
+        if "quick_sound" in request:
+            player.quick_sound_volume = float(request["quick_sound"])
+        if "music" in request:
+            player.set_music_volume(float(request["music"]))
+
+    async def crossfade(self, player, request):
+        player.set_crossfade(float(request["seconds"]))
+
+    # Queues files, folders or playlists; metadata is probed in the background like a GUI import
+    async def enqueue(self, player, request):
+        paths = request["paths"] if "paths" in request else [request["path"]]
+        return {"queued": await queue_paths(player, paths)}
+
+    # Plays a quick sound by button number or by path
+    async def quick_sound(self, player, request):
+        click_time = time.perf_counter()
+        sound_file = request.get("path") or load_quick_play_files().get(f"Quick Sound {int(request['slot'])}")
+        if not sound_file:
+            raise ValueError("no sound assigned to that button")
+        await player.play_quick_sound(sound_file, click_time)
+
+    async def preencode(self, player, request):
+        threading.Thread(target=preencode_folder, args=(request["folder"],), daemon=True).start()
+
+# Runs the bot and the control API without any window
+async def run_headless():
+    control = ControlServer()
+
+    @bot.event
+    async def on_ready():
+        log_ready()
+        report_startup("Headless")
+
+    quick_sound_bank.preload(list(load_quick_play_files().values()))
+    loudness_analyzer.schedule(list(load_quick_play_files().values()))
+    await control.start()
+    metrics_server = await start_metrics_server()
+    try:
+        await bot.start(TOKEN)
+    finally:
+        await control.stop()
+        if metrics_server:
+            metrics_server.close()
+        if not bot.is_closed():
+            await bot.close()
+
+# The window and its Qt imports are skipped entirely when running headless
+if not HEADLESS:
+    from PyQt6.QtWidgets import (
+        QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
+        QPushButton, QListView, QListWidget, QListWidgetItem, QFileDialog, QMessageBox,
+        QSlider, QLabel, QComboBox, QLineEdit
+    )
+    from PyQt6.QtCore import QThread, QTimer, pyqtSignal, Qt, QAbstractListModel, QModelIndex
+    from PyQt6.QtGui import QColor
+
+    # Bot thread to run the Discord bot
+    class BotThread(QThread):
+        update_signal = pyqtSignal()
+        ready_signal = pyqtSignal(bool)
+
+        def run(self):
+            asyncio.run(self.start_bot())
+
+        async def start_bot(self):
+            @bot.event
+            async def on_ready():
+                log_ready()
+                report_startup("GUI")
+                self.ready_signal.emit(True)
+
+            await start_metrics_server()
+            await bot.start(TOKEN)
+
+    # Queue panel model: a GUI-side copy of a player's playlist kept in step by applying the
+    # playlist's change records, so the view only repaints the rows that moved
+    class PlaylistModel(QAbstractListModel):
+        def __init__(self):
+            super().__init__()
+            self.items = []
+            self.version = None  # playlist version the copy matches, None until the first snapshot
+            self.playing = False
+
+        def rowCount(self, parent=QModelIndex()):
+            return 0 if parent.isValid() else len(self.items)
+
+        def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+            row = index.row()
+            if not index.isValid() or row >= len(self.items):
+                return None
+            if role == Qt.ItemDataRole.DisplayRole:
+                return f"{row+1}: {describe_track(self.items[row])}"
+            if role == Qt.ItemDataRole.ForegroundRole:
+                if row == 0 and self.playing:
+                    return QColor("green")
+                if row == 1:
+                    return QColor("orange")
+            return None
+
+        # Applies a (version, operation, arguments...) record from the playlist
+        def apply(self, change):
+            version, operation, *args = change
+            if operation == "reset":
+                self.beginResetModel()
+                self.items = list(args[0])
+                self.version = version
+                self.endResetModel()
+                return
+            if self.version is None or version <= self.version:
+                return  # already part of the snapshot, or waiting for one
+            self.version = version
+            if operation == "insert":
+                index, items = args
+                self.beginInsertRows(QModelIndex(), index, index + len(items) - 1)
+                self.items[index:index] = items
+                self.endInsertRows()
+                self.renumber(index + len(items))
+            elif operation == "remove":
+                index, count = args
+                self.beginRemoveRows(QModelIndex(), index, index + count - 1)
+                del self.items[index:index + count]
+                self.endRemoveRows()
+                self.renumber(index)
+            elif operation == "move":
+                source, target = args
+                # Qt wants the row the item goes in front of, counted before the move
+                self.beginMoveRows(QModelIndex(), source, source, QModelIndex(), target + 1 if target > source else target)
+                self.items.insert(target, self.items.pop(source))
+                self.endMoveRows()
+                self.renumber(min(source, target))
+            elif operation == "clear":
+                self.beginResetModel()
+                self.items = []
+                self.endResetModel()
+
+        # Row numbers and colours below a change are now off by the change
+        def renumber(self, first_row):
+            if first_row < len(self.items):
+                self.dataChanged.emit(self.index(first_row), self.index(len(self.items) - 1))
+
+        # Repaints rows whose tracks just got their metadata
+        def metadata_updated(self, file_paths):
+            if self.items:
+                self.dataChanged.emit(self.index(0), self.index(len(self.items) - 1), [Qt.ItemDataRole.DisplayRole])
+
+        # Empties the copy and ignores changes until the next snapshot arrives
+        def detach(self):
+            self.beginResetModel()
+            self.items = []
+            self.version = None
+            self.endResetModel()
+
+        # Switches the highlight of the track at the head of the queue
+        def set_playing(self, playing):
+            if playing != self.playing:
+                self.playing = playing
+                if self.items:
+                    self.dataChanged.emit(self.index(0), self.index(0))
+
+    # Main GUI window class for the Discord music player
+    class MainWindow(QMainWindow):
+        stop_button_signal = pyqtSignal(bool)
+        # Carry player and queue updates from the bot thread to the GUI thread
+        player_signal = pyqtSignal(object)
+        queue_signal = pyqtSignal(object, object)
+        connection_signal = pyqtSignal(bool)
+        metadata_signal = pyqtSignal(object)
+
+        def __init__(self, bot_thread):
+            super().__init__()
+            self.setWindowTitle("Discord Music Player")
+            self.setGeometry(100, 100, 600, 400)
+            self.player = None
+            self.watched_guilds = set()
+
+            self.central_widget = QWidget()
+            self.setCentralWidget(self.central_widget)
+            layout = QVBoxLayout(self.central_widget)
+
+            # Connection Controls
+            connection_layout = QHBoxLayout()
+            self.guild_selector = QComboBox()
+            self.guild_selector.currentIndexChanged.connect(self.select_guild)
+            connection_layout.addWidget(self.guild_selector)
+            self.channel_selector = QComboBox()
+            connection_layout.addWidget(self.channel_selector)
+
+            self.connect_button = QPushButton("Connect")
+            self.connect_button.clicked.connect(self.connect_to_voice)
+            self.connect_button.setEnabled(False)
+            connection_layout.addWidget(self.connect_button)
+
+            self.disconnect_button = QPushButton("Disconnect")
+            self.disconnect_button.clicked.connect(self.disconnect_from_voice)
+            self.disconnect_button.setEnabled(False)
+            connection_layout.addWidget(self.disconnect_button)
+            layout.addLayout(connection_layout)
+
+            # Playback Controls
+            playback_layout = QHBoxLayout()
+            self.pause_button = QPushButton("Pause")
+            self.pause_button.clicked.connect(lambda: self.run_on_player(lambda player: player.pause_music()))
+            playback_layout.addWidget(self.pause_button)
+
+            self.play_button = QPushButton("Play")
+            self.play_button.clicked.connect(lambda: self.run_on_player(lambda player: player.resume_music()))
+            playback_layout.addWidget(self.play_button)
+
+            self.stop_button = QPushButton("Stop")
+            self.stop_button.clicked.connect(lambda: self.run_on_player(lambda player: player.stop_music()))
+            self.stop_button.setEnabled(False)
+            playback_layout.addWidget(self.stop_button)
+
+            self.skip_button = QPushButton("Skip")
+            self.skip_button.clicked.connect(lambda: self.run_on_player(lambda player: player.skip_to_next()))
+            playback_layout.addWidget(self.skip_button)
+
+            layout.addLayout(playback_layout)
+            # Scrub Bar: follows the track position and seeks when the handle is let go
+            scrub_layout = QHBoxLayout()
+            self.position_slider = QSlider(Qt.Orientation.Horizontal)
+            self.position_slider.setEnabled(False)
+            self.position_slider.sliderMoved.connect(self.show_scrub_position)
+            self.position_slider.sliderReleased.connect(self.seek_to_slider)
+            scrub_layout.addWidget(self.position_slider)
+            self.position_label = QLabel("0:00 / 0:00")
+            scrub_layout.addWidget(self.position_label)
+            layout.addLayout(scrub_layout)
+            self.position_timer = QTimer(self)
+            self.position_timer.timeout.connect(self.update_position)
+            self.position_timer.start(500)
+
+            # Volume Controls
+            volume_layout = QHBoxLayout()
+            self.music_volume_slider = QSlider()
+            self.music_volume_slider.setMinimum(0)
+            self.music_volume_slider.setMaximum(100)
+            self.music_volume_slider.setValue(100)
+            self.music_volume_slider.valueChanged.connect(self.update_music_volume)
+            volume_layout.addWidget(QLabel("Music Volume"))
+            volume_layout.addWidget(self.music_volume_slider)
+            layout.addLayout(volume_layout)
+
+            quick_volume_layout = QHBoxLayout()
+            self.quick_sound_volume_slider = QSlider()
+            self.quick_sound_volume_slider.setMinimum(0)
+            self.quick_sound_volume_slider.setMaximum(100)
+            self.quick_sound_volume_slider.setValue(100)
+            self.quick_sound_volume_slider.valueChanged.connect(self.update_quick_sound_volume)
+            quick_volume_layout.addWidget(QLabel("Quick Sound Volume"))
+            quick_volume_layout.addWidget(self.quick_sound_volume_slider)
+            layout.addLayout(quick_volume_layout)
+
+            # Crossfade between queued tracks, in whole seconds
+            crossfade_layout = QHBoxLayout()
+            self.crossfade_slider = QSlider(Qt.Orientation.Horizontal)
+            self.crossfade_slider.setMinimum(0)
+            self.crossfade_slider.setMaximum(int(MAX_CROSSFADE_SECONDS))
+            self.crossfade_slider.setValue(int(CROSSFADE_SECONDS))
+            self.crossfade_slider.valueChanged.connect(self.update_crossfade)
+            crossfade_layout.addWidget(QLabel("Crossfade"))
+            crossfade_layout.addWidget(self.crossfade_slider)
+            self.crossfade_label = QLabel(f"{int(CROSSFADE_SECONDS)} s")
+            crossfade_layout.addWidget(self.crossfade_label)
+            layout.addLayout(crossfade_layout)
+
+            # File Picker
+            self.pick_file_button = QPushButton("Pick File")
+            self.pick_file_button.clicked.connect(self.pick_file)
+            layout.addWidget(self.pick_file_button)
+
+            import_layout = QHBoxLayout()
+            self.import_folder_button = QPushButton("Import Folder")
+            self.import_folder_button.clicked.connect(self.pick_import_folder)
+            import_layout.addWidget(self.import_folder_button)
+
+            self.import_playlist_button = QPushButton("Import Playlist")
+            self.import_playlist_button.clicked.connect(self.pick_import_playlist)
+            import_layout.addWidget(self.import_playlist_button)
+            layout.addLayout(import_layout)
+
+            self.preencode_button = QPushButton("Pre-encode Folder")
+            self.preencode_button.clicked.connect(self.pick_preencode_folder)
+            layout.addWidget(self.preencode_button)
+
+            # Library Search
+            self.search_box = QLineEdit()
+            self.search_box.setPlaceholderText("Search library...")
+            self.search_box.textChanged.connect(self.search_library)
+            layout.addWidget(self.search_box)
+            self.search_results = QListWidget()
+            self.search_results.setMaximumHeight(120)
+            self.search_results.itemDoubleClicked.connect(self.queue_search_result)
+            layout.addWidget(self.search_results)
+
+            # Queue Display
+            self.queue_model = PlaylistModel()
+            self.queue_list = QListView()
+            self.queue_list.setModel(self.queue_model)
+            self.queue_list.setUniformItemSizes(True)  # lets the view lay out only the rows on screen
+            layout.addWidget(self.queue_list)
+
+            # Queue Editing: Play Next takes the selected search result, the rest act on the selected queue row
+            queue_edit_layout = QHBoxLayout()
+            self.play_next_button = QPushButton("Play Next")
+            self.play_next_button.clicked.connect(self.play_search_result_next)
+            queue_edit_layout.addWidget(self.play_next_button)
+            self.move_up_button = QPushButton("Move Up")
+            self.move_up_button.clicked.connect(lambda: self.move_selected(-1))
+            queue_edit_layout.addWidget(self.move_up_button)
+            self.move_down_button = QPushButton("Move Down")
+            self.move_down_button.clicked.connect(lambda: self.move_selected(1))
+            queue_edit_layout.addWidget(self.move_down_button)
+            self.remove_button = QPushButton("Remove")
+            self.remove_button.clicked.connect(self.remove_selected)
+            queue_edit_layout.addWidget(self.remove_button)
+            layout.addLayout(queue_edit_layout)
+
+            # Quick Sound Buttons
+            quick_sound_layout = QVBoxLayout()
+            self.quick_buttons = {}
+            for i in range(1, 13):
+                button = QPushButton(f"Quick Sound {i}")
+                button.clicked.connect(lambda _, i=i: self.play_quick_sound(i))
+                quick_sound_layout.addWidget(button)
+                self.quick_buttons[i] = button
+            layout.addLayout(quick_sound_layout)
+
+            # Live Stats: a few of the pipeline metrics, refreshed every second
+            self.stats_label = QLabel()
+            self.stats_label.setStyleSheet("font-family: monospace")
+            layout.addWidget(self.stats_label)
+            self.stats_timer = QTimer(self)
+            self.stats_timer.timeout.connect(self.update_stats)
+            self.stats_timer.start(1000)
+            self.update_stats()
+
+            # Connect signals
+            bot_thread.ready_signal.connect(self.on_bot_ready)
+            self.stop_button_signal.connect(self.stop_button.setEnabled)
+            self.player_signal.connect(self.on_player_changed)
+            self.queue_signal.connect(self.on_queue_changed)
+            self.connection_signal.connect(self.set_connected)
+            self.metadata_signal.connect(self.queue_model.metadata_updated)
+
+            # Load existing quick play files and decode them into memory
+            self.quick_play_files = load_quick_play_files()
+            for i in range(1, 13):
+                if f"Quick Sound {i}" in self.quick_play_files:
+                    file_path = self.quick_play_files[f"Quick Sound {i}"]
+                    self.quick_buttons[i].setText(os.path.basename(file_path))
+            quick_sound_bank.preload(list(self.quick_play_files.values()))
+            loudness_analyzer.schedule(list(self.quick_play_files.values()))
+
+
+        # Handles bot ready event to fill the server list and enable the connection button
+        def on_bot_ready(self, ready):
+            if ready:
+                for guild in bot.guilds:
+                    self.guild_selector.addItem(guild.name, guild.id)
+                self.connect_button.setEnabled(True)
+                print("Bot is ready, connect button enabled.")
+
+        # Switches the window over to the player of the server picked in the list
+        def select_guild(self, index):
+            guild_id = self.guild_selector.itemData(index)
+            if guild_id is None:
+                return
+            self.player = player = get_player(guild_id)
+            if guild_id not in self.watched_guilds:
+                # Listeners run on the bot thread, so they only emit signals
+                self.watched_guilds.add(guild_id)
+                player.listeners.append(self.player_signal.emit)
+                player.playlist.listeners.append(lambda change: self.queue_signal.emit(player, change))
+            self.fill_channel_selector(player)
+            self.set_connected(player.vc is not None)
+            self.music_volume_slider.setValue(int(player.music_volume * 100))
+            self.quick_sound_volume_slider.setValue(int(player.quick_sound_volume * 100))
+            self.crossfade_slider.setValue(round(player.crossfade_seconds))
+            self.queue_model.detach()
+            # Take the snapshot on the bot loop so it cannot interleave with an edit
+            bot.loop.call_soon_threadsafe(self.send_queue_snapshot, player)
+            self.update_stop_button_state()
+
+        # Lists the server's voice channels, starting on the one the player would join by default
+        def fill_channel_selector(self, player):
+            self.channel_selector.clear()
+            guild = bot.get_guild(player.guild_id)
+            if guild is None:
+                return
+            for channel in guild.voice_channels:
+                self.channel_selector.addItem(channel.name, channel.id)
+                if channel.id == player.channel_id or (player.channel_id is None and channel.name == player.channel_name):
+                    self.channel_selector.setCurrentIndex(self.channel_selector.count() - 1)
+
+        # Runs a player coroutine on the bot's event loop for the selected server
+        def run_on_player(self, make_coroutine):
+            if self.player is None:
+                print("❌ ERROR: No server selected!")
+                return None
+            return asyncio.run_coroutine_threadsafe(make_coroutine(self.player), bot.loop)
+
+        # Moves the scrub bar along with the playing track, unless the user is dragging it
+        def update_position(self):
+            if self.player is None or self.position_slider.isSliderDown():
+                return
+            playing = self.player.state in (STATE_PLAYING, STATE_PAUSED)
+            position = self.player.music_position() if playing else 0
+            duration = self.player.music_duration() if playing else None
+            self.position_slider.setEnabled(duration is not None)
+            self.position_slider.setRange(0, int(duration or 0))
+            self.position_slider.setValue(int(position))
+            self.position_label.setText(f"{format_duration(position)} / {format_duration(duration or 0)}")
+
+        def show_scrub_position(self, value):
+            self.position_label.setText(f"{format_duration(value)} / {format_duration(self.position_slider.maximum())}")
+
+        def seek_to_slider(self):
+            seconds = float(self.position_slider.value())
+            self.run_on_player(lambda player: player.seek_music(seconds))
+
+        # Shows where frame time goes: reading, lock waits, late frames and FFmpeg starts
+        def update_stats(self):
+            ms = lambda seconds: f"{seconds * 1000:.2f}ms" if seconds is not None else "-"
+            self.stats_label.setText(
+                f"frame read p99 {ms(mixer_read_seconds.quantile(0.99))}  jitter p99 {ms(frame_jitter_seconds.quantile(0.99))}  "
+                f"late frames {frame_deadline_misses.value()}\n"
+                f"mixer lock wait p99 {ms(mixer_lock_wait_seconds.quantile(0.99))}  FFmpeg start p50 {ms(ffmpeg_spawn_seconds.quantile(0.5))}  "
+                f"decoders {decoders_running()}  queued {sum(len(player.playlist) for player in list(players.values()))}"
+            )
+
+        # Refreshes the window when the selected player changes
+        def on_player_changed(self, player):
+            if player is self.player:
+                self.update_stop_button_state()
+                self.queue_model.set_playing(player.is_music_loaded())
+
+        # Sends a copy of the player's queue to the GUI thread (runs on the bot loop)
+        def send_queue_snapshot(self, player):
+            version, items = player.playlist.snapshot()
+            self.queue_signal.emit(player, (version, "reset", items))
+
+        # Applies a playlist change to the queue panel if it belongs to the selected player
+        def on_queue_changed(self, player, change):
+            if player is self.player:
+                self.queue_model.apply(change)
+
+        # Enables the connect or disconnect button to match the voice connection
+        def set_connected(self, connected):
+            self.connect_button.setEnabled(not connected)
+            self.disconnect_button.setEnabled(connected)
+
+        # Initiates connection to voice channel
+        def connect_to_voice(self):
+            channel_id = self.channel_selector.currentData()
+            self.run_on_player(lambda player: self.connect_to_voice_async(player, channel_id))
+
+        # Asynchronous method to connect to voice channel
+        async def connect_to_voice_async(self, player, channel_id=None):
+            if await player.connect(channel_id):
+                self.connection_signal.emit(True)
+
+        # Disconnects from voice channel
+        def disconnect_from_voice(self):
+            if self.player and self.player.vc:
+                self.run_on_player(lambda player: player.disconnect())
+                self.set_connected(False)
+            else:
+                print("❌ ERROR: Not connected to any voice channel.")
+
+        # Opens a file dialog to select a music file and adds it to the queue
+        def pick_file(self):
+            if self.player is None:
+                print("❌ ERROR: No server selected!")
+                return
+            file_path, _ = QFileDialog.getOpenFileName(self, "Select File", "", "MP3 files (*.mp3);;All Files (*)")
+            if file_path:
+                self.player.add_to_queue(file_path)
+                library.add_files([file_path])
+
+        # Lists library tracks matching the search box as the user types
+        def search_library(self, text):
+            self.search_results.clear()
+            for file_path, kind, _, _, _ in library.search(text, limit=50):
+                item = QListWidgetItem(describe_track(file_path) + (" (sound)" if kind == "sound" else ""))
+                item.setData(Qt.ItemDataRole.UserRole, file_path)
+                item.setToolTip(file_path)
+                self.search_results.addItem(item)
+
+        # Queues the search result that was double-clicked
+        def queue_search_result(self, item):
+            if self.player is None:
+                print("❌ ERROR: No server selected!")
+                return
+            self.player.add_to_queue(item.data(Qt.ItemDataRole.UserRole))
+
+        # Puts the selected search result at the front of the queue
+        def play_search_result_next(self):
+            item = self.search_results.currentItem()
+            if self.player is None or item is None:
+                return
+            self.player.insert_into_queue(0, item.data(Qt.ItemDataRole.UserRole))
+
+        # Row of the queue panel that is selected, or None
+        def selected_queue_row(self):
+            indexes = self.queue_list.selectedIndexes()
+            return indexes[0].row() if indexes else None
+
+        # Moves the selected queue entry up or down one place; the selection follows it once the change lands
+        def move_selected(self, step):
+            row = self.selected_queue_row()
+            if self.player is None or row is None or not 0 <= row + step < self.queue_model.rowCount():
+                return
+            self.player.move_in_queue(row, row + step)
+
+        # Takes the selected entry out of the queue
+        def remove_selected(self):
+            row = self.selected_queue_row()
+            if self.player is not None and row is not None:
+                self.player.remove_from_queue(row)
+
+        # Opens a folder dialog and queues every audio file in it
+        def pick_import_folder(self):
+            if self.player is None:
+                print("❌ ERROR: No server selected!")
+                return
+            folder = QFileDialog.getExistingDirectory(self, "Select Music Folder")
+            if folder:
+                self.start_import(folder)
+
+        # Opens a file dialog and queues the tracks of an M3U or PLS playlist
+        def pick_import_playlist(self):
+            if self.player is None:
+                print("❌ ERROR: No server selected!")
+                return
+            playlist_path, _ = QFileDialog.getOpenFileName(self, "Select Playlist", "", "Playlists (*.m3u *.m3u8 *.pls);;All Files (*)")
+            if playlist_path:
+                self.start_import(playlist_path)
+
+        # Queues the tracks right away, then probes their metadata in the background
+        def start_import(self, path):
+            player = self.player
+            def run():
+                try:
+                    file_paths = collect_tracks(path)
+                except OSError as e:
+                    print(f"❌ ERROR: Could not import {path}: {e}")
+                    return
+                if not file_paths:
+                    print(f"❌ ERROR: No audio files found in {path}")
+                    return
+                player.add_many_to_queue(file_paths)
+                library.add_files(file_paths)
+                loudness_analyzer.schedule(file_paths)
+                track_metadata.probe_all(file_paths, self.metadata_signal.emit)
+            threading.Thread(target=run, daemon=True).start()
+
+        # Opens a folder dialog and pre-encodes the folder to the Opus cache in the background
+        def pick_preencode_folder(self):
+            folder = QFileDialog.getExistingDirectory(self, "Select Music Folder")
+            if folder:
+                threading.Thread(target=preencode_folder, args=(folder,), daemon=True).start()
+
+        # Assigns a sound to a quick sound button
+        def assign_sound(self, button_index):
+            button = self.quick_buttons[button_index]
+            file_path, _ = QFileDialog.getOpenFileName(self, f"Select Sound for {button.text()}", "", "MP3 files (*.mp3);;All Files (*)")
+            if file_path:
+                button.setText(os.path.basename(file_path))
+                save_quick_play_file(f"Quick Sound {button_index}", file_path)
+                self.quick_play_files[f"Quick Sound {button_index}"] = file_path
+                quick_sound_bank.preload([file_path])
+                loudness_analyzer.schedule([file_path])
+
+        # Handles playing a quick sound when a button is clicked
+        def play_quick_sound(self, button_index):
+            click_time = time.perf_counter()
+            sound_file = self.quick_play_files.get(f"Quick Sound {button_index}")
+            if sound_file:
+                print(f"🎶 Playing assigned sound: {sound_file}")
+                self.run_on_player(lambda player: player.play_quick_sound(sound_file, click_time))
+            else:
+                self.prompt_assign_sound(button_index)
+
+        # Prompts the user to assign a sound to a quick sound button
+        def prompt_assign_sound(self, button_index):
+            button = self.quick_buttons[button_index]
+            response = QMessageBox.question(
+                self,
+                "No Sound Assigned",
+                f"No sound is currently assigned to {button.text()}. Would you like to assign one now?",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+                QMessageBox.StandardButton.Yes
+            )
+            if response == QMessageBox.StandardButton.Yes:
+                self.assign_sound(button_index)
+
+        # Updates the music volume based on the slider
+        def update_music_volume(self):
+            if self.player:
+                self.player.set_music_volume(self.music_volume_slider.value() / 100)
+
+        # Updates the quick sound volume based on the slider
+        def update_quick_sound_volume(self):
+            if self.player:
+                self.player.quick_sound_volume = self.quick_sound_volume_slider.value() / 100
+
+        # Updates the crossfade length based on the slider
+        def update_crossfade(self):
+            self.crossfade_label.setText(f"{self.crossfade_slider.value()} s")
+            if self.player:
+                self.player.set_crossfade(self.crossfade_slider.value())
+
+        # Handles the stop button 
+        def update_stop_button_state(self):
+            is_enabled = self.player is not None and self.player.has_music()
+            self.stop_button_signal.emit(is_enabled)
+        # Handles closing the application window
+        def closeEvent(self, event):
+            event.accept()
+
 # Main function to start the application
 def main():
-    import sys
+    global audio_pool
+    if "--bench-decode" in sys.argv:
+        arguments = sys.argv[sys.argv.index("--bench-decode") + 1:]
+        benchmark_decoders(arguments[0], int(arguments[1]) if len(arguments) > 1 else 500)
+        return
+    if AUDIO_WORKERS:
+        try:
+            audio_pool = AudioWorkerPool(AUDIO_WORKERS if AUDIO_WORKERS > 0 else None)
+        except discord.opus.OpusNotLoaded:
+            print("❌ ERROR: Opus could not be loaded, so audio runs in this process instead of worker processes.")
+    if "--measure-gateway" in sys.argv:
+        arguments = sys.argv[sys.argv.index("--measure-gateway") + 1:]
+        asyncio.run(measure_gateway(float(arguments[0]) if arguments and not arguments[0].startswith("-") else 60.0))
+        loudness_analyzer.shutdown()
+        if audio_pool:
+            audio_pool.shutdown()
+        return
+    if "--bench-playback" in sys.argv:
+        arguments = sys.argv[sys.argv.index("--bench-playback") + 1:]
+        asyncio.run(benchmark_playback(int(arguments[0]) if arguments else 1))
+        loudness_analyzer.shutdown()
+        if audio_pool:
+            audio_pool.shutdown()
+        return
+    if not AUDIO_WORKERS:
+        get_decoder_supervisor()  # have spare decoders ready for the first track
+    if HEADLESS:
+        try:
+            asyncio.run(run_headless())
+        except KeyboardInterrupt:
+            pass
+        loudness_analyzer.shutdown()
+        if decoder_supervisor:
+            decoder_supervisor.shutdown()
+        if audio_pool:
+            audio_pool.shutdown()
+        return
     app = QApplication(sys.argv)
     bot_thread = BotThread()
     main_window = MainWindow(bot_thread)
     bot_thread.start()
     main_window.show()
-    sys.exit(app.exec())
+    exit_code = app.exec()
+    loudness_analyzer.shutdown()
+    if decoder_supervisor:
+        decoder_supervisor.shutdown()
+    if audio_pool:
+        print(f"🧵 Audio worker stats: {audio_pool.stats()}")
+        audio_pool.shutdown()
+    sys.exit(exit_code)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,22 @@
+import importlib.util
+import os
+
+import pytest
+
+BOT_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "DiscodMusicBox_1.1.py")
+
+
+# The bot is a single script, so it is loaded by path. It opens its library and caches in the
+# working directory when imported, so that happens in a scratch folder
+@pytest.fixture(scope="session")
+def bot(tmp_path_factory):
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("bot"))
+    try:
+        spec = importlib.util.spec_from_file_location("discod_music_box", BOT_FILE)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        yield module
+    finally:
+        os.chdir(cwd)
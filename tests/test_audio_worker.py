@@ -0,0 +1,147 @@
+import queue
+import threading
+import time
+
+import discord
+import numpy as np
+import pytest
+
+
+# Opus stand-in: packets carry the first bytes of the PCM, and the encoder can be made to fail
+class FakeEncoder:
+    SAMPLES_PER_FRAME = 960
+    fail_on_create = False
+    fail_on_encode = False
+
+    def __init__(self):
+        if FakeEncoder.fail_on_create:
+            raise discord.opus.OpusNotLoaded()
+
+    def encode(self, pcm, frame_size):
+        if FakeEncoder.fail_on_encode:
+            raise RuntimeError("encoder broke")
+        return bytes(pcm[:8])
+
+
+@pytest.fixture
+def fake_opus(monkeypatch):
+    monkeypatch.setattr(discord.opus, "Encoder", FakeEncoder)
+    monkeypatch.setattr(FakeEncoder, "fail_on_create", False)
+    monkeypatch.setattr(FakeEncoder, "fail_on_encode", False)
+
+
+# Runs the worker loop on a thread, fed through plain queues
+@pytest.fixture
+def worker_loop(bot, fake_opus):
+    commands, events = queue.Queue(), queue.Queue()
+    thread = threading.Thread(target=bot.audio_worker_main, args=(commands, events), daemon=True)
+    thread.start()
+    rings = []
+
+    def open_stream(stream_id):
+        rings.append(bot.OpusRing())
+        commands.put(("open_stream", stream_id, rings[-1].name, 0))
+        return rings[-1]
+    yield commands, events, open_stream, thread
+    commands.put(("stop",))
+    thread.join(5)
+    for ring in rings:
+        ring.close(unlink=True)
+
+
+def next_event(events, kinds, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            event = events.get(timeout=0.1)
+        except queue.Empty:
+            continue
+        if event[0] in kinds:
+            return event
+    return None
+
+
+def test_worker_survives_failed_commands(bot, worker_loop, tmp_path):
+    commands, events, open_stream, thread = worker_loop
+    commands.put(("close_stream", 99))
+    FakeEncoder.fail_on_create = True
+    open_stream(1)
+    assert next_event(events, ["stream_ended"]) == ("stream_ended", 1)
+    FakeEncoder.fail_on_create = False
+    ring = open_stream(2)
+    # A cache file that has gone missing plays as an empty track, which ends straight away
+    commands.put(("open_track", 10, str(tmp_path / "a.wav"), 1.0, str(tmp_path / "gone.pcm"), 1.0, 0.0, None, 10))
+    commands.put(("set_music", 2, 10))
+    assert next_event(events, ["music_ended", "stream_ended"]) == ("music_ended", 2, 10)
+    # So does a track the worker never heard of
+    commands.put(("set_music", 2, 11))
+    assert next_event(events, ["music_ended", "stream_ended"]) == ("music_ended", 2, 11)
+    assert thread.is_alive()
+
+
+def test_failed_stream_is_ended_and_others_keep_playing(bot, worker_loop, tmp_path):
+    commands, events, open_stream, thread = worker_loop
+    sound = str(tmp_path / "a.wav")
+    bot.write_bench_tone(sound, 2, 5000)
+    ring = open_stream(1)
+    commands.put(("open_effect", 20, sound, 1.0, None, 1.0))
+    commands.put(("add_effect", 1, 20))
+    deadline = time.monotonic() + 5
+    while ring.get() is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    FakeEncoder.fail_on_encode = True
+    while ring.get() is not None:
+        pass
+    assert next_event(events, ["stream_ended"]) == ("stream_ended", 1)
+    FakeEncoder.fail_on_encode = False
+    other = open_stream(2)
+    commands.put(("open_effect", 21, sound, 1.0, None, 1.0))
+    commands.put(("add_effect", 2, 21))
+    deadline = time.monotonic() + 5
+    while other.get() is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert thread.is_alive() and time.monotonic() < deadline
+
+
+def test_dead_worker_is_restarted_and_its_mixers_finish(bot, fake_opus, tmp_path):
+    pool = bot.AudioWorkerPool(1)
+    worker = pool.assign()
+    try:
+        sound = str(tmp_path / "a.wav")
+        bot.write_bench_tone(sound, 5, 5000)
+        pcm = np.frombuffer(open(sound, "rb").read()[44:], dtype=np.int16).tobytes()
+        mixer = bot.RemoteMixer(worker)
+        effect = bot.RemoteSource(worker)
+        worker.send_sound(sound, pcm)
+        worker.send("open_effect", effect.source_id, sound, 1.0, None, 1.0)
+        ended = []
+        mixer.add_effect(effect, lambda error: ended.append(error))
+        old_process = worker.process
+        old_process.kill()
+        deadline = time.monotonic() + 5
+        while not mixer.finished and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert mixer.finished and ended == [None]
+        assert worker.process is not old_process and worker.process.is_alive()
+        mixer.cleanup()
+        # The new process plays the next stream
+        mixer = bot.RemoteMixer(worker)
+        effect = bot.RemoteSource(worker)
+        worker.send_sound(sound, pcm)
+        worker.send("open_effect", effect.source_id, sound, 1.0, None, 1.0)
+        mixer.add_effect(effect)
+        deadline = time.monotonic() + 5
+        while mixer.read() == bot.OPUS_SILENCE and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert time.monotonic() < deadline
+        mixer.cleanup()
+    finally:
+        pool.shutdown()
+
+
+def test_pool_needs_opus(bot, monkeypatch):
+    def missing():
+        raise discord.opus.OpusNotLoaded()
+    monkeypatch.setattr(discord.opus, "Encoder", missing)
+    with pytest.raises(discord.opus.OpusNotLoaded):
+        bot.AudioWorkerPool(1)
@@ -0,0 +1,97 @@
+import asyncio
+import json
+
+import pytest
+
+
+@pytest.fixture
+def server(bot, monkeypatch):
+    monkeypatch.setattr(bot, "players", {})
+    return bot.ControlServer(host="127.0.0.1", port=0, socket_path=None)
+
+
+# Sends one HTTP request to the server and returns (status, decoded JSON body)
+async def request(server, method, target, body=None, headers=None):
+    port = server.server.sockets[0].getsockname()[1]
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    payload = b"" if body is None else (body if isinstance(body, bytes) else json.dumps(body).encode())
+    headers = {"Content-Type": "application/json", **(headers or {})}
+    lines = [f"{method} {target} HTTP/1.1", f"Content-Length: {len(payload)}"] + [f"{key}: {value}" for key, value in headers.items()]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + payload)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, content = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(content)
+
+
+def run(bot, server, scenario):
+    async def main():
+        bot.bot.loop = asyncio.get_running_loop()
+        await server.start()
+        try:
+            return await scenario()
+        finally:
+            await server.stop()
+    return asyncio.run(main())
+
+
+def test_crossfade_and_volume(bot, server):
+    async def scenario():
+        assert await request(server, "POST", "/crossfade?guild=5", {"seconds": 3}) == (200, {"ok": True})
+        assert await request(server, "POST", "/volume?guild=5", {"music": 0.5, "quick_sound": 0.25}) == (200, {"ok": True})
+        return await request(server, "GET", "/status?guild=5")
+
+    status, result = run(bot, server, scenario)
+    assert status == 200
+    assert (result["crossfade_seconds"], result["music_volume"], result["quick_sound_volume"]) == (3.0, 0.5, 0.25)
+    assert result["state"] == bot.STATE_DISCONNECTED
+
+
+def test_queue_editing(bot, server, tmp_path, monkeypatch):
+    monkeypatch.setattr(bot, "LOUDNESS_NORMALIZATION", False)
+    files = []
+    for name in ("a", "b", "c"):
+        files.append(str(tmp_path / f"{name}.wav"))
+        bot.write_bench_tone(files[-1], 0.1, 1000)
+
+    async def scenario():
+        assert await request(server, "POST", "/enqueue?guild=5", {"paths": files}) == (200, {"queued": 3})
+        assert (await request(server, "POST", "/move?guild=5", {"from": 0, "to": 2}))[0] == 200
+        assert (await request(server, "POST", "/remove?guild=5", {"index": 0}))[0] == 200
+        return await request(server, "GET", "/queue?guild=5&start=0&count=10")
+
+    status, result = run(bot, server, scenario)
+    assert status == 200
+    assert result["total"] == 2 and result["items"] == [files[2], files[0]]
+
+
+def test_errors(bot, server):
+    async def scenario():
+        return [
+            await request(server, "GET", "/nowhere?guild=5"),
+            await request(server, "POST", "/crossfade?guild=5", {"seconds": "long"}),
+            await request(server, "POST", "/crossfade?guild=5", [1, 2]),
+            await request(server, "POST", "/crossfade?guild=5", b"{not json"),
+            await request(server, "POST", "/seek?guild=5", {}),
+        ]
+
+    responses = run(bot, server, scenario)
+    assert [status for status, _ in responses] == [404, 400, 400, 400, 400]
+
+
+# A browser can send these without a preflight; none of them may reach the player
+def test_post_needs_json_content_type(bot, server):
+    async def scenario():
+        responses = [
+            await request(server, "POST", "/crossfade?guild=5", {"seconds": 3}, {"Content-Type": "text/plain"}),
+            await request(server, "POST", "/crossfade?guild=5", {"seconds": 3}, {"Content-Type": "application/x-www-form-urlencoded"}),
+            await request(server, "POST", "/crossfade?guild=5", {"seconds": 3}, {"Content-Type": ""}),
+        ]
+        responses.append(await request(server, "GET", "/status?guild=5", headers={"Content-Type": ""}))
+        responses.append(await request(server, "POST", "/crossfade?guild=5", {"seconds": 4}, {"Content-Type": "application/json; charset=utf-8"}))
+        return responses
+
+    responses = run(bot, server, scenario)
+    assert [status for status, _ in responses] == [415, 415, 415, 200, 200]
+    assert responses[3][1]["crossfade_seconds"] == bot.CROSSFADE_SECONDS
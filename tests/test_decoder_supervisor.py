@@ -0,0 +1,115 @@
+import gc
+import os
+import sys
+import threading
+import time
+
+import discord
+import numpy as np
+import pytest
+
+# Stands in for FFmpeg: the input is taken to be 48kHz 16-bit stereo already and is copied to the
+# output from the -ss position. Input starting with HANG never produces anything
+FAKE_FFMPEG = """#!{python}
+import sys, time
+arguments = sys.argv[1:]
+source = arguments[arguments.index("-i") + 1]
+start = float(arguments[arguments.index("-ss") + 1]) if "-ss" in arguments else 0.0
+data = sys.stdin.buffer.read() if source == "pipe:0" else open(source, "rb").read()
+if data.startswith(b"HANG"):
+    time.sleep(60)
+sys.stdout.buffer.write(data[int(start * 48000) * 4:])
+"""
+
+
+@pytest.fixture
+def fake_ffmpeg(tmp_path, monkeypatch):
+    folder = tmp_path / "bin"
+    folder.mkdir()
+    (folder / "ffmpeg").write_text(FAKE_FFMPEG.format(python=sys.executable))
+    (folder / "ffmpeg").chmod(0o755)
+    monkeypatch.setenv("PATH", str(folder) + os.pathsep + os.environ["PATH"])
+
+
+@pytest.fixture
+def supervisor(bot, fake_ffmpeg):
+    supervisors = []
+
+    def make(**options):
+        supervisors.append(bot.DecoderSupervisor(**options))
+        return supervisors[-1]
+    yield make
+    for supervisor in supervisors:
+        supervisor.shutdown()
+
+
+def wait_until(test, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not test() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return test()
+
+
+def write_pcm(path, seconds):
+    samples = np.arange(int(seconds * 48000) * 2, dtype=np.int32).astype("<i2")
+    path.write_bytes(samples.tobytes())
+    return samples
+
+
+def test_decodes_through_spares_and_by_path(bot, supervisor, tmp_path):
+    samples = write_pcm(tmp_path / "a.flac", 1)
+    write_pcm(tmp_path / "b.m4a", 1)
+    decoders = supervisor(spares=1)
+    assert wait_until(lambda: decoders.spare_count() == 2)
+    piped = decoders.open(str(tmp_path / "a.flac"))
+    assert np.array_equal(np.frombuffer(piped.read(), "<i2"), samples[:1920])
+    by_path = decoders.open(str(tmp_path / "b.m4a"), start=0.5)
+    assert np.array_equal(np.frombuffer(by_path.read(), "<i2"), samples[48000:48000 + 1920])
+    assert decoders.running() == 2
+    piped.cleanup()
+    by_path.cleanup()
+    assert decoders.running() == 0
+
+
+def test_limit_counts_spares_and_never_stops_a_decoder_in_use(bot, supervisor, tmp_path):
+    write_pcm(tmp_path / "a.m4a", 1)
+    decoders = supervisor(spares=1, limit=3)
+    assert wait_until(lambda: decoders.spare_count() == 2)
+    sources = [decoders.open(str(tmp_path / "a.m4a")) for _ in range(3)]
+    assert decoders.process_count() == 3 and decoders.spare_count() == 0
+    with pytest.raises(discord.ClientException):
+        decoders.open(str(tmp_path / "a.m4a"))
+    assert all(source.decoder.process.poll() is None for source in sources)
+    assert all(source.read() for source in sources)
+    sources.pop().cleanup()
+    sources.append(decoders.open(str(tmp_path / "a.m4a")))
+    assert decoders.process_count() == 3
+    for source in sources:
+        source.cleanup()
+
+
+def test_reaps_decoders_whose_source_was_dropped(bot, supervisor, tmp_path, monkeypatch):
+    write_pcm(tmp_path / "a.m4a", 1)
+    decoders = supervisor(spares=0)
+    monkeypatch.setattr(bot.SupervisedDecoderAudio, "__del__", lambda self: None)  # as if cleanup was never called
+    source = decoders.open(str(tmp_path / "a.m4a"))
+    process = source.decoder.process
+    del source
+    gc.collect()
+    decoders.reap()
+    assert decoders.running() == 0 and process.poll() is not None
+
+
+def test_kills_a_decoder_stuck_in_a_read(bot, supervisor, tmp_path, monkeypatch):
+    monkeypatch.setattr(bot, "DECODER_STUCK_SECONDS", 0.2)
+    (tmp_path / "hang.m4a").write_bytes(b"HANG" + b"\x00" * 100)
+    decoders = supervisor(spares=0)
+    source = decoders.open(str(tmp_path / "hang.m4a"))
+    result = []
+    reader = threading.Thread(target=lambda: result.append(source.read()))
+    reader.start()
+    time.sleep(0.4)
+    decoders.reap()
+    reader.join(5)
+    assert result == [b""]
+    source.cleanup()
@@ -0,0 +1,68 @@
+import numpy as np
+
+
+# Frames of the same level on both channels
+class LevelSource:
+    def __init__(self, level):
+        self.frame = np.full((960, 2), level, dtype=np.int16).tobytes()
+        self.cleaned_up = False
+
+    def read(self):
+        return self.frame
+
+    def cleanup(self):
+        self.cleaned_up = True
+
+
+def left(pcm):
+    return np.frombuffer(pcm, dtype=np.int16).reshape(-1, 2)[:, 0].astype(np.int32)
+
+
+def test_unity_gain_passes_frames_through(bot):
+    source = LevelSource(1234)
+    gain = bot.GainAudio(source)
+    assert gain.read() is source.frame
+    gain.cleanup()
+    assert source.cleaned_up
+
+
+def test_volume_change_ramps_across_frames(bot):
+    gain = bot.GainAudio(LevelSource(10000), ramp_seconds=0.05)  # 2400 samples, two and a half frames
+    gain.volume = 0.5
+    ramp = np.concatenate([left(gain.read()) for _ in range(3)])
+    # One straight line from 10000 down to 5000 with no jump at the frame boundaries, then flat
+    assert np.all(np.diff(ramp) <= 0) and np.abs(np.diff(ramp)).max() <= 3
+    assert abs(ramp[959] - 8000) <= 2 and abs(ramp[1919] - 6000) <= 2
+    assert np.all(ramp[2400:] == 5000) and np.all(left(gain.read()) == 5000)
+    # Back at unity the frames are untouched again once the ramp up is done
+    gain.volume = 1.0
+    for _ in range(3):
+        gain.read()
+    assert gain.is_unity() and gain.read() is gain.source.frame
+
+
+def test_new_target_mid_ramp_starts_from_current_gain(bot):
+    gain = bot.GainAudio(LevelSource(10000), ramp_seconds=0.05)
+    gain.volume = 0.0
+    first = left(gain.read())
+    gain.volume = 1.0
+    second = left(gain.read())
+    assert abs(second[0] - first[-1]) <= 5 and second[-1] > first[-1]
+
+
+def test_track_gain_scales_and_clips(bot):
+    gain = bot.GainAudio(LevelSource(20000), volume=0.5, track_gain=0.5)
+    assert np.all(left(gain.read()) == 5000)
+    loud = bot.GainAudio(LevelSource(20000), volume=1.0, track_gain=2.0)
+    assert np.all(left(loud.read()) == 32767)
+
+
+# Every gain stage sharing a VolumeControl follows a new value on its next frame
+def test_shared_volume_control(bot):
+    control = bot.VolumeControl(1.0)
+    music = bot.GainAudio(LevelSource(10000), volume=control, ramp_seconds=0.001)
+    upcoming = bot.GainAudio(LevelSource(10000), volume=control, ramp_seconds=0.001)
+    control.value = 0.25
+    assert np.all(left(music.read())[48:] == 2500) and np.all(left(upcoming.read())[48:] == 2500)
+    music.volume = 0.5
+    assert control.value == 0.5 and np.all(left(upcoming.read())[48:] == 5000)
@@ -0,0 +1,60 @@
+import pytest
+
+
+@pytest.fixture
+def library(bot, tmp_path):
+    library = bot.Library(str(tmp_path / "library.db"))
+    library.add_files([
+        "/music/ABBA - Dancing Queen.mp3",
+        "/music/Abbey Road/Come Together.flac",
+        "/music/Crab Rave.mp3",
+        "/music/Queen - Bohemian Rhapsody.mp3",
+        "/music/Queens of the Stone Age - No One Knows.mp3",
+        "/music/x.mp3",
+    ])
+    library.add_files(["/sounds/airhorn.wav", "/sounds/sad trombone.wav"], kind="sound")
+    return library
+
+
+def paths(results):
+    return [row[0].rsplit("/", 1)[1] for row in results]
+
+
+def test_substring_search_shortest_first(library):
+    assert paths(library.search("queen")) == ["ABBA - Dancing Queen.mp3", "Queen - Bohemian Rhapsody.mp3", "Queens of the Stone Age - No One Knows.mp3"]
+    assert paths(library.search("  Dancing   QUEEN ")) == ["ABBA - Dancing Queen.mp3"]
+
+
+def test_search_inside_words_and_across_them(library):
+    assert paths(library.search("ancin")) == ["ABBA - Dancing Queen.mp3"]
+    assert paths(library.search("danc")) == ["ABBA - Dancing Queen.mp3"]
+    assert paths(library.search("ing que")) == ["ABBA - Dancing Queen.mp3"]
+    assert library.search("queen dancing") == []
+    assert library.search("zzz") == []
+
+
+def test_short_queries_match_word_starts(library):
+    assert sorted(paths(library.search("ab"))) == ["ABBA - Dancing Queen.mp3"]
+    assert paths(library.search("ra")) == ["Crab Rave.mp3"]
+    assert paths(library.search("x")) == ["x.mp3"]
+    assert library.search(" ") == []
+
+
+def test_kind_and_limit(library):
+    assert paths(library.search("air")) == ["airhorn.wav"]
+    assert library.search("air", kind="track") == []
+    assert paths(library.search("trom", kind="sound")) == ["sad trombone.wav"]
+    assert len(library.search("q", limit=2)) == 2
+
+
+def test_tags_are_searchable_once_stored(library):
+    assert library.search("beatles") == []
+    library.store_metadata([("/music/Abbey Road/Come Together.flac", 1.0, 100, {"title": "Come Together", "artist": "The Beatles", "album": "Abbey Road"})])
+    assert paths(library.search("beatles")) == ["Come Together.flac"]
+    row = library.search("beatles")[0]
+    assert row[1:4] == ("track", "Come Together", "The Beatles")
+
+
+def test_known_files_are_not_added_twice(library):
+    assert library.add_files(["/music/x.mp3", "/music/y.mp3"]) == 1
+    assert paths(library.search("y")) == ["y.mp3"]
@@ -0,0 +1,100 @@
+import time
+
+import numpy as np
+
+
+# Frames of a constant level on one channel
+class ConstantSource:
+    def __init__(self, frames, channel, level):
+        self.frames = frames
+        self.channel = channel
+        self.level = level
+        self.cleaned_up = False
+
+    def read(self):
+        if self.frames <= 0:
+            return b""
+        self.frames -= 1
+        samples = np.zeros((960, 2), dtype=np.int16)
+        samples[:, self.channel] = self.level
+        return samples.tobytes()
+
+    def cleanup(self):
+        self.cleaned_up = True
+
+
+def play_frames(mixer, count):
+    return np.concatenate([np.frombuffer(mixer.read(), dtype=np.int16).reshape(-1, 2) for _ in range(count)])
+
+
+def test_quick_sound_ducks_the_music(bot):
+    mixer = bot.MixerAudio(duck_volume=0.5)
+    effect_ended = []
+    mixer.set_music(ConstantSource(30, 0, 20000))
+    assert play_frames(mixer, 5)[:, 0].min() == 20000
+    effect = ConstantSource(10, 1, 1000)
+    mixer.add_effect(effect, lambda error: effect_ended.append(True))
+    ducked = play_frames(mixer, 10)
+    assert np.all(ducked[:, 0] == 10000) and np.all(ducked[:, 1] == 1000)
+    after = play_frames(mixer, 5)
+    assert np.all(after[:, 0] == 20000) and np.all(after[:, 1] == 0)
+    assert effect_ended == [True] and effect.cleaned_up
+
+
+def test_mix_is_clipped(bot):
+    mixer = bot.MixerAudio(duck_volume=1.0)
+    mixer.set_music(ConstantSource(5, 0, 30000))
+    mixer.add_effect(ConstantSource(5, 0, 30000))
+    assert play_frames(mixer, 5)[:, 0].max() == 32767
+
+
+# A track as the player opens it, with its decoder already at the end so the fade can be timed
+def decoded_track(bot, frames, channel, level=20000):
+    track = bot.TrackedAudio(ConstantSource(frames, channel, level), read_ahead=frames + 10)
+    deadline = time.monotonic() + 5
+    while track.remaining_frames() is None and time.monotonic() < deadline:
+        time.sleep(0.001)
+    return track, bot.GainAudio(track)
+
+
+def play(mixer):
+    frames = []
+    while True:
+        frame = mixer.read()
+        if not frame:
+            return frames
+        frames.append(np.frombuffer(frame, dtype=np.int16).reshape(-1, 2).astype(float))
+
+
+def test_next_track_follows_without_a_gap(bot):
+    mixer = bot.MixerAudio()
+    ended = []
+    _, first = decoded_track(bot, 100, 0)
+    _, second = decoded_track(bot, 100, 1)
+    mixer.set_music(first, lambda error: ended.append("first"))
+    mixer.set_next_music(second, lambda error: ended.append("second"))
+    frames = play(mixer)
+    assert len(frames) == 200
+    assert ended == ["first", "second"]
+    assert mixer.last_gap_frames == 0
+    assert frames[99][:, 0].min() == 20000 and frames[100][:, 1].min() == 20000
+
+
+def test_crossfade_overlaps_at_equal_power(bot):
+    mixer = bot.MixerAudio(crossfade_frames=50)
+    ended = []
+    _, first = decoded_track(bot, 100, 0)
+    _, second = decoded_track(bot, 100, 1)
+    mixer.set_music(first, lambda error: ended.append(("first", len(ended))))
+    mixer.set_next_music(second, lambda error: ended.append(("second", len(ended))))
+    frames = play(mixer)
+    assert len(frames) == 150
+    audio = np.concatenate(frames)
+    power = np.hypot(audio[:, 0], audio[:, 1])
+    assert power.min() >= 19990 and power.max() <= 20001
+    # The first track fades out over its last 50 frames while the second fades in
+    assert audio[:50 * 960, 0].min() == 20000 and audio[:50 * 960, 1].max() == 0
+    assert audio[100 * 960:, 0].max() == 0 and audio[100 * 960:, 1].min() == 20000
+    middle = audio[75 * 960]
+    assert abs(middle[0] - middle[1]) < 200
+    assert [name for name, _ in ended] == ["first", "second"]
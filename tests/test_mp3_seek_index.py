@@ -0,0 +1,89 @@
+import numpy as np
+
+FRAME_LENGTH = 384  # MPEG-1 Layer III, 128 kbps, 48 kHz, no padding
+HEADER = b"\xff\xfb\x94\x00"
+
+
+def frame(body=b""):
+    return HEADER + body + b"\x00" * (FRAME_LENGTH - 4 - len(body))
+
+
+# Xing/Info frame with a LAME tag giving the encoder delay and padding
+def info_frame(delay, padding):
+    side_info = b"\x00" * 32
+    lame = b"LAME3.100" + b"\x00" * 12 + ((delay << 12) | padding).to_bytes(3, "big")
+    return frame(side_info + b"Info" + b"\x00\x00\x00\x00" + lame)
+
+
+def id3_tag(size):
+    synchsafe = bytes([(size >> 21) & 0x7F, (size >> 14) & 0x7F, (size >> 7) & 0x7F, size & 0x7F])
+    return b"ID3\x04\x00\x00" + synchsafe + b"\x00" * size
+
+
+def write_mp3(path, frames=100, delay=576, padding=1000, tag=300, junk_after=None):
+    data = id3_tag(tag) + info_frame(delay, padding)
+    for i in range(frames):
+        data += frame()
+        if i == junk_after:
+            data += b"JUNK\xff\x00TAG"
+    path.write_bytes(data)
+    return 10 + tag + FRAME_LENGTH  # offset of the first audio frame
+
+
+def test_build_reads_frames_and_lame_tag(bot, tmp_path):
+    path = tmp_path / "a.mp3"
+    first = write_mp3(path)
+    index = bot.MP3SeekIndex.build(str(path))
+    assert (index.sample_rate, index.samples_per_frame) == (48000, 1152)
+    assert (index.start_skip, index.end_skip) == (576 + 529, 1000)
+    assert list(index.offsets) == [first + i * FRAME_LENGTH for i in range(100)]
+    assert index.duration() == (100 * 1152 - 1105 - 1000) / 48000
+
+
+def test_build_skips_junk_between_frames(bot, tmp_path):
+    path = tmp_path / "a.mp3"
+    first = write_mp3(path, junk_after=49)
+    index = bot.MP3SeekIndex.build(str(path))
+    assert len(index.offsets) == 100
+    assert index.offsets[50] == first + 50 * FRAME_LENGTH + len(b"JUNK\xff\x00TAG")
+
+
+def test_build_without_info_frame(bot, tmp_path):
+    path = tmp_path / "a.mp3"
+    path.write_bytes(frame() * 10)
+    index = bot.MP3SeekIndex.build(str(path))
+    assert (index.start_skip, index.end_skip) == (0, 0)
+    assert len(index.offsets) == 10
+
+
+def test_build_rejects_other_files(bot, tmp_path):
+    path = tmp_path / "a.mp3"
+    path.write_bytes(b"RIFF" + b"\x00" * 2000)
+    assert bot.MP3SeekIndex.build(str(path)) is None
+
+
+def test_locate_starts_priming_frames_early(bot, tmp_path):
+    path = tmp_path / "a.mp3"
+    write_mp3(path)
+    index = bot.MP3SeekIndex.build(str(path))
+    offset, skip = index.locate(0)
+    assert offset == index.offsets[0] and skip == 1105 / 48000
+    sample = 48000 + 1105
+    first = sample // 1152 - bot.MP3_PRIMING_FRAMES
+    offset, skip = index.locate(1.0)
+    assert offset == index.offsets[first]
+    assert skip == (sample - first * 1152) / 48000
+    # Past the end it stays within the file
+    offset, _ = index.locate(60.0)
+    assert offset == index.offsets[99 - bot.MP3_PRIMING_FRAMES]
+
+
+def test_save_and_load(bot, tmp_path):
+    path = tmp_path / "a.mp3"
+    write_mp3(path)
+    index = bot.MP3SeekIndex.build(str(path))
+    index.save(str(tmp_path / "index.npy"))
+    loaded = bot.MP3SeekIndex.load(str(tmp_path / "index.npy"))
+    assert (loaded.sample_rate, loaded.samples_per_frame, loaded.start_skip, loaded.end_skip) == (48000, 1152, 1105, 1000)
+    assert np.array_equal(loaded.offsets, index.offsets)
+    assert loaded.locate(1.0) == index.locate(1.0)
@@ -0,0 +1,152 @@
+import struct
+
+import numpy as np
+import pytest
+
+
+def write_wav(path, samples, rate, audio_format=1, extensible=False):
+    channels = samples.shape[1]
+    width = samples.dtype.itemsize if samples.dtype != np.dtype("V3") else 3
+    fmt = struct.pack("<HHIIHH", 0xFFFE if extensible else audio_format, channels, rate, rate * channels * width, channels * width, width * 8)
+    if extensible:
+        fmt += struct.pack("<HHI", 22, width * 8, 0) + struct.pack("<H", audio_format) + b"\x00" * 14
+    data = samples.tobytes()
+    path.write_bytes(
+        b"RIFF" + struct.pack("<I", 4 + 8 + len(fmt) + 8 + len(data)) + b"WAVE"
+        + b"LIST" + struct.pack("<I", 3) + b"abc\x00"  # odd-sized chunk before the format
+        + b"fmt " + struct.pack("<I", len(fmt)) + fmt
+        + b"data" + struct.pack("<I", len(data)) + data
+    )
+
+
+# 80-bit extended float, as AIFF stores its sample rate
+def extended(value):
+    exponent = int(np.floor(np.log2(value)))
+    return struct.pack(">HQ", exponent + 16383, int(value * 2.0 ** (63 - exponent)))
+
+
+def write_aiff(path, samples, rate, compression=None):
+    channels = samples.shape[1]
+    comm = struct.pack(">hIh", channels, len(samples), 16) + extended(rate)
+    if compression:
+        comm += compression + b"\x00\x00"  # empty compression name, padded to an even length
+    data = samples.tobytes()
+    path.write_bytes(
+        b"FORM" + struct.pack(">I", 4 + 8 + len(comm) + 16 + len(data)) + (b"AIFC" if compression else b"AIFF")
+        + b"COMM" + struct.pack(">I", len(comm)) + comm
+        + b"SSND" + struct.pack(">III", len(data) + 8, 0, 0) + data
+    )
+
+
+def read_all(source):
+    frames = []
+    while True:
+        frame = source.read()
+        if not frame:
+            break
+        frames.append(frame)
+    source.cleanup()
+    return np.frombuffer(b"".join(frames), dtype=np.int16).reshape(-1, 2)
+
+
+def stereo_ramp(frames):
+    left = np.arange(frames, dtype=np.int16) * 3 - 15000
+    return np.stack((left, -left), axis=1)
+
+
+def test_wav_header(bot, tmp_path):
+    path = tmp_path / "a.wav"
+    write_wav(path, np.zeros((10, 1), "<i2"), 22050)
+    info = bot.read_audio_header(str(path))
+    assert info == {"rate": 22050, "channels": 1, "width": 2, "is_float": False, "big_endian": False, "offset": 56, "size": 20}
+
+
+def test_wav_extensible_float_header(bot, tmp_path):
+    path = tmp_path / "a.wav"
+    write_wav(path, np.zeros((10, 2), "<f4"), 48000, audio_format=3, extensible=True)
+    info = bot.read_audio_header(str(path))
+    assert (info["rate"], info["channels"], info["width"], info["is_float"], info["size"]) == (48000, 2, 4, True, 80)
+
+
+def test_aiff_headers(bot, tmp_path):
+    path = tmp_path / "a.aiff"
+    write_aiff(path, np.zeros((10, 2), ">i2"), 44100)
+    info = bot.read_audio_header(str(path))
+    assert (info["rate"], info["channels"], info["width"], info["big_endian"], info["size"]) == (44100, 2, 2, True, 40)
+    write_aiff(path, np.zeros((10, 2), "<i2"), 44100, compression=b"sowt")
+    assert bot.read_audio_header(str(path))["big_endian"] is False
+    write_aiff(path, np.zeros((10, 2), "<i2"), 44100, compression=b"ulaw")
+    assert bot.read_audio_header(str(path)) is None
+
+
+def test_other_files_have_no_header(bot, tmp_path):
+    path = tmp_path / "a.wav"
+    path.write_bytes(b"ID3" + b"\x00" * 100)
+    assert bot.read_audio_header(str(path)) is None
+    path.write_bytes(b"RIFF\x00\x00\x00\x00WAVEfmt ")
+    assert bot.read_audio_header(str(path)) is None
+
+
+def test_surround_and_high_rate_files_are_left_to_ffmpeg(bot, tmp_path):
+    path = tmp_path / "a.wav"
+    write_wav(path, np.zeros((10, 6), "<i2"), 48000)
+    assert bot.read_audio_header(str(path)) is not None
+    assert bot.native_pcm_header(str(path)) is None
+    write_wav(path, np.zeros((10, 2), "<i2"), 96000)
+    assert bot.native_pcm_header(str(path)) is None
+    with pytest.raises(ValueError):
+        bot.NativePCMAudio(str(path))
+
+
+def test_48k_stereo_is_read_directly(bot, tmp_path):
+    path = tmp_path / "a.wav"
+    samples = stereo_ramp(5000)
+    write_wav(path, samples, 48000)
+    source = bot.NativePCMAudio(str(path))
+    assert source.direct
+    assert np.array_equal(read_all(source), samples)
+
+
+def test_big_endian_aiff_is_converted(bot, tmp_path):
+    path = tmp_path / "a.aiff"
+    samples = stereo_ramp(5000)
+    write_aiff(path, samples.astype(">i2"), 48000)
+    source = bot.NativePCMAudio(str(path))
+    assert not source.direct
+    assert np.array_equal(read_all(source), samples)
+
+
+@pytest.mark.parametrize("dtype, scale", [("<f4", 1 / 32768), ("<i4", 65536), ("u1", None)])
+def test_sample_formats(bot, tmp_path, dtype, scale):
+    path = tmp_path / "a.wav"
+    if scale is None:
+        # 8-bit WAV is unsigned around 128
+        write_wav(path, np.array([[128, 192]] * 960, dtype), 48000)
+        expected = [0, 64 * 256]
+    else:
+        write_wav(path, (np.array([[1000, -2000]] * 960) * scale).astype(dtype), 48000, audio_format=3 if dtype == "<f4" else 1)
+        expected = [1000, -2000]
+    output = read_all(bot.NativePCMAudio(str(path)))
+    assert len(output) == 960
+    assert np.abs(output - expected).max() <= 1
+
+
+def test_mono_is_doubled_and_resampled(bot, tmp_path):
+    path = tmp_path / "a.wav"
+    mono = (np.arange(24000) % 1000 * 8).astype("<i2")
+    write_wav(path, mono[:, None], 24000)
+    output = read_all(bot.NativePCMAudio(str(path)))
+    assert np.array_equal(output[:, 0], output[:, 1])
+    expected = np.interp(np.arange(len(output)) * 0.5, np.arange(len(mono)), mono)
+    assert abs(len(output) - 48000) <= 2
+    assert np.abs(output[:, 0] - expected).max() <= 1
+
+
+def test_seek(bot, tmp_path):
+    path = tmp_path / "a.wav"
+    bot.write_bench_tone(str(path), 2, 5000)
+    source = bot.NativePCMAudio(str(path))
+    source.seek(1.0)
+    frame = np.frombuffer(source.read(), dtype=np.int16).reshape(-1, 2)
+    assert frame[0, 0] == 1000 + 256 * 50 and frame[0, 1] == 5000
+    assert len(read_all(source)) == 49 * 960
@@ -0,0 +1,84 @@
+import gc
+import os
+import sys
+
+import pytest
+
+# Stands in for FFmpeg: copies the input file to the output path as if it were decoded
+FAKE_FFMPEG = """#!{python}
+import shutil, sys
+arguments = sys.argv[1:]
+shutil.copyfile(arguments[arguments.index("-i") + 1], arguments[-1])
+"""
+
+
+@pytest.fixture
+def fake_ffmpeg(tmp_path, monkeypatch):
+    folder = tmp_path / "bin"
+    folder.mkdir()
+    (folder / "ffmpeg").write_text(FAKE_FFMPEG.format(python=sys.executable))
+    (folder / "ffmpeg").chmod(0o755)
+    monkeypatch.setenv("PATH", str(folder) + os.pathsep + os.environ["PATH"])
+
+
+# A 1000 byte "MP3" whose content, and so cache name, differs by first byte
+def track(tmp_path, name, mtime=1000):
+    path = tmp_path / name
+    path.write_bytes(name.encode()[:1] * 1000)
+    os.utime(path, (mtime, mtime))
+    return str(path)
+
+
+# A cache file that is gone or empty fails to open without a second error when the source is collected
+@pytest.mark.filterwarnings("error::pytest.PytestUnraisableExceptionWarning")
+def test_mapped_pcm_that_cannot_be_opened(bot, tmp_path):
+    with pytest.raises(FileNotFoundError):
+        bot.MappedPCMAudio(str(tmp_path / "gone.pcm"))
+    (tmp_path / "empty.pcm").write_bytes(b"")
+    with pytest.raises(ValueError):
+        bot.MappedPCMAudio(str(tmp_path / "empty.pcm"))
+    gc.collect()
+
+
+def test_mapped_pcm_plays_and_seeks(bot, tmp_path):
+    path = tmp_path / "track.pcm"
+    path.write_bytes(bytes(range(256)) * 15 * 10)  # ten frames
+    source = bot.MappedPCMAudio(str(path))
+    assert bytes(source.read()) == path.read_bytes()[:bot.FRAME_SIZE]
+    source.seek(0.1)
+    assert bytes(source.read()) == path.read_bytes()[5 * bot.FRAME_SIZE:6 * bot.FRAME_SIZE]
+    source.seek(60)
+    assert len(source.read()) == 0
+    source.cleanup()
+
+
+def test_least_recently_used_track_is_evicted(bot, tmp_path, fake_ffmpeg):
+    cache = bot.PCMDiskCache(folder=str(tmp_path / "cache"), limit=2500)
+    a, b, c = track(tmp_path, "a.mp3"), track(tmp_path, "b.mp3"), track(tmp_path, "c.mp3")
+    cache.add(a)
+    cache.add(b)
+    assert open(cache.lookup(a), "rb").read() == b"a" * 1000  # a is now the most recently used
+    cache.add(c)
+    assert cache.lookup(b) is None and cache.total_size == 2000
+    assert sorted(os.listdir(tmp_path / "cache")) == sorted(cache.entries)
+    # A restart picks the use order back up from the file times
+    reopened = bot.PCMDiskCache(folder=str(tmp_path / "cache"), limit=2500)
+    assert list(reopened.entries) == list(cache.entries) and reopened.total_size == 2000
+
+
+def test_changed_track_is_not_served_from_the_cache(bot, tmp_path, fake_ffmpeg):
+    cache = bot.PCMDiskCache(folder=str(tmp_path / "cache"))
+    path = track(tmp_path, "a.mp3")
+    cache.schedule(path)
+    cache.executor.shutdown(wait=True)
+    assert cache.lookup(path) is not None and not cache.pending
+    os.utime(path, (2000, 2000))
+    assert cache.lookup(path) is None
+
+
+def test_files_read_natively_are_not_cached(bot, tmp_path, fake_ffmpeg):
+    cache = bot.PCMDiskCache(folder=str(tmp_path / "cache"))
+    path = tmp_path / "raw.pcm"
+    path.write_bytes(b"\0" * 3840)
+    cache.add(str(path))
+    assert cache.lookup(str(path)) is None and cache.total_size == 0
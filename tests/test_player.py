@@ -0,0 +1,108 @@
+import asyncio
+import time
+
+import discord
+import pytest
+
+
+# Voice channel that hands out the benchmark's fake voice client instead of connecting
+class FakeVoiceChannel(discord.VoiceChannel):
+    def __init__(self, bot, channel_id):
+        self.id = channel_id
+        self.name = "music"
+        self.clients = []
+        self.fake_client_class = bot.FakeVoiceClient
+
+    async def connect(self):
+        self.clients.append(self.fake_client_class())
+        return self.clients[-1]
+
+
+class FakeGuild:
+    name = "test"
+
+    def __init__(self, channel):
+        self.channel = channel
+
+    def get_channel(self, channel_id):
+        return self.channel if channel_id == self.channel.id else None
+
+
+@pytest.fixture
+def player(bot, monkeypatch, tmp_path):
+    monkeypatch.setattr(bot, "LOUDNESS_NORMALIZATION", False)
+    monkeypatch.setattr(bot, "OPUS_PASSTHROUGH", False)
+    monkeypatch.setattr(bot, "audio_pool", None)
+    channel = FakeVoiceChannel(bot, 7)
+    monkeypatch.setattr(bot.bot, "get_guild", lambda guild_id: FakeGuild(channel))
+    player = bot.GuildPlayer(1)
+    player.channel = channel
+    return player
+
+
+def run(bot, coroutine):
+    async def main():
+        bot.bot.loop = asyncio.get_running_loop()
+        return await coroutine
+    return asyncio.run(main())
+
+
+async def wait_until(test, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not test() and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+    return test()
+
+
+# Waits for the queue to play out up to the end of its last file
+async def play_through(bot, player, last_file):
+    assert await wait_until(lambda: player.current_file == last_file and player.state == bot.STATE_PLAYING, timeout=10)
+    assert await wait_until(lambda: player.state == bot.STATE_IDLE, timeout=10)
+
+
+# Levels heard on the right channel, in the order they were first heard
+def levels_heard(clients):
+    heard = []
+    for client in clients:
+        for _, _, right in client.frames:
+            if right and (not heard or heard[-1] != right):
+                heard.append(right)
+    return heard
+
+
+def test_reconnect_keeps_the_prefetched_track(bot, player, tmp_path):
+    files = []
+    for i, level in enumerate((8000, 5000, 3000)):
+        files.append(str(tmp_path / f"{i}.wav"))
+        bot.write_bench_tone(files[-1], 1, level)
+
+    async def scenario():
+        assert await player.connect(7)
+        await player.send("enqueue_many", files)
+        assert await wait_until(lambda: player.prefetched is not None)
+        assert await player.disconnect()
+        assert player.prefetched is None
+        assert await player.connect(7)
+        await play_through(bot, player, files[-1])
+        await player.stop_music()
+
+    run(bot, scenario())
+    assert levels_heard(player.channel.clients) == [8000, 5000, 3000]
+
+
+def test_a_track_that_cannot_be_opened_is_skipped(bot, player, tmp_path, monkeypatch):
+    # No decoder may start, so the MP3 is refused while the WAV is read in-process
+    monkeypatch.setattr(bot, "decoder_supervisor", bot.DecoderSupervisor(limit=0))
+    (tmp_path / "a.mp3").write_bytes(b"\xff\xfb\x94\x00" * 1000)
+    wav = str(tmp_path / "b.wav")
+    bot.write_bench_tone(wav, 0.5, 5000)
+
+    async def scenario():
+        assert await player.connect(7)
+        await player.send("enqueue_many", [str(tmp_path / "a.mp3"), wav])
+        await play_through(bot, player, wav)
+        await player.stop_music()
+
+    run(bot, scenario())
+    bot.decoder_supervisor.shutdown()
+    assert levels_heard(player.channel.clients) == [5000]
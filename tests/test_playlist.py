@@ -0,0 +1,90 @@
+import random
+
+import pytest
+
+
+# Replays the changes a listener was told about on a plain list
+def apply_change(mirror, change):
+    operation, arguments = change[1], change[2:]
+    if operation == "insert":
+        index, items = arguments
+        mirror[index:index] = items
+    elif operation == "remove":
+        index, count = arguments
+        del mirror[index:index + count]
+    elif operation == "move":
+        source, target = arguments
+        mirror.insert(target, mirror.pop(source))
+    elif operation == "clear":
+        mirror.clear()
+
+
+@pytest.mark.parametrize("block_size", [1, 2, 4, 512])
+def test_random_operations_match_a_list(bot, block_size):
+    rng = random.Random(block_size)
+    playlist = bot.Playlist(block_size=block_size)
+    expected = []
+    mirror = []
+    versions = []
+    playlist.listeners.append(lambda change: (versions.append(change[0]), apply_change(mirror, change)))
+    counter = 0
+    for _ in range(3000):
+        operation = rng.choices(["append", "extend", "insert", "remove", "move", "popleft", "clear"], [6, 2, 6, 4, 4, 2, 0.05])[0]
+        if operation == "append":
+            counter += 1
+            playlist.append(counter)
+            expected.append(counter)
+        elif operation == "extend":
+            items = list(range(counter + 1, counter + 1 + rng.randrange(0, 20)))
+            counter += len(items)
+            playlist.extend(items)
+            expected.extend(items)
+        elif operation == "insert":
+            counter += 1
+            index = rng.randrange(-3, len(expected) + 4)
+            playlist.insert(index, counter)
+            expected.insert(max(0, min(index, len(expected))), counter)
+        elif not expected:
+            continue
+        elif operation == "remove":
+            index = rng.randrange(-len(expected), len(expected))
+            assert playlist.remove(index) == expected.pop(index)
+        elif operation == "move":
+            source = rng.randrange(-len(expected), len(expected))
+            target = rng.randrange(-2, len(expected) + 2)
+            playlist.move(source, target)
+            expected.insert(max(0, min(target, len(expected) - 1)), expected.pop(source))
+        elif operation == "popleft":
+            assert playlist.popleft() == expected.pop(0)
+        elif operation == "clear":
+            playlist.clear()
+            expected.clear()
+        assert len(playlist) == len(expected)
+        assert list(playlist) == expected
+        assert mirror == expected
+    assert [playlist[i] for i in range(len(expected))] == expected
+    assert [playlist[-i] for i in range(1, len(expected) + 1)] == expected[::-1]
+    assert versions == list(range(1, playlist.version + 1))
+    assert playlist.snapshot() == (playlist.version, expected)
+
+
+def test_out_of_range(bot):
+    playlist = bot.Playlist()
+    with pytest.raises(IndexError):
+        playlist.popleft()
+    playlist.extend(["a", "b"])
+    with pytest.raises(IndexError):
+        playlist[2]
+    with pytest.raises(IndexError):
+        playlist.remove(-3)
+    with pytest.raises(IndexError):
+        playlist.move(2, 0)
+    assert list(playlist) == ["a", "b"]
+
+
+def test_no_op_changes_are_not_recorded(bot):
+    playlist = bot.Playlist()
+    playlist.extend([])
+    playlist.append("a")
+    playlist.move(0, 5)
+    assert playlist.version == 1
@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+
+@pytest.fixture
+def decoded(bot, monkeypatch):
+    calls = []
+
+    # Stands in for FFmpeg: a file "decodes" to 1000 bytes of its first byte
+    def decode_to_pcm(file_path):
+        calls.append(os.path.basename(file_path))
+        with open(file_path, "rb") as f:
+            return f.read(1) * 1000
+
+    monkeypatch.setattr(bot, "decode_to_pcm", decode_to_pcm)
+    return calls
+
+
+def sound(tmp_path, name, content=b"a"):
+    path = tmp_path / name
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_least_recently_used_sound_is_evicted(bot, tmp_path, decoded):
+    bank = bot.QuickSoundBank(limit=2500)
+    a, b, c = sound(tmp_path, "a.wav", b"a"), sound(tmp_path, "b.wav", b"b"), sound(tmp_path, "c.wav", b"c")
+    bank.load(a)
+    bank.load(b)
+    assert bank.get(a) == b"a" * 1000  # a is now the most recently used
+    bank.load(c)
+    assert list(bank.sounds) == [a, c] and bank.total_size == 2000
+    assert bank.get(b) is None
+    assert bank.make_source(b) is not None and decoded == ["a.wav", "b.wav", "c.wav", "b.wav"]
+    assert list(bank.sounds) == [c, b]
+
+
+def test_sound_larger_than_the_limit_is_still_kept(bot, tmp_path, decoded):
+    bank = bot.QuickSoundBank(limit=500)
+    bank.load(sound(tmp_path, "a.wav"))
+    big = sound(tmp_path, "b.wav", b"b")
+    bank.load(big)
+    assert list(bank.sounds) == [big]
+
+
+def test_changed_file_is_decoded_again(bot, tmp_path, decoded):
+    bank = bot.QuickSoundBank()
+    path = sound(tmp_path, "a.wav", b"a")
+    os.utime(path, (1000, 1000))
+    assert bank.load(path) == b"a" * 1000
+    assert bank.load(path) == b"a" * 1000 and decoded == ["a.wav"]
+    # Replaced on disk: the cached copy is stale and the new sound is decoded in its place
+    sound(tmp_path, "a.wav", b"z")
+    os.utime(path, (2000, 2000))
+    assert bank.get(path) is None
+    assert bank.load(path) == b"z" * 1000 and decoded == ["a.wav", "a.wav"]
+    assert bank.total_size == 1000
+
+
+def test_missing_file(bot, tmp_path, decoded):
+    bank = bot.QuickSoundBank()
+    assert bank.load(str(tmp_path / "gone.wav")) is None
+    assert bank.make_source(str(tmp_path / "gone.wav")) is None and decoded == []
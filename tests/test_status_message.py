@@ -0,0 +1,95 @@
+import asyncio
+import types
+
+import discord
+
+
+class FakePlayer:
+    def __init__(self, bot):
+        self.listeners = []
+        self.state = bot.STATE_IDLE
+        self.current_file = None
+        self.playlist = []
+        self.music_volume = 1.0
+
+
+class FakeMessage:
+    def __init__(self, channel, content):
+        self.channel = channel
+        self.content = content
+        self.deleted = False
+
+    async def edit(self, content):
+        if self.deleted:
+            raise discord.NotFound(types.SimpleNamespace(status=404, reason="Not Found"), "Unknown Message")
+        self.channel.edits.append(content)
+        self.content = content
+
+    async def delete(self):
+        self.deleted = True
+
+
+class FakeChannel:
+    def __init__(self):
+        self.sent = []
+        self.edits = []
+
+    async def send(self, content):
+        self.sent.append(FakeMessage(self, content))
+        return self.sent[-1]
+
+
+def run(bot, scenario):
+    async def main():
+        bot.bot.loop = asyncio.get_running_loop()
+        return await scenario()
+    return asyncio.run(main())
+
+
+def test_changes_are_coalesced_into_one_edit(bot, monkeypatch):
+    monkeypatch.setattr(bot, "STATUS_EDIT_INTERVAL", 0.2)
+    player = FakePlayer(bot)
+    status = bot.StatusMessage(player)
+    channel = FakeChannel()
+
+    async def scenario():
+        await status.show_in(channel)
+        await asyncio.sleep(0.05)
+        assert [message.content for message in channel.sent] == ["🎶 Nothing playing"]
+        # A big enqueue reports every track; only the final queue is shown, after the interval
+        for i in range(50):
+            player.playlist.append(f"track{i}.mp3")
+            for listener in player.listeners:
+                listener(player)
+        await asyncio.sleep(0.05)
+        assert channel.edits == []
+        await asyncio.sleep(0.3)
+        assert len(channel.edits) == 1 and "50 queued" in channel.edits[0] and "...and 40 more" in channel.edits[0]
+        # A change that renders the same text makes no edit
+        status.changed()
+        await asyncio.sleep(0.3)
+        assert len(channel.edits) == 1 and len(channel.sent) == 1
+
+    run(bot, scenario)
+
+
+def test_deleted_message_is_posted_again(bot, monkeypatch):
+    monkeypatch.setattr(bot, "STATUS_EDIT_INTERVAL", 0.0)
+    player = FakePlayer(bot)
+    status = bot.StatusMessage(player)
+    channel = FakeChannel()
+
+    async def scenario():
+        await status.show_in(channel)
+        await asyncio.sleep(0.05)
+        channel.sent[0].deleted = True
+        player.state, player.current_file = bot.STATE_PLAYING, "song.mp3"
+        status.changed()
+        await asyncio.sleep(0.05)
+        assert [message.content for message in channel.sent] == ["🎶 Nothing playing", "🎶 Now playing: song.mp3"]
+        # Reposting moves the message below the latest chat
+        await status.show_in(channel, repost=True)
+        await asyncio.sleep(0.05)
+        assert channel.sent[1].deleted and len(channel.sent) == 3
+
+    run(bot, scenario)